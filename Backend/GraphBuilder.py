@@ -1,30 +1,112 @@
 import os
 import ast
+from array import array
+from bisect import bisect_left
+from itertools import accumulate, islice, repeat
+from operator import add
 import networkx as nx
-from typing import Dict, Set, List, Tuple, Optional, Union
-import json
-from arango import ArangoClient
+from typing import Dict, FrozenSet, Iterable, Iterator, Set, List, Tuple, Optional, Union
+import orjson
 import re
+from collections import Counter
+import hashlib
+import pickle
 import glob
+from concurrent.futures import (FIRST_COMPLETED, Future, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+import multiprocessing
+
+# Regular expressions for C/C++ code analysis
+CPP_INCLUDE_PATTERN = re.compile(r'#include\s+[<"]([^>"]+)[>"]')
+CPP_CLASS_PATTERN = re.compile(r'(?:class|struct)\s+(\w+)')
+CPP_FUNCTION_PATTERN = re.compile(
+    r'(\w+)\s*\([^)]*\)\s*(?:const|override|final|noexcept)?\s*(?:{|;)')
+CPP_NAMESPACE_PATTERN = re.compile(r'namespace\s+(\w+)')
+
+# Regular expressions for Java code analysis
+JAVA_PACKAGE_PATTERN = re.compile(r'package\s+([\w.]+)')
+JAVA_IMPORT_PATTERN = re.compile(r'import\s+([\w.]+(?:\.\*)?)')
+JAVA_CLASS_PATTERN = re.compile(
+    r'(?:public|private|protected)?\s*(?:abstract|final)?\s*class\s+(\w+)')
+JAVA_INTERFACE_PATTERN = re.compile(
+    r'(?:public|private|protected)?\s*interface\s+(\w+)')
+JAVA_METHOD_PATTERN = re.compile(
+    r'(?:public|private|protected)?\s*(?:static|final|abstract)?\s*(?:[\w<>[\],\s]+)\s+(\w+)\s*\([^)]*\)')
+
+# Regular expressions for Go code analysis
+GO_PACKAGE_PATTERN = re.compile(r'package\s+(\w+)')
+GO_IMPORT_SINGLE_PATTERN = re.compile(r'import\s+"([^"]+)"')
+GO_IMPORT_MULTI_START_PATTERN = re.compile(r'import\s+\(')
+GO_IMPORT_MULTI_LINE_PATTERN = re.compile(r'\s*"([^"]+)"')
+GO_FUNC_PATTERN = re.compile(r'func\s+(?:\([^)]+\)\s+)?(\w+)')
+GO_STRUCT_PATTERN = re.compile(r'type\s+(\w+)\s+struct')
+GO_INTERFACE_PATTERN = re.compile(r'type\s+(\w+)\s+interface')
+
+# Line prefixes skipped when scanning for references: comments, plus
+# preprocessor directives for C/C++ and imports/packages for Java and Go
+REFERENCE_SKIP_PREFIXES = {
+    "cpp": ("//", "/*", "#"),
+    "java": ("//", "/*", "import ", "package "),
+    "go": ("//", "/*", "import ", "package "),
+}
+
+# Directories that hold dependencies or generated files rather than the codebase;
+# hidden directories such as .git, .venv and .tox are skipped as well
+SKIPPED_DIRECTORIES = frozenset({"__pycache__", "venv", "node_modules"})
+
+# Source files larger than this are skipped; they are usually generated or vendored
+MAX_FILE_BYTES = 2_000_000
+
+# Characters that are not allowed in the ArangoDB keys built from node names;
+# ASCII names are mapped with str.translate, others fall back to the regex
+ARANGO_KEY_INVALID_PATTERN = re.compile(r'[^a-zA-Z0-9_\-]')
+ARANGO_KEY_TRANSLATION = {
+    code: '_' for code in range(128) if ARANGO_KEY_INVALID_PATTERN.match(chr(code))
+}
+
+# Bumped whenever the analyzers change what they record, invalidating saved caches
+ANALYSIS_CACHE_VERSION = 1
+
+# Identifier tokens matched against known symbol names
+IDENTIFIER_PATTERN = re.compile(r'\w+')
+
+# Line boundaries recognized by str.splitlines other than \n
+OTHER_LINE_BREAKS = re.compile('[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
 
 
 class CodebaseVisualizer:
-    def __init__(self, root_dir: str, supported_languages=None):
+    def __init__(self, root_dir: str, supported_languages=None, cache_path: Optional[str] = None):
         self.root_dir = root_dir
+        # File where per-file analysis results are kept between runs, if any
+        self.cache_path = cache_path
         self.graph = nx.DiGraph()
         self.file_contents: Dict[str, str] = {}
         # file -> [(module, line_no)]
         self.import_relations: Dict[str, List[Tuple[str, int]]] = {}
         # file -> {symbol -> {type, line_no, context}}
         self.module_symbols: Dict[str, Dict[str, Dict[str, any]]] = {}
-        # symbol -> [(file, line_no, context)]
-        self.symbol_references: Dict[str, List[Tuple[str, int, str]]] = {}
+        # Reference contexts per symbol, keyed by (file, line) so each line counts once
+        self.symbol_references: Dict[str, Dict[Tuple[str, int], str]] = {}
         self.file_index: Dict[str, int] = {}  # Maps files to indices
+        # Language of every indexed file, detected once while indexing
+        self.file_languages: Dict[str, str] = {}
         self.current_index = 0
         self.directories: Set[str] = set()
         # Add a new index for all symbols to quickly locate them
         # symbol -> [{file, type, line_no, context}]
         self.symbol_index: Dict[str, List[Dict]] = {}
+        # Reference patterns compiled for the current second pass
+        self._reference_patterns = None
+        # Python file -> [(name, line_no)] loaded names found during analysis
+        self._python_references: Dict[str, List[Tuple[str, int]]] = {}
+        # (file, line_no, context_lines) -> context, shared by every reference on a line
+        self._context_cache: Dict[Tuple[str, int, int], str] = {}
+        # file -> (content digest, imports, symbols, Python references) loaded from
+        # cache_path, and the same for this run's files; None without a cache
+        self._previous_analyses: Optional[Dict[str, Tuple]] = None
+        self._analyses: Optional[Dict[str, Tuple]] = None
+        # id(content) -> (content, line start offsets, line end offsets)
+        self._line_spans_cache: Dict[int, Tuple[str, array, array, bool]] = {}
 
         # Define supported languages
         self.supported_languages = supported_languages or [
@@ -37,6 +119,12 @@ class CodebaseVisualizer:
             "java": [".java"],
             "go": [".go"]
         }
+        # Extension -> language lookup derived from the mapping above
+        self._extension_languages = {
+            ext: language
+            for language, extensions in self.language_extensions.items()
+            for ext in extensions
+        }
 
     def _get_next_index(self) -> int:
         """Get next available index for file indexing."""
@@ -48,91 +136,290 @@ class CodebaseVisualizer:
         Chunk the given code into snippets.
         Returns a list of dictionaries with 'code_snippet', 'start_line', and 'end_line'.
         """
-        lines = code.splitlines()
+        # Snippets are sliced out of the code using its cached line offsets
+        line_count = len(self._line_spans(code)[0])
         chunks = []
-        for i in range(0, len(lines), lines_per_chunk):
-            chunk_lines = lines[i:i + lines_per_chunk]
+        for i in range(0, line_count, lines_per_chunk):
+            end = min(i + lines_per_chunk, line_count)
             chunk = {
-                'code_snippet': '\n'.join(chunk_lines),
+                'code_snippet': self._join_lines(code, i, end),
                 'start_line': i + 1,
-                'end_line': i + len(chunk_lines)
+                'end_line': end
             }
             chunks.append(chunk)
         return chunks
 
+    def get_snippet_code(self, snippet_node: str) -> str:
+        """Return the code of a snippet node, read from its file's contents."""
+        attrs = self.graph.nodes[snippet_node]
+        if 'code_snippet' in attrs:
+            return attrs['code_snippet']
+
+        file_path = snippet_node.rsplit('::snippet::', 1)[0]
+        content = self.file_contents.get(file_path)
+        if content is None:
+            return ""
+        return self._join_lines(content, attrs['start_line'] - 1, attrs['end_line'])
+
+    def _line_spans(self, content: str) -> Tuple[array, array, bool]:
+        """
+        Return the start and end offsets of every line of content, as split by
+        str.splitlines; line terminators are excluded from the spans. The flag
+        is True when every line break in content is a plain \\n.
+        Offsets are computed once per content string and reused afterwards.
+        """
+        cached = self._line_spans_cache.get(id(content))
+        if cached is not None and cached[0] is content:
+            return cached[1:]
+
+        # Both scans run in C: starts are running sums of the line lengths with
+        # terminators, ends add the length of each line without them
+        starts = array('q', accumulate(map(len, content.splitlines(keepends=True)), initial=0))
+        starts.pop()
+        ends = array('q', map(add, starts, map(len, content.splitlines())))
+
+        newline_only = OTHER_LINE_BREAKS.search(content) is None
+
+        self._line_spans_cache[id(content)] = (content, starts, ends, newline_only)
+        return starts, ends, newline_only
+
+    def _join_lines(self, content: str, start: int, end: Optional[int]) -> str:
+        """Join lines[start:end] of content with newlines, like splitlines() slicing."""
+        starts, ends, newline_only = self._line_spans(content)
+        lines = range(*slice(start, end).indices(len(starts)))
+        if not lines:
+            return ""
+        # With \n breaks only, the joined lines are a single slice of content
+        if newline_only:
+            return content[starts[lines[0]]:ends[lines[-1]]]
+        return "\n".join(content[starts[i]:ends[i]] for i in lines)
+
     def _get_context_around_line(self, file_path: str, line_no: int, context_lines: int = 3) -> str:
         """Extract context around a specific line in a file."""
         if file_path not in self.file_contents:
             return ""
 
-        lines = self.file_contents[file_path].splitlines()
-        start = max(0, line_no - context_lines - 1)
-        end = min(len(lines), line_no + context_lines)
-
-        context = "\n".join(lines[start:end])
+        key = (file_path, line_no, context_lines)
+        context = self._context_cache.get(key)
+        if context is None:
+            content = self.file_contents[file_path]
+            start = max(0, line_no - context_lines - 1)
+            context = self._join_lines(content, start, line_no + context_lines)
+            self._context_cache[key] = context
         return context
 
     def _detect_language(self, file_path: str) -> str:
         """Detect the programming language of a file based on its extension."""
         _, ext = os.path.splitext(file_path)
-        ext = ext.lower()
+        return self._extension_languages.get(ext.lower(), "unknown")
 
-        for language, extensions in self.language_extensions.items():
-            if ext in extensions:
-                return language
+    def parse_files(self, workers: Optional[int] = None) -> None:
+        """
+        Parse all files in the directory and build relationships.
 
-        return "unknown"
+        Files are analyzed in this process unless workers is given, in which
+        case the analysis is spread over that many spawned worker processes;
+        the calling program's main module must then be safe to import.
+        """
+        # Contexts are only valid for the file contents read by this run
+        self._context_cache.clear()
 
-    def parse_files(self) -> None:
-        """Parse all files in the directory and build relationships."""
-        # First pass: Index all files and create directory nodes
+        # Results for files whose content is unchanged are reused from the cache
+        if self.cache_path:
+            self._previous_analyses = self._load_analysis_cache()
+            self._analyses = {}
+
+        # Walk the tree up front so files can be read concurrently while they
+        # are still indexed and analyzed in walk order below
+        walk = []
         for root, dirs, files in os.walk(self.root_dir):
+            # Prune in place so os.walk does not descend into skipped directories
+            dirs[:] = [d for d in dirs
+                       if d not in SKIPPED_DIRECTORIES and not d.startswith('.')]
+            walk.append((root, files))
+        with ThreadPoolExecutor() as pool:
+            reads = {}
+            for root, files in walk:
+                for file in files:
+                    file_path = os.path.join(root, file)
+                    if (self._detect_language(file_path) in self.supported_languages
+                            and not self._is_oversized(file_path)):
+                        reads[file_path] = pool.submit(self._read_file, file_path)
+
+            # First pass: Index all files and create directory nodes
+            self._index_files(walk, reads, analyze=not workers)
+
+        if workers:
+            self._analyze_files_in_workers(workers)
+
+        # Second pass: Find symbol references across files, with the reference
+        # patterns compiled once for every file
+        self._reference_patterns = self._compile_reference_patterns()
+        for file_path, content in self.file_contents.items():
+            self._find_references_in_file(
+                file_path, content, self.file_languages[file_path])
+
+        # Build the symbol index after all analyses
+        self._build_symbol_index()
+
+        if self.cache_path:
+            self._save_analysis_cache()
+
+    def _index_files(self, walk: List[Tuple[str, List[str]]], reads: Dict[str, Future],
+                     analyze: bool = True) -> None:
+        """Add directory and file nodes for the walked tree and optionally analyze each file."""
+        # Nodes and edges are collected in walk order and added in bulk
+        tree_nodes = []
+        tree_edges = []
+        for root, files in walk:
             # Add directory node
             rel_dir = os.path.relpath(root, self.root_dir)
             if rel_dir != '.':
                 self.directories.add(rel_dir)
-                self.graph.add_node(rel_dir, type='directory')
+                tree_nodes.append((rel_dir, {'type': 'directory'}))
 
                 # Add edge from parent directory to this directory (if not root)
                 parent_dir = os.path.dirname(rel_dir)
                 if parent_dir and parent_dir != '.':
-                    self.graph.add_edge(parent_dir, rel_dir,
-                                        edge_type='contains_directory')
+                    tree_edges.append(
+                        (parent_dir, rel_dir, {'edge_type': 'contains_directory'}))
 
             # Index files of supported languages
             for file in files:
                 file_path = os.path.join(root, file)
-                rel_path = os.path.relpath(file_path, self.root_dir)
-                file_language = self._detect_language(file_path)
 
-                if file_language in self.supported_languages:
+                # Only files queued for reading are supported and small enough
+                if file_path in reads:
+                    # Joined onto the directory's relative path instead of
+                    # normalizing the whole path again for every file
+                    rel_path = file if rel_dir == '.' else os.path.join(rel_dir, file)
+                    file_language = self._detect_language(file_path)
                     self.file_index[rel_path] = self._get_next_index()
+                    self.file_languages[rel_path] = file_language
 
                     # Add node for this file
-                    self.graph.add_node(
-                        rel_path, type='file', file_index=self.file_index[rel_path], language=file_language)
+                    tree_nodes.append((rel_path, {
+                        'type': 'file',
+                        'path': rel_path,
+                        'file_index': self.file_index[rel_path],
+                        'language': file_language,
+                        'directory': os.path.dirname(rel_path)
+                    }))
 
                     # Connect file to its directory
                     if rel_dir != '.':
-                        self.graph.add_edge(
-                            rel_dir, rel_path, edge_type='contains_file')
+                        tree_edges.append(
+                            (rel_dir, rel_path, {'edge_type': 'contains_file'}))
 
                     try:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            content = f.read()
-                            self.file_contents[rel_path] = content
-                            self._analyze_file(
-                                rel_path, content, file_language)
+                        content = reads[file_path].result()
+                        self.file_contents[rel_path] = content
+                        if analyze:
+                            self._analyze_file_cached(rel_path, content, file_language)
                     except Exception as e:
                         print(f"Error parsing {file_path}: {e}")
 
-        # Second pass: Find symbol references across files
-        for file_path, content in self.file_contents.items():
-            file_language = self._detect_language(file_path)
-            self._find_references_in_file(file_path, content, file_language)
+        self.graph.add_nodes_from(tree_nodes)
+        self.graph.add_edges_from(tree_edges)
+
+    def _analyze_files_in_workers(self, workers: int) -> None:
+        """Analyze every read file in worker processes and merge the results in file order."""
+        lookups = {file_path: self._lookup_analysis(file_path, content)
+                   for file_path, content in self.file_contents.items()}
+        # Only files without cached results are sent to the workers
+        file_paths = [file_path for file_path, (_, cached) in lookups.items() if cached is None]
+        languages = [self.file_languages[file_path] for file_path in file_paths]
+        contents = [self.file_contents[file_path] for file_path in file_paths]
+
+        # Spawned workers start from a clean interpreter instead of a copy of
+        # this process and its graph
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            results = pool.map(_analyze_in_worker, repeat(self.root_dir), file_paths,
+                               contents, languages, chunksize=32)
+
+            for file_path, (digest, cached) in lookups.items():
+                self._set_analysis(file_path, *(cached if cached is not None else next(results)))
+                self._record_analysis(file_path, digest)
+
+    def _analyze_file_cached(self, file_path: str, content: str, language: str) -> None:
+        """Analyze a file, reusing the cached results when its content is unchanged."""
+        digest, cached = self._lookup_analysis(file_path, content)
+        if cached is not None:
+            self._set_analysis(file_path, *cached)
+        else:
+            self._analyze_file(file_path, content, language)
+        self._record_analysis(file_path, digest)
+
+    def _lookup_analysis(self, file_path: str, content: str) -> Tuple[Optional[bytes], Optional[Tuple]]:
+        """Return the content digest of a file and its cached analysis if the digest matches."""
+        if self._analyses is None:
+            return None, None
+        digest = hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+        cached = self._previous_analyses.get(file_path)
+        if cached is not None and cached[0] == digest:
+            return digest, cached[1:]
+        return digest, None
+
+    def _set_analysis(self, file_path: str, imports: Optional[list], symbols: Optional[dict],
+                      references: Optional[list]) -> None:
+        """Store the results of analyzing a file; None marks results it did not produce."""
+        if imports is not None:
+            self.import_relations[file_path] = imports
+        if symbols is not None:
+            self.module_symbols[file_path] = symbols
+        if references is not None:
+            self._python_references[file_path] = references
 
-        # Build the symbol index after all analyses
-        self._build_symbol_index()
+    def _record_analysis(self, file_path: str, digest: Optional[bytes]) -> None:
+        """Remember a file's analysis results for the cache written at the end of the run."""
+        if digest is None:
+            return
+        self._analyses[file_path] = (digest,
+                                     self.import_relations.get(file_path),
+                                     self.module_symbols.get(file_path),
+                                     self._python_references.get(file_path))
+
+    def _load_analysis_cache(self) -> Dict[str, Tuple]:
+        """Load the per-file analysis results saved by a previous run."""
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cache = pickle.load(f)
+            if cache.get('version') == ANALYSIS_CACHE_VERSION:
+                return cache['files']
+        except Exception as e:
+            print(f"Ignoring unreadable analysis cache {self.cache_path}: {e}")
+        return {}
+
+    def _save_analysis_cache(self) -> None:
+        """Save this run's per-file analysis results to cache_path."""
+        try:
+            with open(self.cache_path, 'wb') as f:
+                pickle.dump({'version': ANALYSIS_CACHE_VERSION, 'files': self._analyses},
+                            f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError as e:
+            print(f"Error saving analysis cache {self.cache_path}: {e}")
+
+    @staticmethod
+    def _is_oversized(file_path: str) -> bool:
+        """Check whether a file is too large to analyze, such as generated or vendored code."""
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            # Let the read report the problem
+            return False
+        if size > MAX_FILE_BYTES:
+            print(f"Skipping {file_path}: {size} bytes exceeds the {MAX_FILE_BYTES} byte limit")
+            return True
+        return False
+
+    @staticmethod
+    def _read_file(file_path: str) -> str:
+        """Read a source file as text, ignoring undecodable bytes."""
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            return f.read()
 
     def _analyze_file(self, file_path: str, content: str, language: str) -> None:
         """Analyze a file for imports and symbols with line numbers and context."""
@@ -151,11 +438,25 @@ class CodebaseVisualizer:
             tree = ast.parse(content)
             imports = []
             symbols = {}
+            references = []
 
+            # Dispatch on the exact node class: ast.parse never produces
+            # subclasses, and most nodes are loads of names and attributes
             for node in ast.walk(tree):
+                node_type = type(node)
+
+                # Collect loaded names and attributes for the reference pass,
+                # so the file is not parsed and walked a second time
+                if node_type is ast.Name:
+                    if type(node.ctx) is ast.Load:
+                        references.append((node.id, node.lineno))
+                elif node_type is ast.Attribute:
+                    if type(node.ctx) is ast.Load:
+                        references.append((node.attr, node.lineno))
+
                 # Track imports
-                if isinstance(node, (ast.Import, ast.ImportFrom)):
-                    if isinstance(node, ast.Import):
+                elif node_type is ast.Import or node_type is ast.ImportFrom:
+                    if node_type is ast.Import:
                         for name in node.names:
                             imports.append((name.name, node.lineno))
                     else:  # ImportFrom
@@ -165,38 +466,37 @@ class CodebaseVisualizer:
                                 (f"{module}.{name.name}" if module else name.name, node.lineno))
 
                 # Track defined symbols with line numbers and context
-                elif isinstance(node, (ast.FunctionDef, ast.ClassDef, ast.Assign)):
-                    if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
-                        symbol_name = node.name
-                        symbol_type = 'class' if isinstance(
-                            node, ast.ClassDef) else 'function'
-                        line_no = node.lineno
-                        context = self._extract_python_node_source(
-                            content, node)
-
-                        symbols[symbol_name] = {
-                            'type': symbol_type,
-                            'line_no': line_no,
-                            'context': context,
-                            'docstring': ast.get_docstring(node)
-                        }
-                    elif isinstance(node, ast.Assign):
-                        # Handle variable assignments
-                        for target in node.targets:
-                            if isinstance(target, ast.Name):
-                                symbol_name = target.id
-                                line_no = node.lineno
-                                context = self._extract_python_node_source(
-                                    content, node)
-
-                                symbols[symbol_name] = {
-                                    'type': 'variable',
-                                    'line_no': line_no,
-                                    'context': context
-                                }
+                elif node_type is ast.FunctionDef or node_type is ast.ClassDef:
+                    symbol_name = node.name
+                    symbol_type = 'class' if node_type is ast.ClassDef else 'function'
+                    line_no = node.lineno
+                    context = self._extract_python_node_source(
+                        content, node)
+
+                    symbols[symbol_name] = {
+                        'type': symbol_type,
+                        'line_no': line_no,
+                        'context': context,
+                        'docstring': ast.get_docstring(node)
+                    }
+                elif node_type is ast.Assign:
+                    # Handle variable assignments
+                    for target in node.targets:
+                        if isinstance(target, ast.Name):
+                            symbol_name = target.id
+                            line_no = node.lineno
+                            context = self._extract_python_node_source(
+                                content, node)
+
+                            symbols[symbol_name] = {
+                                'type': 'variable',
+                                'line_no': line_no,
+                                'context': context
+                            }
 
             self.import_relations[file_path] = imports
             self.module_symbols[file_path] = symbols
+            self._python_references[file_path] = references
 
         except Exception as e:
             print(f"Error analyzing Python file {file_path}: {e}")
@@ -204,11 +504,10 @@ class CodebaseVisualizer:
     def _extract_python_node_source(self, source: str, node) -> str:
         """Extract the source code for a Python AST node."""
         try:
-            lines = source.splitlines()
             if hasattr(node, 'lineno') and hasattr(node, 'end_lineno'):
                 start = node.lineno - 1
                 end = getattr(node, 'end_lineno', start + 1)
-                return '\n'.join(lines[start:end])
+                return self._join_lines(source, start, end)
             return ""
         except Exception:
             return ""
@@ -218,24 +517,19 @@ class CodebaseVisualizer:
         imports = []
         symbols = {}
 
-        # Process content line by line
+        # Process content line by line. Each pattern needs a literal keyword, so a
+        # substring check skips the regex on the many lines that lack it
         lines = content.splitlines()
 
-        # Regular expressions for C/C++ code analysis
-        include_pattern = re.compile(r'#include\s+[<"]([^>"]+)[>"]')
-        class_pattern = re.compile(r'(?:class|struct)\s+(\w+)')
-        function_pattern = re.compile(
-            r'(\w+)\s*\([^)]*\)\s*(?:const|override|final|noexcept)?\s*(?:{|;)')
-        namespace_pattern = re.compile(r'namespace\s+(\w+)')
-
         for line_no, line in enumerate(lines, 1):
             # Find include statements
-            include_match = include_pattern.search(line)
+            include_match = CPP_INCLUDE_PATTERN.search(line) if '#include' in line else None
             if include_match:
                 imports.append((include_match.group(1), line_no))
 
             # Find class/struct definitions
-            class_match = class_pattern.search(line)
+            class_match = (CPP_CLASS_PATTERN.search(line)
+                           if ('class' in line or 'struct' in line) else None)
             if class_match:
                 class_name = class_match.group(1)
                 context = self._get_context_around_line(file_path, line_no)
@@ -246,7 +540,7 @@ class CodebaseVisualizer:
                 }
 
             # Find function definitions (simplified)
-            function_match = function_pattern.search(line)
+            function_match = CPP_FUNCTION_PATTERN.search(line) if '(' in line else None
             if function_match and not line.strip().startswith('#') and not line.strip().startswith('//'):
                 function_name = function_match.group(1)
                 # Skip some common keywords that might be mistaken for functions
@@ -259,7 +553,7 @@ class CodebaseVisualizer:
                     }
 
             # Find namespace definitions
-            namespace_match = namespace_pattern.search(line)
+            namespace_match = CPP_NAMESPACE_PATTERN.search(line) if 'namespace' in line else None
             if namespace_match:
                 namespace_name = namespace_match.group(1)
                 context = self._get_context_around_line(file_path, line_no)
@@ -280,31 +574,21 @@ class CodebaseVisualizer:
         # Process content line by line
         lines = content.splitlines()
 
-        # Regular expressions for Java code analysis
-        package_pattern = re.compile(r'package\s+([\w.]+)')
-        import_pattern = re.compile(r'import\s+([\w.]+(?:\.\*)?)')
-        class_pattern = re.compile(
-            r'(?:public|private|protected)?\s*(?:abstract|final)?\s*class\s+(\w+)')
-        interface_pattern = re.compile(
-            r'(?:public|private|protected)?\s*interface\s+(\w+)')
-        method_pattern = re.compile(
-            r'(?:public|private|protected)?\s*(?:static|final|abstract)?\s*(?:[\w<>[\],\s]+)\s+(\w+)\s*\([^)]*\)')
-
         for line_no, line in enumerate(lines, 1):
             # Find package declaration
-            package_match = package_pattern.search(line)
+            package_match = JAVA_PACKAGE_PATTERN.search(line) if 'package' in line else None
             if package_match:
                 package_name = package_match.group(1)
                 imports.append((package_name, line_no))
 
             # Find import statements
-            import_match = import_pattern.search(line)
+            import_match = JAVA_IMPORT_PATTERN.search(line) if 'import' in line else None
             if import_match:
                 import_name = import_match.group(1)
                 imports.append((import_name, line_no))
 
             # Find class definitions
-            class_match = class_pattern.search(line)
+            class_match = JAVA_CLASS_PATTERN.search(line) if 'class' in line else None
             if class_match:
                 class_name = class_match.group(1)
                 context = self._get_context_around_line(file_path, line_no)
@@ -315,7 +599,7 @@ class CodebaseVisualizer:
                 }
 
             # Find interface definitions
-            interface_match = interface_pattern.search(line)
+            interface_match = JAVA_INTERFACE_PATTERN.search(line) if 'interface' in line else None
             if interface_match:
                 interface_name = interface_match.group(1)
                 context = self._get_context_around_line(file_path, line_no)
@@ -326,7 +610,7 @@ class CodebaseVisualizer:
                 }
 
             # Find method definitions
-            method_match = method_pattern.search(line)
+            method_match = JAVA_METHOD_PATTERN.search(line) if '(' in line else None
             if method_match:
                 method_name = method_match.group(1)
                 # Skip some common keywords that might be mistaken for methods
@@ -349,32 +633,23 @@ class CodebaseVisualizer:
         # Process content line by line
         lines = content.splitlines()
 
-        # Regular expressions for Go code analysis
-        package_pattern = re.compile(r'package\s+(\w+)')
-        import_single_pattern = re.compile(r'import\s+"([^"]+)"')
-        import_multi_start_pattern = re.compile(r'import\s+\(')
-        import_multi_line_pattern = re.compile(r'\s*"([^"]+)"')
-        func_pattern = re.compile(r'func\s+(?:\([^)]+\)\s+)?(\w+)')
-        struct_pattern = re.compile(r'type\s+(\w+)\s+struct')
-        interface_pattern = re.compile(r'type\s+(\w+)\s+interface')
-
         in_import_block = False
 
         for line_no, line in enumerate(lines, 1):
             # Find package declaration
-            package_match = package_pattern.search(line)
+            package_match = GO_PACKAGE_PATTERN.search(line) if 'package' in line else None
             if package_match:
                 package_name = package_match.group(1)
                 imports.append((f"package {package_name}", line_no))
 
             # Handle single-line imports
-            import_match = import_single_pattern.search(line)
+            import_match = GO_IMPORT_SINGLE_PATTERN.search(line) if 'import' in line else None
             if import_match:
                 import_name = import_match.group(1)
                 imports.append((import_name, line_no))
 
             # Handle multi-line imports
-            if import_multi_start_pattern.search(line):
+            if 'import' in line and GO_IMPORT_MULTI_START_PATTERN.search(line):
                 in_import_block = True
                 continue
 
@@ -383,13 +658,13 @@ class CodebaseVisualizer:
                     in_import_block = False
                     continue
 
-                import_line_match = import_multi_line_pattern.search(line)
+                import_line_match = GO_IMPORT_MULTI_LINE_PATTERN.search(line)
                 if import_line_match:
                     import_name = import_line_match.group(1)
                     imports.append((import_name, line_no))
 
             # Find function definitions
-            func_match = func_pattern.search(line)
+            func_match = GO_FUNC_PATTERN.search(line) if 'func' in line else None
             if func_match:
                 func_name = func_match.group(1)
                 context = self._get_context_around_line(file_path, line_no)
@@ -400,7 +675,7 @@ class CodebaseVisualizer:
                 }
 
             # Find struct definitions
-            struct_match = struct_pattern.search(line)
+            struct_match = GO_STRUCT_PATTERN.search(line) if 'struct' in line else None
             if struct_match:
                 struct_name = struct_match.group(1)
                 context = self._get_context_around_line(file_path, line_no)
@@ -411,7 +686,7 @@ class CodebaseVisualizer:
                 }
 
             # Find interface definitions
-            interface_match = interface_pattern.search(line)
+            interface_match = GO_INTERFACE_PATTERN.search(line) if 'interface' in line else None
             if interface_match:
                 interface_name = interface_match.group(1)
                 context = self._get_context_around_line(file_path, line_no)
@@ -428,213 +703,111 @@ class CodebaseVisualizer:
         """Find references to symbols in a file based on its language."""
         if language == "python":
             self._find_references_in_python_file(file_path, content)
-        elif language == "cpp":
-            self._find_references_in_cpp_file(file_path, content)
-        elif language == "java":
-            self._find_references_in_java_file(file_path, content)
-        elif language == "go":
-            self._find_references_in_go_file(file_path, content)
+        elif language in REFERENCE_SKIP_PREFIXES:
+            self._find_references_by_pattern(
+                file_path, content, REFERENCE_SKIP_PREFIXES[language])
 
     def _find_references_in_python_file(self, file_path: str, content: str) -> None:
         """Find references to symbols in a Python file."""
+        # Names collected while the file was analyzed, in the same walk order
+        references = self._python_references.pop(file_path, None)
+        if references is not None:
+            for symbol_name, line_no in references:
+                self._add_reference(symbol_name, file_path, line_no)
+            return
+
         try:
             tree = ast.parse(content)
 
             for node in ast.walk(tree):
+                node_type = type(node)
+
                 # Find variable references
-                if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+                if node_type is ast.Name and type(node.ctx) is ast.Load:
                     symbol_name = node.id
                     line_no = node.lineno
 
                     # Track reference with context
-                    if symbol_name not in self.symbol_references:
-                        self.symbol_references[symbol_name] = []
-
-                    context = self._get_context_around_line(file_path, line_no)
-                    self.symbol_references[symbol_name].append(
-                        (file_path, line_no, context))
+                    self._add_reference(symbol_name, file_path, line_no)
 
                 # Find attribute references (e.g., obj.method())
-                elif isinstance(node, ast.Attribute) and isinstance(node.ctx, ast.Load):
+                elif node_type is ast.Attribute and type(node.ctx) is ast.Load:
                     attr_name = node.attr
                     line_no = node.lineno
 
-                    if attr_name not in self.symbol_references:
-                        self.symbol_references[attr_name] = []
-
-                    context = self._get_context_around_line(file_path, line_no)
-                    self.symbol_references[attr_name].append(
-                        (file_path, line_no, context))
+                    self._add_reference(attr_name, file_path, line_no)
 
         except Exception as e:
             print(f"Error finding references in Python file {file_path}: {e}")
 
-    def _find_references_in_cpp_file(self, file_path: str, content: str) -> None:
-        """Find references to symbols in a C/C++ file."""
-        # Get all symbol names from all files to check for references
-        all_symbols = set()
-        for symbols_dict in self.module_symbols.values():
-            all_symbols.update(symbols_dict.keys())
-
-         # Skip if no symbols to check or file is empty
-        if not all_symbols or not content:
-            return
-
-        # Pre-compile all regex patterns for symbols with meaningful length
-        symbol_patterns = {}
-        for symbol_name in all_symbols:
-            # Skip very short symbols that would cause many false positives
-            if len(symbol_name) > 2:
-                symbol_patterns[symbol_name] = re.compile(
-                    r'\b' + re.escape(symbol_name) + r'\b')
-
-        # Process content line by line
-        lines = content.splitlines()
-
-        # Skip definition lines for this file
-        definition_lines = {}
-        if file_path in self.module_symbols:
-            for symbol, details in self.module_symbols[file_path].items():
-                definition_lines[details['line_no']] = symbol
-
-        for line_no, line in enumerate(lines, 1):
-            # Skip comment lines and preprocessor directives
-            if (line.strip().startswith("//") or
-                line.strip().startswith("/*") or
-                    line.strip().startswith("#")):
-                continue
-
-            # Skip if this line is a symbol definition
-            if line_no in definition_lines:
-                continue
+    def _add_reference(self, symbol_name: str, file_path: str, line_no: int) -> None:
+        """Record a reference to a symbol with its context, once per file line."""
+        references = self.symbol_references.setdefault(symbol_name, {})
+        if (file_path, line_no) not in references:
+            references[(file_path, line_no)] = self._get_context_around_line(
+                file_path, line_no)
 
-            # Check for symbol references
-            for symbol_name, pattern in symbol_patterns.items():
-                if pattern.search(line):
-                    # Skip if this is a definition line for this symbol
-                    if (file_path in self.module_symbols and
-                        symbol_name in self.module_symbols[file_path] and
-                            self.module_symbols[file_path][symbol_name]['line_no'] == line_no):
-                        continue
-
-                    if symbol_name not in self.symbol_references:
-                        self.symbol_references[symbol_name] = []
+    def _compile_reference_patterns(self) -> Tuple[FrozenSet[str], List[Tuple[str, re.Pattern]]]:
+        """
+        Collect what is needed to find references to known symbols.
 
-                    context = self._get_context_around_line(file_path, line_no)
-                    self.symbol_references[symbol_name].append(
-                        (file_path, line_no, context))
-
-    def _find_references_in_java_file(self, file_path: str, content: str) -> None:
-        """Find references to symbols in a Java file."""
-        # Get all symbol names from all files to check for references
-        all_symbols = set()
-        for symbols_dict in self.module_symbols.values():
-            all_symbols.update(symbols_dict.keys())
-
-         # Skip if no symbols to check or file is empty
-        if not all_symbols or not content:
-            return
+        Identifier symbols are returned as a set to look up each line's tokens
+        in; symbols with other characters keep their own pattern. Very short
+        symbols are skipped to avoid false positives.
+        """
+        all_symbols = frozenset().union(
+            *(symbols_dict.keys() for symbols_dict in self.module_symbols.values()))
 
-        # Pre-compile all regex patterns for symbols with meaningful length
-        symbol_patterns = {}
+        words = set()
+        other_patterns = []
         for symbol_name in all_symbols:
-            # Skip very short symbols that would cause many false positives
-            if len(symbol_name) > 2:
-                symbol_patterns[symbol_name] = re.compile(
-                    r'\b' + re.escape(symbol_name) + r'\b')
-
-        # Process content line by line
-        lines = content.splitlines()
-
-        # Skip definition lines for this file
-        definition_lines = {}
-        if file_path in self.module_symbols:
-            for symbol, details in self.module_symbols[file_path].items():
-                definition_lines[details['line_no']] = symbol
-
-        for line_no, line in enumerate(lines, 1):
-            # Skip comment lines, imports, and package declarations
-            if (line.strip().startswith("//") or
-                line.strip().startswith("/*") or
-                line.strip().startswith("import ") or
-                    line.strip().startswith("package ")):
+            if len(symbol_name) <= 2:
                 continue
-
-            # Skip if this line is a symbol definition
-            if line_no in definition_lines:
-                continue
-
-            # Check for symbol references
-            for symbol_name, pattern in symbol_patterns.items():
-                if pattern.search(line):
-                    # Skip if this is a definition line for this symbol
-                    if (file_path in self.module_symbols and
-                        symbol_name in self.module_symbols[file_path] and
-                            self.module_symbols[file_path][symbol_name]['line_no'] == line_no):
-                        continue
-
-                    if symbol_name not in self.symbol_references:
-                        self.symbol_references[symbol_name] = []
-
-                    context = self._get_context_around_line(file_path, line_no)
-                    self.symbol_references[symbol_name].append(
-                        (file_path, line_no, context))
-
-    def _find_references_in_go_file(self, file_path: str, content: str) -> None:
-        """Find references to symbols in a Go file."""
-        # Get all symbol names from all files to check for references
-        all_symbols = set()
-        for symbols_dict in self.module_symbols.values():
-            all_symbols.update(symbols_dict.keys())
-
-         # Skip if no symbols to check or file is empty
-        if not all_symbols or not content:
+            if IDENTIFIER_PATTERN.fullmatch(symbol_name):
+                words.add(symbol_name)
+            else:
+                other_patterns.append(
+                    (symbol_name, re.compile(r'\b' + re.escape(symbol_name) + r'\b')))
+        return frozenset(words), other_patterns
+
+    def _find_references_by_pattern(self, file_path: str, content: str,
+                                    skip_prefixes: Tuple[str, ...]) -> None:
+        """Find references to known symbols line by line, skipping lines with the given prefixes."""
+        # Patterns are compiled once per pass in parse_files
+        patterns = self._reference_patterns
+        if patterns is None:
+            patterns = self._compile_reference_patterns()
+        words, other_patterns = patterns
+
+        # Skip if no symbols to check or file is empty
+        if (not words and not other_patterns) or not content:
             return
 
-        # Pre-compile all regex patterns
-        symbol_patterns = {}
-        for symbol_name in all_symbols:
-            # Only create patterns for symbols with reasonable length (avoid single-character symbols)
-            if len(symbol_name) > 2:
-                symbol_patterns[symbol_name] = re.compile(
-                    r'\b' + re.escape(symbol_name) + r'\b')
-
-        # Process content line by line
-        lines = content.splitlines()
-
         # Skip definition lines for this file
-        definition_lines = {}
+        definition_lines = set()
         if file_path in self.module_symbols:
-            for symbol, details in self.module_symbols[file_path].items():
-                definition_lines[details['line_no']] = symbol
+            for details in self.module_symbols[file_path].values():
+                definition_lines.add(details['line_no'])
 
-        for line_no, line in enumerate(lines, 1):
-            # Skip comment lines, imports, and package declarations
-            if (line.strip().startswith("//") or
-                line.strip().startswith("/*") or
-                line.strip().startswith("import ") or
-                    line.strip().startswith("package ")):
+        for line_no, line in enumerate(content.splitlines(), 1):
+            if line.strip().startswith(skip_prefixes):
                 continue
 
             # Skip if this line is a symbol definition
             if line_no in definition_lines:
                 continue
 
-            # Check for symbol references
-            for symbol_name, pattern in symbol_patterns.items():
+            # A \b-delimited identifier symbol is exactly one of the line's \w+
+            # tokens, so one tokenizer pass and set lookups find all of them.
+            # Each symbol is recorded once per line, in order of appearance
+            found = dict.fromkeys(
+                token for token in IDENTIFIER_PATTERN.findall(line) if token in words)
+            for symbol_name, pattern in other_patterns:
                 if pattern.search(line):
-                    # Skip if this is a definition line for this symbol
-                    if (file_path in self.module_symbols and
-                        symbol_name in self.module_symbols[file_path] and
-                            self.module_symbols[file_path][symbol_name]['line_no'] == line_no):
-                        continue
+                    found[symbol_name] = None
 
-                    if symbol_name not in self.symbol_references:
-                        self.symbol_references[symbol_name] = []
-
-                    context = self._get_context_around_line(file_path, line_no)
-                    self.symbol_references[symbol_name].append(
-                        (file_path, line_no, context))
+            for symbol_name in found:
+                self._add_reference(symbol_name, file_path, line_no)
 
     def _build_symbol_index(self) -> None:
         """Build a comprehensive index of all symbols and where they're defined/used."""
@@ -661,10 +834,14 @@ class CodebaseVisualizer:
             if symbol_name not in self.symbol_index:
                 self.symbol_index[symbol_name] = []
 
-            for file_path, line_no, context in references:
+            # Definition locations of this symbol, checked for every reference
+            definitions = {(ref['file'], ref['line_no'])
+                           for ref in self.symbol_index[symbol_name]
+                           if ref['type'] == 'definition'}
+
+            for (file_path, line_no), context in references.items():
                 # Avoid duplicating references if they're already in definitions
-                if not any(ref['file'] == file_path and ref['line_no'] == line_no and ref['type'] == 'definition'
-                           for ref in self.symbol_index.get(symbol_name, [])):
+                if (file_path, line_no) not in definitions:
                     self.symbol_index[symbol_name].append({
                         'file': file_path,
                         'type': 'reference',
@@ -672,132 +849,176 @@ class CodebaseVisualizer:
                         'context': context
                     })
 
-    def build_graph(self) -> nx.DiGraph:
-        """Build the NetworkX graph with enhanced node and edge information."""
-        # We've already added basic file and directory nodes during parsing
-        # Now add more detailed connections and data
-
-        # Add nodes for all directories (if not already added)
-        for directory in self.directories:
-            if not self.graph.has_node(directory):
-                self.graph.add_node(directory, type='directory')
-
-            # Ensure parent directories exist and are connected
-            parts = directory.split(os.sep)
-            for i in range(1, len(parts)):
-                parent_path = os.sep.join(parts[:i])
-                if parent_path and not self.graph.has_node(parent_path):
-                    self.graph.add_node(parent_path, type='directory')
-                    self.directories.add(parent_path)
-
-                # Connect parent to child directory
-                if parent_path:
-                    child_path = os.sep.join(parts[:i+1])
-                    self.graph.add_edge(
-                        parent_path, child_path, edge_type='contains_directory')
-
-        # Add nodes for all files with indices and code snippet nodes
-        for file_path, file_idx in self.file_index.items():
-            language = self._detect_language(file_path)
-
-            # Update file node if it exists, create it otherwise
-            if self.graph.has_node(file_path):
-                self.graph.nodes[file_path].update({
-                    'file_index': file_idx,
-                    'directory': os.path.dirname(file_path),
-                    'language': language
-                })
-            else:
-                self.graph.add_node(file_path,
-                                    type='file',
-                                    file_index=file_idx,
-                                    directory=os.path.dirname(file_path),
-                                    language=language)
-
-            # Connect file to its directory
-            directory = os.path.dirname(file_path)
-            if directory:
-                # Make sure the directory node exists
-                if not self.graph.has_node(directory):
-                    self.graph.add_node(directory, type='directory')
-                    self.directories.add(directory)
-
-                # Add edge from directory to file if it doesn't exist
-                if not self.graph.has_edge(directory, file_path):
-                    self.graph.add_edge(
-                        directory, file_path, edge_type='contains_file')
+    def build_graph(self, include_snippet_code: bool = True) -> nx.DiGraph:
+        """
+        Build the NetworkX graph with enhanced node and edge information.
+
+        With include_snippet_code=False, snippet nodes keep only their line
+        range and get_snippet_code derives their code from the file contents.
+        """
+        # Directory and file nodes, their containment edges and the file_index,
+        # directory and language attributes were all added during parsing
+
+        # Snippet and symbol nodes and their edges are collected in order and
+        # added in bulk, which avoids the per-call overhead of add_node/add_edge
+        content_nodes = []
+        content_edges = []
+
+        for file_path in self.file_index:
+            language = self.graph.nodes[file_path]['language']
+
+            # Count symbols per type on the file node so queries need not
+            # traverse every symbol edge to aggregate them
+            self.graph.nodes[file_path]['symbol_type_counts'] = dict(Counter(
+                details['type'] for details in self.module_symbols.get(file_path, {}).values()))
 
             # Create snippet nodes for the entire file
             if file_path in self.file_contents:
                 chunks = self._chunk_code(self.file_contents[file_path])
                 for idx, chunk_info in enumerate(chunks):
                     snippet_node = f"{file_path}::snippet::{idx}"
-                    self.graph.add_node(snippet_node,
-                                        type='snippet',
-                                        code_snippet=chunk_info['code_snippet'],
-                                        start_line=chunk_info['start_line'],
-                                        end_line=chunk_info['end_line'],
-                                        language=language)
+                    snippet_attrs = {
+                        'type': 'snippet',
+                        'code_snippet': chunk_info['code_snippet'],
+                        'start_line': chunk_info['start_line'],
+                        'end_line': chunk_info['end_line'],
+                        'language': language
+                    }
+                    if not include_snippet_code:
+                        del snippet_attrs['code_snippet']
+                    content_nodes.append((snippet_node, snippet_attrs))
                     # Connect file node to snippet node
-                    self.graph.add_edge(file_path, snippet_node,
-                                        edge_type='contains_snippet',
-                                        start_line=chunk_info['start_line'],
-                                        end_line=chunk_info['end_line'])
+                    content_edges.append((file_path, snippet_node, {
+                        'edge_type': 'contains_snippet',
+                        'start_line': chunk_info['start_line'],
+                        'end_line': chunk_info['end_line']
+                    }))
 
             # Add nodes for symbols in this file
             for symbol, details in self.module_symbols.get(file_path, {}).items():
                 symbol_node = f"{file_path}::{symbol}"
-                self.graph.add_node(symbol_node,
-                                    type='symbol',
-                                    symbol_type=details['type'],
-                                    line_number=details['line_no'],
-                                    context=details.get('context', ''),
-                                    docstring=details.get('docstring', ''))
-                self.graph.add_edge(file_path, symbol_node,
-                                    edge_type='defines',
-                                    line_number=details['line_no'])
-
-        # Add edges for imports with line numbers
+                content_nodes.append((symbol_node, {
+                    'type': 'symbol',
+                    'name': symbol,
+                    'symbol_type': details['type'],
+                    'line_number': details['line_no'],
+                    'context': details.get('context', ''),
+                    'docstring': details.get('docstring', '')
+                }))
+                content_edges.append((file_path, symbol_node, {
+                    'edge_type': 'defines',
+                    'line_number': details['line_no']
+                }))
+
+        self.graph.add_nodes_from(content_nodes)
+        self.graph.add_edges_from(content_edges)
+
+        # Files defining each symbol name, in module_symbols order, so imports and
+        # references resolve by lookup instead of scanning every file's symbols
+        symbol_files: Dict[str, List[str]] = {}
+        for target_file, symbols in self.module_symbols.items():
+            for symbol in symbols:
+                symbol_files.setdefault(symbol, []).append(target_file)
+
+        # Position of each file in module_symbols, to keep edges in that order
+        file_order = {target_file: i for i, target_file in enumerate(self.module_symbols)}
+
+        # Python imports match modules ending with them, found as a range of the
+        # sorted reversed module names; Java imports match the class names they
+        # start with, found by looking up each of their prefixes
+        python_modules = sorted((target_file.replace('.py', '')[::-1], target_file)
+                                for target_file in self.module_symbols)
+        reversed_modules = [reversed_module for reversed_module, _ in python_modules]
+        java_classes: Dict[str, List[str]] = {}
+        for target_file in self.module_symbols:
+            class_name = os.path.splitext(os.path.basename(target_file))[0]
+            java_classes.setdefault(class_name, []).append(target_file)
+
+        # Add edges for imports with line numbers. A file importing the same
+        # target repeatedly keeps one edge at its first position with the last
+        # import's attributes, as repeated add_edge calls would leave it
+        import_edges: Dict[Tuple[str, str], Dict] = {}
         for file_path, imports in self.import_relations.items():
+            language = self.file_languages.get(file_path) or self._detect_language(file_path)
             for imp, line_no in imports:
+                # For Python, handle module imports
+                if language == "python":
+                    reversed_imp = imp[::-1]
+                    module_targets = set()
+                    for i in range(bisect_left(reversed_modules, reversed_imp),
+                                   len(reversed_modules)):
+                        if not reversed_modules[i].startswith(reversed_imp):
+                            break
+                        module_targets.add(python_modules[i][1])
+                # For Java, handle package imports
+                elif language == "java":
+                    module_targets = {target_file
+                                      for end in range(len(imp) + 1)
+                                      for target_file in java_classes.get(imp[:end], ())}
+                else:
+                    module_targets = None
+
+                # Without module matches only files defining the symbol match
+                if not module_targets:
+                    for target_file in symbol_files.get(imp, ()):
+                        import_edges[file_path, f"{target_file}::{imp}"] = {
+                            'edge_type': 'import',
+                            'line_number': line_no
+                        }
+                    continue
+
                 # Look for matching files or symbols
-                for target_file, symbols in self.module_symbols.items():
-                    if imp in symbols:
-                        self.graph.add_edge(file_path,
-                                            f"{target_file}::{imp}",
-                                            edge_type='import',
-                                            line_number=line_no)
-                    # For Python, handle module imports
-                    elif self._detect_language(file_path) == "python" and target_file.replace('.py', '').endswith(imp):
-                        self.graph.add_edge(file_path,
-                                            target_file,
-                                            edge_type='import',
-                                            line_number=line_no)
-                    # For Java, handle package imports
-                    elif self._detect_language(file_path) == "java" and imp.startswith(os.path.splitext(os.path.basename(target_file))[0]):
-                        self.graph.add_edge(file_path,
-                                            target_file,
-                                            edge_type='import',
-                                            line_number=line_no)
+                for target_file in sorted(module_targets.union(symbol_files.get(imp, ())),
+                                          key=file_order.__getitem__):
+                    if imp in self.module_symbols[target_file]:
+                        import_edges[file_path, f"{target_file}::{imp}"] = {
+                            'edge_type': 'import',
+                            'line_number': line_no
+                        }
+                    else:
+                        import_edges[file_path, target_file] = {
+                            'edge_type': 'import',
+                            'line_number': line_no
+                        }
+
+        relation_edges = [(source, target, attrs)
+                          for (source, target), attrs in import_edges.items()]
 
         # Add edges for symbol references
         for symbol, references in self.symbol_references.items():
-            for file_path, line_no, context in references:
-                # Find symbol nodes that match this reference
-                for target_file, symbols in self.module_symbols.items():
-                    if symbol in symbols:
-                        # Create reference edge
-                        self.graph.add_edge(file_path,
-                                            f"{target_file}::{symbol}",
-                                            edge_type='references',
-                                            line_number=line_no,
-                                            context=context)
+            # Find symbol nodes that match this reference
+            target_files = symbol_files.get(symbol, ())
+            if not target_files:
+                continue
+
+            # A file gets one edge per target however often it references the
+            # symbol; it keeps the last line's context and lists every line
+            lines_by_file: Dict[str, List[int]] = {}
+            last_reference: Dict[str, Tuple[int, str]] = {}
+            for (file_path, line_no), context in references.items():
+                lines_by_file.setdefault(file_path, []).append(line_no)
+                last_reference[file_path] = (line_no, context)
+
+            for file_path, line_numbers in lines_by_file.items():
+                line_no, context = last_reference[file_path]
+                for target_file in target_files:
+                    # Create reference edge
+                    relation_edges.append((file_path, f"{target_file}::{symbol}", {
+                        'edge_type': 'references',
+                        'line_number': line_no,
+                        'line_numbers': sorted(line_numbers),
+                        'context': context
+                    }))
+
+        self.graph.add_edges_from(relation_edges)
 
         return self.graph
 
     def export_to_arango(self, url: str, username: str, password: str, db_name: str = "codebase",
                          graph_name: str = "Custom_Flask", node_collection: str = "nodes",
-                         edge_collection: str = "edges", overwrite: bool = False) -> None:
+                         edge_collection: str = "edges", overwrite: bool = False,
+                         batch_size: int = 5000, durable: bool = False,
+                         upload_workers: int = 4) -> None:
         """
         Export the NetworkX graph to ArangoDB.
 
@@ -810,7 +1031,15 @@ class CodebaseVisualizer:
             node_collection: Node collection name
             edge_collection: Edge collection name
             overwrite: Whether to overwrite existing database
+            batch_size: Number of documents sent per bulk import request
+            durable: Whether each bulk import waits for its documents to be
+                synced to disk; the export can simply be re-run after a crash
+            upload_workers: Number of bulk import requests sent concurrently
         """
+        # python-arango and its HTTP stack are imported only when talking to the
+        # database, so analysis worker processes do not load them
+        from arango import ArangoClient
+
         # Initialize ArangoDB client
         client = ArangoClient(hosts=url)
         sys_db = client.db('_system', username=username, password=password)
@@ -843,6 +1072,21 @@ class CodebaseVisualizer:
         else:
             edges = db.create_edge_collection(edge_collection)
 
+        # Index the type filters used by the queries, so lookups such as
+        # v.type == 'directory' are index range scans instead of full scans
+        nodes.add_index({'type': 'persistent', 'fields': ['type']})
+        # Serves the path prefix ranges the query system reads files by
+        nodes.add_index({'type': 'persistent', 'fields': ['type', 'path']})
+        edges.add_index({'type': 'persistent', 'fields': ['edge_type']})
+
+        # Keep hot documents of both collections in the in-memory cache, which
+        # every traversal made by the query system reads
+        for collection in (nodes, edges):
+            try:
+                collection.configure(cache_enabled=True)
+            except Exception as e:
+                print(f"Could not enable the document cache of {collection.name}: {e}")
+
         # Create or use existing graph
         if db.has_graph(graph_name):
             graph = db.graph(graph_name)
@@ -856,53 +1100,90 @@ class CodebaseVisualizer:
             )
 
         # Prepare nodes for ArangoDB (ensuring unique IDs)
-        node_mapping = {}  # Maps node names to ArangoDB keys
+        # Maps node names to sanitized ArangoDB keys
+        node_mapping = {node_name: _arango_key(node_name) for node_name in self.graph.nodes()}
 
         # Add nodes to ArangoDB
         print("Adding nodes to ArangoDB...")
-        for node_name, node_attrs in self.graph.nodes(data=True):
-            # Create a sanitized key for ArangoDB
-            key = re.sub(r'[^a-zA-Z0-9_\-]', '_', node_name)
-            node_mapping[node_name] = key
-
-            # Include all attributes and the original node name
-            node_data = {
-                '_key': key,
-                'original_name': node_name
-            }
-            node_data.update(node_attrs)
-
-            # Handle special data types for ArangoDB
-            for attr, value in node_data.items():
-                if isinstance(value, (set, tuple)):
-                    node_data[attr] = list(value)
-
-            # Insert the node
-            nodes.insert(node_data)
+        self._import_in_batches(nodes, self._arango_node_documents(node_mapping),
+                                batch_size, durable, upload_workers)
 
         # Add edges to ArangoDB
         print("Adding edges to ArangoDB...")
-        for src, dst, edge_attrs in self.graph.edges(data=True):
-            # Create edge with proper from/to
-            edge_data = {
-                '_from': f"{node_collection}/{node_mapping[src]}",
-                '_to': f"{node_collection}/{node_mapping[dst]}"
-            }
-            edge_data.update(edge_attrs)
-
-            # Handle special data types for ArangoDB
-            for attr, value in edge_data.items():
-                if isinstance(value, (set, tuple)):
-                    edge_data[attr] = list(value)
-
-            # Insert the edge
-            edges.insert(edge_data)
+        self._import_in_batches(edges, self._arango_edge_documents(node_mapping, node_collection),
+                                batch_size, durable, upload_workers)
 
         print(
             f"Exported graph to ArangoDB: {len(self.graph.nodes())} nodes and {len(self.graph.edges())} edges.")
 
+    def _arango_node_documents(self, node_mapping: Dict[str, str]) -> Iterator[Dict]:
+        """Yield an ArangoDB document for every graph node."""
+        for node_name, node_attrs in self.graph.nodes(data=True):
+            # Include all attributes and the original node name
+            node_data = {
+                '_key': node_mapping[node_name],
+                'original_name': node_name,
+                **node_attrs
+            }
+
+            # Snippets built without their code get it from the file contents
+            if node_attrs.get('type') == 'snippet' and 'code_snippet' not in node_attrs:
+                node_data['code_snippet'] = self.get_snippet_code(node_name)
+
+            yield self._to_arango_values(node_data)
+
+    def _arango_edge_documents(self, node_mapping: Dict[str, str],
+                               node_collection: str) -> Iterator[Dict]:
+        """Yield an ArangoDB edge document for every graph edge."""
+        # Document ids are the same for every edge touching a node
+        node_ids = {node_name: f"{node_collection}/{key}" for node_name, key in node_mapping.items()}
+        # adjacency() walks the successor dicts directly, without the
+        # per-edge tuple building of edges(data=True)
+        for src, neighbors in self.graph.adjacency():
+            for dst, edge_attrs in neighbors.items():
+                # Create edge with proper from/to
+                edge_data = {
+                    '_from': node_ids[src],
+                    '_to': node_ids[dst],
+                    **edge_attrs
+                }
+                yield self._to_arango_values(edge_data)
+
+    @staticmethod
+    def _to_arango_values(document: Dict) -> Dict:
+        """Convert sets and tuples in a document to lists for ArangoDB."""
+        for attr, value in document.items():
+            if isinstance(value, (set, tuple)):
+                document[attr] = list(value)
+        return document
+
+    @staticmethod
+    def _import_in_batches(collection, documents: Iterable[Dict], batch_size: int,
+                           sync: bool, workers: int = 1) -> None:
+        """
+        Insert documents into a collection with one bulk import per batch,
+        keeping up to workers imports in flight. Returns once all have finished.
+        """
+        documents = iter(documents)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            while True:
+                batch = list(islice(documents, batch_size))
+                if not batch:
+                    break
+
+                # Bound the batches held in memory to those being sent
+                if len(pending) >= workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                pending.add(pool.submit(collection.import_bulk, batch, sync=sync))
+
+            for future in pending:
+                future.result()
+
     def query_database(self, url: str, username: str, password: str, db_name: str = "codebase",
-                       query: str = None) -> List[Dict]:
+                       query: str = None, stream: bool = False) -> Union[List[Dict], Iterator[Dict]]:
         """
         Execute a query against the ArangoDB database.
 
@@ -912,27 +1193,34 @@ class CodebaseVisualizer:
             password: ArangoDB password
             db_name: Database name
             query: AQL query string
+            stream: Whether to return a lazily fetched server-side streaming
+                cursor instead of loading every result into a list
 
         Returns:
-            Query results as a list of dictionaries
+            Query results as a list of dictionaries, or an iterator over them
+            when streaming
         """
+        from arango import ArangoClient
+
         client = ArangoClient(hosts=url)
         db = client.db(db_name, username=username, password=password)
 
         if query is None:
-            # Default query to get basic statistics
+            # Default query to get basic statistics, counting without
+            # returning the documents themselves
             query = """
             RETURN {
-                "node_count": LENGTH(FOR v IN nodes RETURN v),
-                "edge_count": LENGTH(FOR e IN edges RETURN e),
-                "file_count": LENGTH(FOR v IN nodes FILTER v.type == 'file' RETURN v),
-                "directory_count": LENGTH(FOR v IN nodes FILTER v.type == 'directory' RETURN v),
-                "symbol_count": LENGTH(FOR v IN nodes FILTER v.type == 'symbol' RETURN v)
+                "node_count": LENGTH(nodes),
+                "edge_count": LENGTH(edges),
+                "file_count": COUNT(FOR v IN nodes FILTER v.type == 'file' RETURN 1),
+                "directory_count": COUNT(FOR v IN nodes FILTER v.type == 'directory' RETURN 1),
+                "symbol_count": COUNT(FOR v IN nodes FILTER v.type == 'symbol' RETURN 1)
             }
             """
 
-        cursor = db.aql.execute(query)
-        return [doc for doc in cursor]
+        if stream:
+            return db.aql.execute(query, stream=True)
+        return list(db.aql.execute(query))
 
     def export_to_json(self, output_path: str) -> None:
         """
@@ -941,29 +1229,36 @@ class CodebaseVisualizer:
         Args:
             output_path: Path to write the JSON file
         """
-        data = {
-            "nodes": [],
-            "edges": []
-        }
-
-        # Export nodes
-        for node_name, attrs in self.graph.nodes(data=True):
-            node_data = {"id": node_name}
-            node_data.update(attrs)
-            data["nodes"].append(node_data)
-
-        # Export edges
-        for src, dst, attrs in self.graph.edges(data=True):
-            edge_data = {
-                "source": src,
-                "target": dst
-            }
-            edge_data.update(attrs)
-            data["edges"].append(edge_data)
+        # Records are serialized and written one at a time, so the whole
+        # document never has to be held in memory
+        with open(output_path, 'wb') as f:
+            f.write(b'{\n  "nodes": [')
+
+            # Export nodes
+            separator = b'\n    '
+            for node_name, attrs in self.graph.nodes(data=True):
+                node_data = {"id": node_name}
+                node_data.update(attrs)
+                if attrs.get('type') == 'snippet' and 'code_snippet' not in attrs:
+                    node_data['code_snippet'] = self.get_snippet_code(node_name)
+                f.write(separator + orjson.dumps(node_data))
+                separator = b',\n    '
+
+            f.write(b'\n  ],\n  "edges": [')
+
+            # Export edges
+            separator = b'\n    '
+            for src, neighbors in self.graph.adjacency():
+                for dst, attrs in neighbors.items():
+                    edge_data = {
+                        "source": src,
+                        "target": dst
+                    }
+                    edge_data.update(attrs)
+                    f.write(separator + orjson.dumps(edge_data))
+                    separator = b',\n    '
 
-        # Write to file
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.write(b'\n  ]\n}\n')
 
         print(f"Exported graph to JSON file: {output_path}")
 
@@ -980,7 +1275,7 @@ class CodebaseVisualizer:
             "total_symbols": sum(len(symbols) for symbols in self.module_symbols.values()),
             "languages": {},
             "file_sizes": {
-                "min": float('inf'),
+                "min": 0,
                 "max": 0,
                 "avg": 0
             },
@@ -988,36 +1283,28 @@ class CodebaseVisualizer:
         }
 
         # Count files by language
-        for file_path in self.file_index:
-            lang = self._detect_language(file_path)
-            stats["languages"][lang] = stats["languages"].get(lang, 0) + 1
-
-            # Track file sizes
-            file_size = len(self.file_contents.get(file_path, ""))
-            stats["file_sizes"]["min"] = min(
-                stats["file_sizes"]["min"], file_size)
-            stats["file_sizes"]["max"] = max(
-                stats["file_sizes"]["max"], file_size)
-
-        # Calculate average file size
-        if stats["total_files"] > 0:
-            total_size = sum(len(content)
-                             for content in self.file_contents.values())
-            stats["file_sizes"]["avg"] = total_size / stats["total_files"]
-        else:
-            stats["file_sizes"]["min"] = 0
+        stats["languages"] = dict(Counter(
+            self.file_languages.get(file_path) or self._detect_language(file_path)
+            for file_path in self.file_index))
+
+        # Measure every indexed file once
+        file_sizes = [len(self.file_contents.get(file_path, "")) for file_path in self.file_index]
+
+        # Summarize file sizes; files that could not be read count as empty
+        if file_sizes:
+            stats["file_sizes"]["min"] = min(file_sizes)
+            stats["file_sizes"]["max"] = max(file_sizes)
+            stats["file_sizes"]["avg"] = sum(file_sizes) / len(file_sizes)
 
         # Count symbols by type
-        for symbols in self.module_symbols.values():
-            for symbol, details in symbols.items():
-                symbol_type = details.get("type", "unknown")
-                stats["symbol_types"][symbol_type] = stats["symbol_types"].get(
-                    symbol_type, 0) + 1
+        stats["symbol_types"] = dict(Counter(
+            details.get("type", "unknown")
+            for symbols in self.module_symbols.values() for details in symbols.values()))
 
         return stats
 
     def run_workflow(self, code_path: str, arango_url: str, username: str, password: str,
-                     db_name: str = "codebase") -> Dict:
+                     db_name: str = "codebase", workers: Optional[int] = None) -> Dict:
         """
         Run the complete workflow: parse files, build graph, export to ArangoDB, and analyze.
 
@@ -1027,6 +1314,7 @@ class CodebaseVisualizer:
             username: ArangoDB username
             password: ArangoDB password
             db_name: Database name
+            workers: Number of worker processes analyzing files, as for parse_files
 
         Returns:
             Analysis results
@@ -1034,7 +1322,7 @@ class CodebaseVisualizer:
         print(f"Processing codebase at: {code_path}")
 
         # Parse files
-        self.parse_files()
+        self.parse_files(workers=workers)
         print(
             f"Parsed {len(self.file_index)} files and {len(self.directories)} directories")
 
@@ -1088,11 +1376,8 @@ class CodebaseVisualizer:
         }
 
         # Check file extensions
-        for file_path in self.file_index:
-            _, ext = os.path.splitext(file_path)
-            ext = ext.lower()
-            report["files"]["extensions"][ext] = report["files"]["extensions"].get(
-                ext, 0) + 1
+        report["files"]["extensions"] = dict(Counter(
+            os.path.splitext(file_path)[1].lower() for file_path in self.file_index))
 
         # Check for supported extensions
         supported_exts = []
@@ -1104,30 +1389,27 @@ class CodebaseVisualizer:
                 "No files with supported extensions found.")
 
         # Check symbol types
-        for file_path, symbols in self.module_symbols.items():
-            for symbol_name, details in symbols.items():
-                symbol_type = details['type']
-                report["symbols"]["by_type"][symbol_type] = report["symbols"]["by_type"].get(
-                    symbol_type, 0) + 1
-
-                if len(report["symbols"]["samples"]) < 5:
-                    report["symbols"]["samples"].append({
-                        "name": symbol_name,
-                        "file": file_path,
-                        "type": symbol_type,
-                        "line": details['line_no']
-                    })
+        report["symbols"]["by_type"] = dict(Counter(
+            details['type'] for symbols in self.module_symbols.values() for details in symbols.values()))
+
+        # Sample the first 5 symbols
+        all_symbols = ((file_path, symbol_name, details)
+                       for file_path, symbols in self.module_symbols.items()
+                       for symbol_name, details in symbols.items())
+        for file_path, symbol_name, details in islice(all_symbols, 5):
+            report["symbols"]["samples"].append({
+                "name": symbol_name,
+                "file": file_path,
+                "type": details['type'],
+                "line": details['line_no']
+            })
 
         # Check graph node and edge types
-        for _, data in self.graph.nodes(data=True):
-            node_type = data.get('type', 'unknown')
-            report["graph"]["node_types"][node_type] = report["graph"]["node_types"].get(
-                node_type, 0) + 1
-
-        for _, _, data in self.graph.edges(data=True):
-            edge_type = data.get('edge_type', 'unknown')
-            report["graph"]["edge_types"][edge_type] = report["graph"]["edge_types"].get(
-                edge_type, 0) + 1
+        report["graph"]["node_types"] = dict(Counter(
+            data.get('type', 'unknown') for _, data in self.graph.nodes(data=True)))
+        report["graph"]["edge_types"] = dict(Counter(
+            data.get('edge_type', 'unknown')
+            for _, neighbors in self.graph.adjacency() for data in neighbors.values()))
 
         # Check if nodes match files and directories
         if report["graph"]["node_types"].get("file", 0) != report["files"]["count"]:
@@ -1159,3 +1441,36 @@ class CodebaseVisualizer:
                 )
 
         return report
+
+
+def _arango_key(node_name: str) -> str:
+    """Sanitize a node name into an ArangoDB _key, replacing disallowed characters with '_'."""
+    if node_name.isascii():
+        return node_name.translate(ARANGO_KEY_TRANSLATION)
+    return ARANGO_KEY_INVALID_PATTERN.sub('_', node_name)
+
+
+# Per-process visualizer reused by _analyze_in_worker for every file it is sent
+_worker_visualizer: Optional[CodebaseVisualizer] = None
+
+
+def _analyze_in_worker(root_dir: str, file_path: str, content: str,
+                       language: str) -> Tuple[Optional[list], Optional[dict], Optional[list]]:
+    """Analyze one file in a worker process and return its imports, symbols and Python references."""
+    global _worker_visualizer
+    if _worker_visualizer is None or _worker_visualizer.root_dir != root_dir:
+        _worker_visualizer = CodebaseVisualizer(root_dir)
+    visualizer = _worker_visualizer
+
+    # Only this file's content is needed for its contexts
+    visualizer.file_contents = {file_path: content}
+    visualizer._context_cache.clear()
+    visualizer._line_spans_cache.clear()
+    try:
+        visualizer._analyze_file(file_path, content, language)
+    except Exception as e:
+        print(f"Error parsing {os.path.join(root_dir, file_path)}: {e}")
+
+    return (visualizer.import_relations.pop(file_path, None),
+            visualizer.module_symbols.pop(file_path, None),
+            visualizer._python_references.pop(file_path, None))
@@ -1,14 +1,774 @@
 import os
-import json
-import traceback
-from typing import Dict, List, Optional, Union, Any
+import re
+import copy
+import sys
+import pickle
+import shelve
+import string
+import hashlib
+import inspect
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from operator import itemgetter
+from itertools import chain, islice
+from collections.abc import Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Union, Any, Iterator, Callable, Tuple
+import orjson
 from arango import ArangoClient
+from arango.aql import AQL
+from arango.exceptions import AQLQueryExecuteError
 from mistralai.client import MistralClient
-from mistralai.models.chat_completion import ChatMessage
+from mistralai.exceptions import MistralAPIException, MistralConnectionException
 from dotenv import load_dotenv
 
 
+logger = logging.getLogger(__name__)
+
+def _orjson_dumps(obj: Any) -> str:
+    """Serialize request bodies for python-arango, which expects a str"""
+    return orjson.dumps(obj).decode()
+
+
+def _prompt_json(obj: Any) -> str:
+    """Serialize a value embedded in an LLM prompt, tolerating non-str keys"""
+    return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+# Substrings the schema heuristics look for in attribute names. The lookahead
+# reports overlapping matches, so the result equals a series of `in` checks.
+_FIELD_HINT_RE = re.compile(
+    r'(?=(content|code|name|title|file|path|type|lang|snippet|def|decl|doc|comment|dir|folder))')
+
+
+@lru_cache(maxsize=256)
+def _field_hints(field: str) -> frozenset:
+    """
+    Classify an attribute name by the schema hints it contains
+
+    Args:
+        field: Document attribute name
+
+    Returns:
+        Set of hint substrings found in the lower-cased name
+    """
+    return frozenset(_FIELD_HINT_RE.findall(field.lower()))
+
+
+def _resolve_fields(sample_keys, name_field: str) -> Dict[str, Optional[str]]:
+    """
+    Work out which document attributes hold references and metadata
+
+    Applies the same name heuristics the cache used to run on every document,
+    once, against the keys of a sampled document.
+
+    Args:
+        sample_keys: Attribute names of a sampled document
+        name_field: Attribute already used as the record name
+
+    Returns:
+        Dictionary with file, lang, snippet, definition and doc attribute names (or None)
+    """
+    fields = {'file': None, 'lang': None, 'snippet': None,
+              'definition': None, 'doc': None}
+    for key in sample_keys:
+        hints = _field_hints(key)
+        if 'file' in hints and key != name_field and not fields['file']:
+            fields['file'] = key
+        if 'lang' in hints and not fields['lang']:
+            fields['lang'] = key
+        if 'snippet' in hints and not fields['snippet']:
+            fields['snippet'] = key
+        if 'def' in hints or 'decl' in hints:
+            # The last matching attribute wins, as before
+            fields['definition'] = key
+        elif ('doc' in hints or 'comment' in hints) and not fields['doc']:
+            fields['doc'] = key
+    return fields
+
+
+def _bound_vars(aql: str, bind_vars: Dict) -> Dict:
+    """
+    Keep only the bind parameters a query text references
+
+    ArangoDB rejects bind parameters that the query does not use, and whether
+    a query still touches the node collection depends on how its snippet
+    source clause was built.
+
+    Args:
+        aql: Query text
+        bind_vars: Candidate bind parameters
+
+    Returns:
+        The bind parameters referenced by the query
+    """
+    return {name: value for name, value in bind_vars.items()
+            if re.search(rf'@{re.escape(name)}\b', aql)}
+
+
+def _iter_with_prefetch(cursor) -> Iterator[Any]:
+    """
+    Iterate a python-arango cursor, fetching the next batch in the background
+
+    While the documents of the current batch are being consumed, the request for
+    the following batch is already in flight on a worker thread.
+
+    Args:
+        cursor: Cursor returned by db.aql.execute
+
+    Yields:
+        Documents in cursor order
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        while True:
+            batch = cursor.batch()
+            current = list(batch)
+            batch.clear()
+            pending = executor.submit(
+                cursor.fetch) if cursor.has_more() else None
+            yield from current
+            if pending is None:
+                return
+            pending.result()
+
+
+# Markdown code fence lines (``` or ```json) that models wrap around JSON answers
+_CODE_FENCE_RE = re.compile(r'^\s*```[\w-]*\s*$', re.M)
+
+
+def _parse_llm_json(content: str) -> Optional[Any]:
+    """
+    Parse the JSON object in an LLM answer
+
+    Code fences and any prose around the outermost braces are dropped before
+    parsing, so the common fenced answer parses on the first attempt.
+
+    Args:
+        content: Raw message content returned by the model
+
+    Returns:
+        The parsed value, or None if the content holds no valid JSON
+    """
+    text = _CODE_FENCE_RE.sub('', content).strip()
+    start = text.find('{')
+    end = text.rfind('}') + 1
+    if start != -1 and end > start:
+        text = text[start:end]
+    if not text:
+        return None
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        return None
+
+
+@lru_cache(maxsize=None)
+def _shared_mistral_client(api_key: str) -> MistralClient:
+    """
+    Return one Mistral client per API key for the whole process
+
+    The client keeps its HTTP connections alive in a pool, so sharing it between
+    query objects (the server builds one per request) saves a TLS handshake on
+    every chat call.
+
+    Args:
+        api_key: Mistral API key
+
+    Returns:
+        MistralClient for the key
+    """
+    client = MistralClient(api_key=api_key)
+
+    # Open the first connection now with a free model listing, so the first chat
+    # call does not pay for the TLS handshake
+    _llm_executor.submit(client.list_models)
+    return client
+
+
+@lru_cache(maxsize=None)
+def _shared_arango_client(host: str) -> ArangoClient:
+    """
+    Return one ArangoDB client per host for the whole process
+
+    Args:
+        host: ArangoDB server URL
+
+    Returns:
+        ArangoClient for the host
+    """
+    # orjson replaces the stdlib json codec for request and cursor payloads
+    return ArangoClient(hosts=host, serializer=_orjson_dumps, deserializer=orjson.loads)
+
+
+@lru_cache(maxsize=None)
+def _shared_arango_database(host: str, db_name: str, username: str, password: str):
+    """
+    Return one database connection per host, database and credentials
+
+    Each connection owns a pooled HTTP session, so sharing it between query
+    objects (the server builds one per request) keeps its TLS connections
+    alive instead of handshaking again for every chat request.
+
+    Args:
+        host: ArangoDB server URL
+        db_name: Database name
+        username: ArangoDB username
+        password: ArangoDB password
+
+    Returns:
+        StandardDatabase for the connection
+    """
+    return _shared_arango_client(host).db(db_name, username=username, password=password)
+
+
+@lru_cache(maxsize=65536)
+def _split_path(file_path: str) -> Tuple[str, str, Tuple[str, ...]]:
+    """
+    Split a file path into its directory, file name and components
+
+    Args:
+        file_path: Slash-separated file path
+
+    Returns:
+        Tuple of (directory, file name, path components); the directory is
+        empty for top-level files
+    """
+    parts = tuple(file_path.split('/'))
+    return '/'.join(parts[:-1]), parts[-1], parts
+
+
+def _line_order(cache: 'ColumnarCache', line_column: str) -> Callable[[str], tuple]:
+    """
+    Build a sort key that orders record keys by line number, then by key
+
+    Records without a line number sort after all others.
+
+    Args:
+        cache: Columnar cache holding the records
+        line_column: Column with the line numbers
+
+    Returns:
+        Function mapping a record key to its sort key
+    """
+    lines = cache.column(line_column)
+    rows = cache.key_to_row
+
+    def order(key: str) -> tuple:
+        line = lines[rows[key]]
+        if not isinstance(line, int):
+            return (True, 0, key)
+        return (False, line, key)
+
+    return order
+
+
+# Chat completions run on one bounded pool shared by all query objects, so a burst
+# of concurrent requests queues here instead of overrunning the API rate limit.
+# Identical requests that are already in flight share a single completion.
+LLM_MAX_CONCURRENCY = 48
+_llm_executor = ThreadPoolExecutor(
+    max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="mistral")
+_inflight_chats = {}
+_inflight_lock = threading.Lock()
+
+# One lock per shelve file, shared by every query object in the process: the
+# server builds one per request, and dbm files do not support concurrent writers
+_shelve_locks = {}
+_shelve_locks_lock = threading.Lock()
+
+
+def _shelve_lock(path: str) -> threading.Lock:
+    """Return the process-wide lock guarding the shelve file at path"""
+    path = os.path.abspath(path)
+    with _shelve_locks_lock:
+        lock = _shelve_locks.get(path)
+        if lock is None:
+            lock = _shelve_locks[path] = threading.Lock()
+        return lock
+
+
+# Guards for read-only introspection queries so an unexpected schema fails fast
+# instead of pinning the coordinator
+SAFE_QUERY_OPTIONS = {
+    'max_runtime': 30,
+    'memory_limit': 256 * 1024 * 1024,
+    'fail_on_warning': False,
+    'allow_dirty_read': True,
+}
+
+# Full-collection cache scans legitimately run longer and return more data
+SCAN_QUERY_OPTIONS = dict(SAFE_QUERY_OPTIONS, max_runtime=300, memory_limit=0)
+
+# Interactive lookups are bound queries, so reuse their plans, and their results
+# when the server runs the query results cache in on-demand mode.
+# Older python-arango releases do not accept the plan cache option.
+LOOKUP_QUERY_OPTIONS = {'cache': True}
+if 'use_plan_cache' in inspect.signature(AQL.execute).parameters:
+    LOOKUP_QUERY_OPTIONS['use_plan_cache'] = True
+
+# Introspection probes repeated with different bind values share one plan
+PROBE_QUERY_OPTIONS = dict(SAFE_QUERY_OPTIONS, **LOOKUP_QUERY_OPTIONS)
+
+# Large result sets are streamed in batches instead of being built in full on the
+# server; streaming queries bypass the results cache
+STREAM_QUERY_OPTIONS = {'stream': True, 'batch_size': 1000, 'ttl': 60}
+
+# Snippet attributes that may hold source code, in order of preference
+CODE_FIELD_CANDIDATES = ('code_snippet', 'code', 'snippet')
+
+# Definition patterns used by find_by_name when no symbol node matches,
+# as (text before the name, text after the name)
+FUNCTION_DEFINITION_PATTERNS = [
+    ("function ", ""),    # JavaScript
+    ("def ", ""),         # Python
+    ("", " = function"),  # JavaScript
+    ("const ", " = "),    # JavaScript arrow function
+    ("let ", " = "),      # JavaScript arrow function
+    ("var ", " = "),      # JavaScript arrow function
+    ("", "("),            # C/C++/Java method
+    ("func ", ""),        # Go
+]
+CLASS_DEFINITION_PATTERNS = [
+    ("class ", ""),       # Python/JavaScript/Java
+    ("interface ", ""),   # TypeScript/Java
+    ("struct ", ""),      # C/C++/Go
+    ("type ", " struct"),  # Go
+]
+
+# Snippet attributes returned with find_by_name symbol results; the rest of the
+# document is left on the server
+SNIPPET_RESULT_ATTRIBUTES = ['_key', 'type', 'name', 'start_line', 'end_line', 'language',
+                             *CODE_FIELD_CANDIDATES]
+
+# Prompt for symbol analysis; only the symbol kind, name and code vary per call
+SYMBOL_ANALYSIS_PROMPT = string.Template("""
+            Please analyze this $kind named '$name' from a codebase:
+            
+            $code_text
+            
+            Provide a JSON response with the following fields:
+            1. purpose: A clear description of what this $kind does
+            2. parameters: List of parameters with their types and purpose (if applicable)
+            3. return_value: What this $kind returns (if applicable)
+            4. dependencies: Other functions/classes/modules it depends on
+            5. usage_pattern: How this $kind is typically used
+            6. edge_cases: Potential edge cases or error handling
+            7. complexity: Analysis of time/space complexity (if applicable)
+            8. suggestions: Any improvements or best practices that could be applied
+            
+            Format your response as a valid JSON object without any extra text or markdown.
+            """)
+
+# System message opening every process_query conversation. It is identical
+# across calls, so providers that cache prompt prefixes can reuse it
+ASSISTANT_PREAMBLE = "You are a codebase assistant that helps users find information in their codebase."
+
+# Prompt explaining a function result to the user; the query, the model's
+# understanding of it and the compact JSON result vary per call
+EXPLANATION_PROMPT = string.Template("""
+            User Query: $query
+            
+            Understanding: $understanding
+            
+            Result: $result
+            
+            Please explain these results to the user in a clear, conversational way.
+            If results include code snippets, explain what the code does.
+            If there are multiple results, summarize the key findings.
+            Include specific details from the results to make your explanation concrete.
+            
+            Format your response as a conversation, not as JSON.
+            """)
+
+# Source file extensions used to tell file nodes from directory nodes by path
+SOURCE_EXTENSIONS = ['py', 'js', 'ts', 'java', 'c', 'cpp', 'cc', 'cxx',
+                     'h', 'hpp', 'hxx', 'go', 'rs', 'rb']
+
+# Politeness and articles, which never change what a question asks for; they
+# are ignored when matching rephrased questions against earlier answers
+QUERY_FILLER_WORDS = frozenset((
+    'a', 'an', 'the', 'me', 'us', 'i', 'you', 'please', 'can', 'could',
+    'would', 'will'
+))
+
+# Words that say what kind of answer is wanted rather than what it is about;
+# they stay in signatures but do not rank result entries
+QUERY_INTENT_WORDS = frozenset((
+    'this', 'that', 'these', 'those', 'my', 'our', 'tell', 'show', 'explain',
+    'describe', 'what', 'whats', 'does', 'do', 'is', 'are', 'in', 'of', 'for',
+    'about', 'codebase', 'code', 'repo', 'repository', 'project'
+))
+_QUERY_WORD_RE = re.compile(r'\w+')
+
+
+def _query_signature(query: str) -> Tuple[str, ...]:
+    """
+    Reduce a question to its words without filler, in order
+
+    Rephrasings that only differ in case, punctuation or filler words
+    ("can you show me foo?" / "show foo") share a signature, while questions
+    asking something else about the same names ("does parse call load?" /
+    "does load call parse?") do not.
+
+    Args:
+        query: Natural language question
+
+    Returns:
+        Tuple of the remaining words, empty if none are left
+    """
+    return tuple(word for word in _QUERY_WORD_RE.findall(query.lower())
+                 if word not in QUERY_FILLER_WORDS)
+
+
+def _trim_for_prompt(value: Any, max_items: int, max_chars: int) -> Any:
+    """
+    Shrink a result for embedding in a prompt
+
+    Args:
+        value: JSON-like value
+        max_items: Number of items kept from each list
+        max_chars: Number of characters kept from each string
+
+    Returns:
+        Copy of the value with lists and strings cut to the limits
+    """
+    if isinstance(value, str):
+        if len(value) <= max_chars:
+            return value
+        return value[:max_chars] + f"... [{len(value) - max_chars} more characters]"
+    if isinstance(value, dict):
+        return {key: _trim_for_prompt(item, max_items, max_chars)
+                for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        trimmed = [_trim_for_prompt(item, max_items, max_chars)
+                   for item in value[:max_items]]
+        if len(value) > max_items:
+            trimmed.append(f"... [{len(value) - max_items} more entries]")
+        return trimmed
+    return value
+
+
+class ColumnarCache(Mapping):
+    """
+    Read-mostly cache that stores records column-wise instead of as one dict per record.
+
+    Each record occupies one row across parallel column lists, and key_to_row maps a
+    record key to its row. Indexing by key still returns a plain dict, so callers can
+    treat the cache like the dict of dicts it replaces, while bulk scans can read a
+    single column directly.
+    """
+
+    def __init__(self, columns: List[str]):
+        """
+        Args:
+            columns: Names of the record fields stored as columns
+        """
+        self.columns = {name: [] for name in columns}
+        self.key_to_row = {}
+
+    def append(self, key: str, /, **values) -> int:
+        """
+        Add or replace the record for a key
+
+        Args:
+            key: Record key
+            values: Field values; missing columns are stored as empty strings
+
+        Returns:
+            Row index of the record
+        """
+        row = self.key_to_row.get(key)
+        if row is None:
+            row = len(self.key_to_row)
+            self.key_to_row[key] = row
+            for name, column in self.columns.items():
+                column.append(values.get(name, ""))
+        else:
+            for name, column in self.columns.items():
+                column[row] = values.get(name, "")
+        return row
+
+    def column(self, name: str) -> List:
+        """Return the list holding one field for every row"""
+        return self.columns[name]
+
+    def __setitem__(self, key: str, record: Dict):
+        self.append(key, **record)
+
+    def __getitem__(self, key: str) -> Dict:
+        row = self.key_to_row[key]
+        return {name: column[row] for name, column in self.columns.items()}
+
+    def __contains__(self, key) -> bool:
+        return key in self.key_to_row
+
+    def __iter__(self):
+        return iter(self.key_to_row)
+
+    def __len__(self) -> int:
+        return len(self.key_to_row)
+
+
+class LRUCache:
+    """Thread-safe, size-bounded mapping that evicts the least recently used entry."""
+
+    def __init__(self, maxsize: int = 2048, ttl: Optional[float] = None):
+        """
+        Args:
+            maxsize: Maximum number of entries kept in memory
+            ttl: Seconds an entry stays valid, or None to keep entries until evicted
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Return the cached value for key and mark it as recently used"""
+        with self._lock:
+            if key not in self._data:
+                return default
+            expires, value = self._data[key]
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key: Any, value: Any):
+        """Store a value, evicting the oldest entry when the cache is full"""
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class FileLoader:
+    """
+    Coalesces single-key file lookups into batched fetches.
+
+    Keys requested within a short window are collected and fetched together, either
+    by a background timer or as soon as max_batch keys are pending. Every caller gets
+    a Future for its own key, so concurrent lookups cost one query instead of many.
+    """
+
+    def __init__(self, fetch_many: Callable[[List[str]], Dict[str, Dict]],
+                 max_batch: int = 100, wait: float = 0.005):
+        """
+        Args:
+            fetch_many: Callable that takes a list of keys and returns a key -> record dict
+            max_batch: Number of pending keys that triggers an immediate fetch
+            wait: Seconds to wait for more keys before fetching a partial batch
+        """
+        self._fetch_many = fetch_many
+        self.max_batch = max_batch
+        self.wait = wait
+        self._pending = {}
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def load(self, key: str) -> Future:
+        """
+        Schedule a key for the next batch
+
+        Args:
+            key: Record key to fetch
+
+        Returns:
+            Future resolving to the record, or an empty dict if it does not exist
+        """
+        flush_now = False
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = Future()
+                self._pending[key] = future
+                if len(self._pending) >= self.max_batch:
+                    flush_now = True
+                elif self._timer is None:
+                    self._timer = threading.Timer(self.wait, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if flush_now:
+            self.flush()
+        return future
+
+    def flush(self):
+        """Fetch every pending key with one call and resolve the waiting futures"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return
+
+        try:
+            records = self._fetch_many(list(pending))
+        except Exception as e:
+            for future in pending.values():
+                future.set_exception(e)
+            return
+
+        for key, future in pending.items():
+            future.set_result(records.get(key, {}))
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a service whose circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast after repeated service failures.
+
+    After fail_max consecutive failures the breaker opens and every call raises
+    CircuitOpenError until reset_timeout seconds have passed. The next call is then
+    let through as a probe: success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, fail_max: int = 5, reset_timeout: float = 30.0,
+                 is_failure: Callable[[Exception], bool] = lambda e: True):
+        """
+        Args:
+            fail_max: Consecutive failures that open the breaker
+            reset_timeout: Seconds the breaker stays open before a probe call
+            is_failure: Tells service failures from errors caused by the request
+        """
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError if calls are currently blocked"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError(
+                    f"Service unavailable after {self._failures} consecutive failures")
+            # Let this call through as a probe; further calls wait for its outcome
+            self._opened_at = time.monotonic()
+
+    def record(self, error: Optional[Exception] = None):
+        """Record the outcome of a call; pass the raised exception on failure"""
+        with self._lock:
+            if error is None:
+                self._failures = 0
+                self._opened_at = None
+            elif self.is_failure(error):
+                self._failures += 1
+                if self._failures >= self.fail_max:
+                    self._opened_at = time.monotonic()
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """Call fn through the breaker and return its result"""
+        self.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.record(e)
+            raise
+        self.record()
+        return result
+
+
+def _is_mistral_outage(error: Exception) -> bool:
+    """True for Mistral errors that signal an unavailable service, not a bad request"""
+    if isinstance(error, MistralConnectionException):
+        return True
+    if isinstance(error, MistralAPIException):
+        status = getattr(error, 'http_status', None)
+        return status is None or status == 429 or status >= 500
+    return False
+
+
+# Shared by all query objects: once the API keeps failing (after the SDK's own
+# retries with backoff), requests fail fast instead of piling onto the pool
+_mistral_breaker = CircuitBreaker(
+    fail_max=5, reset_timeout=30.0, is_failure=_is_mistral_outage)
+
+
 class EnhancedCodebaseQuery:
+    # Worker count for running independent discovery queries concurrently
+    DISCOVERY_WORKERS = 4
+
+    # Number of LLM responses kept in memory in front of the on-disk cache
+    LLM_CACHE_SIZE = 2048
+
+    # Number of chat completions kept in memory, and for how many seconds
+    CHAT_CACHE_SIZE = 1024
+    CHAT_CACHE_TTL = 3600
+
+    # Seconds a stored process_query answer is reused, or None to keep it until
+    # the graph changes
+    QUERY_CACHE_TTL = 24 * 3600
+    # Stored answers kept on disk; past this count the oldest quarter is dropped
+    QUERY_CACHE_MAX_ENTRIES = 4096
+
+    # Functions process_query can dispatch to: name -> (parameter names, whether
+    # the first parameter is required). Missing parameters are passed as None.
+    QUERY_FUNCTIONS = {
+        'find_symbol_occurrences': (('symbol_name',), True),
+        'find_by_name': (('name', 'symbol_type'), True),
+        'analyze_symbol': (('name', 'symbol_type'), True),
+        'analyze_error': (('error_message',), True),
+        'search_code': (('term',), True),
+        'analyze_code_structure': (('path',), False),
+        'analyze_directory': (('path',), True),
+    }
+
+    # Maximum number of snippets search_code returns
+    SEARCH_RESULT_LIMIT = 500
+
+    # Number of files whose symbol counts are included in structure prompts
+    PROMPT_SYMBOL_FILES = 20
+
+    # Result entries and characters per string sent in explanation prompts
+    PROMPT_RESULT_ITEMS = 10
+    PROMPT_RESULT_CHARS = 2000
+
+    # Messages kept in conversation_history, messages of it sent with each
+    # query prompt, and characters each of those is clipped to
+    HISTORY_MAX_MESSAGES = 20
+    HISTORY_PROMPT_MESSAGES = 5
+    HISTORY_MESSAGE_CHARS = 1500
+
+    # Number of related snippets analyze_error sends to the LLM, and the lines
+    # kept on each side of the first line mentioning the error
+    ERROR_SNIPPET_LIMIT = 8
+    ERROR_SNIPPET_CONTEXT = 20
+
+    # Bumped whenever the layout of the persisted discovery changes, invalidating
+    # caches saved by older versions
+    DISCOVERY_CACHE_VERSION = 2
+
+    # Attributes produced by discovery that are persisted between runs
+    DISCOVERY_CACHE_ATTRS = (
+        'type_field', 'path_field', 'edge_type_field', 'db_schema',
+        'node_types', 'files', 'file_results', 'snippets', 'symbols', 'symbol_name_index',
+        'symbol_lookup_fields',
+        'file_to_snippets', 'file_to_symbols', 'snippet_to_symbols',
+        'adj_out', 'adj_in'
+    )
+
     def __init__(
         self,
         db_name: str = "_system",
@@ -17,7 +777,8 @@ class EnhancedCodebaseQuery:
         host: str = None,
         mistral_api_key: Optional[str] = None,
         model: str = "mistral-large-latest",
-        graph: str = None
+        graph: str = None,
+        cache_dir: Optional[str] = None
     ):
         """
         Initialize the codebase query system that dynamically discovers the graph structure.
@@ -30,11 +791,12 @@ class EnhancedCodebaseQuery:
             mistral_api_key: Mistral API key (if None, will try to get from environment)
             model: Mistral model to use
             graph: Graph name (if None, will try to discover the first available graph)
+            cache_dir: Directory for the persisted discovery cache (defaults to ~/.cache/scopium)
         """
         # Connect to ArangoDB
         if not host:
             host = os.environ.get("ARANGO_HOST", "http://localhost:8529")
-        self.client = ArangoClient(hosts=host)
+        self.client = _shared_arango_client(host)
 
         if not password:
             password = os.environ.get("ARANGO_PASSWORD")
@@ -42,7 +804,7 @@ class EnhancedCodebaseQuery:
                 raise ValueError(
                     "ArangoDB password not provided and not found in environment")
 
-        self.db = self.client.db(db_name, username=username, password=password)
+        self.db = _shared_arango_database(host, db_name, username, password)
 
         # Connect to Mistral API
         if mistral_api_key is None:
@@ -51,8 +813,8 @@ class EnhancedCodebaseQuery:
             raise ValueError(
                 "Mistral API key not provided and not found in environment")
 
-        # Initialize Mistral client
-        self.mistral_client = MistralClient(api_key=mistral_api_key)
+        # Initialize Mistral client, shared with other instances using the same key
+        self.mistral_client = _shared_mistral_client(mistral_api_key)
         self.model = model
 
         # Dynamically discover graph structure
@@ -64,27 +826,96 @@ class EnhancedCodebaseQuery:
         self._discover_graph_structure()
 
         # Initialize caches
-        self.files = {}
-        self.snippets = {}
-        self.symbols = {}
-
-        # Get schema information
-        self.db_schema = self._db_schema()
-
-        # Analyze node types
-        self.node_types = self._analyze_node_types()
-
+        self.files = ColumnarCache(
+            ["key", "directory", "file_name", "file_path", "language"])
+        self.snippets = ColumnarCache(
+            ["key", "snippet_name", "content", "file_key", "language", "start_line"])
+        self.symbols = ColumnarCache(
+            ["key", "symbol_name", "symbol_type", "file_key", "snippet_key",
+             "definition", "documentation", "line_number", "context"])
+
+        # File information exactly as the AQL file lookups return it, for the
+        # files whose path attribute makes that shape known
+        self.file_results = {}
         self.symbol_name_index = {}
+        # Attributes the symbol cache was keyed on: (name field, type field)
+        self.symbol_lookup_fields = (None, None)
         self.file_to_snippets = {}
         self.file_to_symbols = {}
         self.snippet_to_symbols = {}
 
-        # Initialize cache
-        self._initialize_cache()
+        # Edge adjacency keyed by document _id: _id -> [(neighbour _id, edge type)]
+        self.adj_out = {}
+        self.adj_in = {}
+
+        # Set once the caches hold the whole graph; partial caches never answer
+        # lookups on their own and are never persisted
+        self._cache_complete = False
+
+        # Reuse a previous discovery if the collections have not changed since
+        self.cache_dir = cache_dir or os.path.join(
+            os.path.expanduser("~"), ".cache", "scopium")
+        if not self._load_discovery_cache():
+            # Validate the schema to understand the field names
+            self._validate_schema()
+
+            # Get schema information
+            self.db_schema = self._db_schema()
+
+            # Analyze node types
+            self.node_types = self._analyze_node_types()
+
+            # Initialize cache
+            self._initialize_cache()
+
+            self._save_discovery_cache()
+
+        # Snippet attribute holding source code, embedded in AQL as an identifier
+        self.code_field = self._resolve_code_field()
+
+        # find_by_name query texts only depend on the schema, so build them once
+        self._find_by_name_queries = self._build_find_by_name_queries()
+
+        # Batches file lookups that miss the file cache
+        self._file_loader = FileLoader(self._fetch_files)
+
+        # get_database_structure output, rebuilt only after the caches change
+        self._db_structure_cache = None
+        self._db_structure_dirty = True
+
+        # Chat completions keyed by model and messages, kept for an hour
+        self._chat_cache = LRUCache(maxsize=self.CHAT_CACHE_SIZE, ttl=self.CHAT_CACHE_TTL)
+
+        # LLM responses keyed by a hash of their inputs, also persisted on disk
+        self._llm_cache = LRUCache(maxsize=self.LLM_CACHE_SIZE)
+        self._llm_cache_path = os.path.join(self.cache_dir, "llm_responses")
+        self._llm_cache_lock = _shelve_lock(self._llm_cache_path)
+
+        # process_query answers, persisted apart from the LLM responses so they
+        # can be expired and pruned on their own
+        self._query_cache_path = os.path.join(self.cache_dir, "query_answers")
+        self._query_cache_lock = _shelve_lock(self._query_cache_path)
+        # Rephrasing keys stored by this conversation, flushed on reset
+        self._session_query_keys = set()
 
         # Conversation history for contextual awareness
         self.conversation_history = []
 
+        # Build the structure summaries and directory index off the request path.
+        # The first query waits on this future rather than building them again.
+        self._warmed_up = Future()
+        threading.Thread(target=self._warm_up, name="scopium-warmup", daemon=True).start()
+
+    def _warm_up(self):
+        """Precompute the data the first process_query call would otherwise build"""
+        try:
+            self._llm_schema_summary(self.get_database_structure())
+            self._directory_index()
+        except Exception as e:
+            logger.warning("Warm-up failed: %s", e)
+        finally:
+            self._warmed_up.set_result(None)
+
     def _discover_graph_structure(self):
         """Dynamically discover the graph structure in ArangoDB with improved directory detection"""
         try:
@@ -97,13 +928,12 @@ class EnhancedCodebaseQuery:
 
             # If no edge definitions exist, set defaults and retry
             if not edge_definitions:
-                print(f"No edge definitions found, using default naming pattern")
+                logger.info("No edge definitions found, using default naming pattern")
                 self.node_collection = f"{self.graph_name}_node"
                 self.edge_collection = f"{self.graph_name}_node_to_{self.graph_name}_node"
-                print(
-                    f"Using default collections: Nodes={self.node_collection}, Edges={self.edge_collection}")
-                # Validate the schema to understand the field names
-                self._validate_schema()
+                logger.info(
+                    "Using default collections: Nodes=%s, Edges=%s",
+                    self.node_collection, self.edge_collection)
                 return
 
             # Get the edge collection
@@ -115,32 +945,117 @@ class EnhancedCodebaseQuery:
             if not from_collections:
                 # No 'from' collections, use defaults
                 self.node_collection = f"{self.graph_name}_nodes"
-                print(
-                    f"No 'from' collections found, using default node collection: {self.node_collection}")
+                logger.info(
+                    "No 'from' collections found, using default node collection: %s",
+                    self.node_collection)
             else:
                 self.node_collection = from_collections[0]
 
-            print(
-                f"Using collections: Nodes={self.node_collection}, Edges={self.edge_collection}")
-
-            # Validate the schema to understand the field names
-            self._validate_schema()
+            logger.info(
+                "Using collections: Nodes=%s, Edges=%s",
+                self.node_collection, self.edge_collection)
         except Exception as e:
-            print(f"Error discovering graph structure: {str(e)}")
-            traceback.print_exc()
+            logger.error(
+                "Error discovering graph structure: %s",
+                e, exc_info=logger.isEnabledFor(logging.DEBUG))
             raise
 
+    def _discovery_cache_path(self) -> Optional[str]:
+        """
+        Build the cache file path for the current state of the graph collections
+
+        File names start with a hash of the graph name, shared by every state of
+        the same graph, so stale files can be found and removed.
+
+        Returns:
+            Path of the pickle file, or None if the collection revisions are unavailable
+        """
+        # Also keys the stored process_query answers; None disables storing them
+        self.graph_revision = None
+        try:
+            node_rev = self.db.collection(self.node_collection).revision()
+            edge_rev = self.db.collection(self.edge_collection).revision()
+        except Exception as e:
+            logger.error("Error reading collection revisions: %s", e)
+            return None
+        self.graph_revision = f"{node_rev}|{edge_rev}"
+
+        graph_key = hashlib.blake2b(
+            str(self.graph_name).encode(), digest_size=8).hexdigest()
+        state_key = hashlib.blake2b(
+            f"{self.DISCOVERY_CACHE_VERSION}|{node_rev}|{edge_rev}".encode(),
+            digest_size=16).hexdigest()
+        return os.path.join(self.cache_dir, f"{graph_key}-{state_key}.pkl")
+
+    def _load_discovery_cache(self) -> bool:
+        """
+        Restore discovered schema and caches from a previous run
+
+        Returns:
+            True if the cache matched the current collections and was loaded
+        """
+        self._cache_path = self._discovery_cache_path()
+        if not self._cache_path or not os.path.exists(self._cache_path):
+            return False
+
+        try:
+            with open(self._cache_path, 'rb') as f:
+                state = pickle.load(f)
+            if state.get('version') != self.DISCOVERY_CACHE_VERSION:
+                return False
+            for attr in self.DISCOVERY_CACHE_ATTRS:
+                setattr(self, attr, state[attr])
+            self._cache_complete = True
+            logger.info("Loaded discovery cache from %s", self._cache_path)
+            return True
+        except Exception as e:
+            logger.error("Error loading discovery cache: %s", e)
+            return False
+
+    def _save_discovery_cache(self):
+        """Persist discovered schema and caches so the next start can skip discovery"""
+        if not self._cache_path or not self.node_types or not self._cache_complete:
+            return
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            state = {attr: getattr(self, attr)
+                     for attr in self.DISCOVERY_CACHE_ATTRS}
+            state['version'] = self.DISCOVERY_CACHE_VERSION
+            tmp_path = f"{self._cache_path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._cache_path)
+        except Exception as e:
+            logger.error("Error saving discovery cache: %s", e)
+            return
+
+        # Earlier states of the same graph can never match again
+        cache_name = os.path.basename(self._cache_path)
+        graph_prefix = cache_name.split('-', 1)[0] + '-'
+        for name in os.listdir(self.cache_dir):
+            if (name.startswith(graph_prefix) and name.endswith('.pkl')
+                    and name != cache_name):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError as e:
+                    logger.warning("Could not remove stale discovery cache %s: %s", name, e)
+
     def _validate_schema(self):
         """Validate the schema and identify the key field names used in this database"""
         try:
-            # Sample nodes to understand the schema
+            # Sample the attribute names of nodes and edges in one query to
+            # understand the schema, without transferring snippet code
             aql = f"""
-            FOR v IN {self.node_collection}
-            LIMIT 10
-            RETURN v
+            RETURN {{
+                nodes: (FOR v IN {self.node_collection} LIMIT 10 RETURN ATTRIBUTES(v)),
+                edges: (FOR e IN {self.edge_collection} LIMIT 10 RETURN ATTRIBUTES(e))
+            }}
             """
-            cursor = self.db.aql.execute(aql)
-            sample_nodes = [doc for doc in cursor]
+            cursor = self.db.aql.execute(aql, **SAFE_QUERY_OPTIONS)
+            samples = next(iter(cursor), None) or {}
+            sample_nodes = samples.get('nodes') or []
+            sample_edges = samples.get('edges') or []
 
             if not sample_nodes:
                 raise ValueError(
@@ -154,13 +1069,13 @@ class EnhancedCodebaseQuery:
                 for node in sample_nodes:
                     if field in node:
                         self.type_field = field
-                        print(f"Found type field: {field}")
+                        logger.debug("Found type field: %s", field)
                         break
                 if self.type_field:
                     break
 
             if not self.type_field:
-                print("Warning: Could not identify a type field in nodes")
+                logger.warning("Could not identify a type field in nodes")
 
             # Identify path field
             path_field_candidates = ['path', 'file_path', 'rel_path']
@@ -170,20 +1085,11 @@ class EnhancedCodebaseQuery:
                 for node in sample_nodes:
                     if field in node:
                         self.path_field = field
-                        print(f"Found path field: {field}")
+                        logger.debug("Found path field: %s", field)
                         break
                 if self.path_field:
                     break
 
-            # Sample edges to understand relationship types
-            aql = f"""
-            FOR e IN {self.edge_collection}
-            LIMIT 10
-            RETURN e
-            """
-            cursor = self.db.aql.execute(aql)
-            sample_edges = [doc for doc in cursor]
-
             # Identify edge type field
             edge_type_field_candidates = [
                 'edge_type', 'relation', 'relationship', 'type']
@@ -193,33 +1099,48 @@ class EnhancedCodebaseQuery:
                 for edge in sample_edges:
                     if field in edge:
                         self.edge_type_field = field
-                        print(f"Found edge type field: {field}")
+                        logger.debug("Found edge type field: %s", field)
                         break
                 if self.edge_type_field:
                     break
 
-            print(
-                f"Schema validation complete: type_field={self.type_field}, path_field={self.path_field}, edge_type_field={self.edge_type_field}")
+            logger.info(
+                "Schema validation complete: type_field=%s, path_field=%s, edge_type_field=%s",
+                self.type_field, self.path_field, self.edge_type_field)
 
         except Exception as e:
-            print(f"Error validating schema: {str(e)}")
-            traceback.print_exc()
+            logger.error(
+                "Error validating schema: %s",
+                e, exc_info=logger.isEnabledFor(logging.DEBUG))
 
     def _validate_node_types(self):
         """Validate that all necessary node types are accessible in the graph"""
         try:
-            # Check for directory nodes specifically
+            # Check for directory nodes and the edges connecting directories
+            # in a single round-trip
             aql = f"""
-            FOR v IN {self.node_collection}
-                FILTER v.type == 'directory'
-                LIMIT 1
-                RETURN v
+            RETURN {{
+                directories: (
+                    FOR v IN {self.node_collection}
+                        FILTER v.type == 'directory'
+                        LIMIT 1
+                        RETURN v._key
+                ),
+                dir_edges: (
+                    FOR e IN {self.edge_collection}
+                        FILTER e.edge_type == 'contains_directory'
+                        LIMIT 1
+                        RETURN e._key
+                )
+            }}
             """
-            cursor = self.db.aql.execute(aql)
-            directories = [doc for doc in cursor]
+            cursor = self.db.aql.execute(aql, **SAFE_QUERY_OPTIONS)
+            probes = next(iter(cursor), None) or {}
+            directories = probes.get('directories')
+            dir_edges = probes.get('dir_edges')
 
             if not directories:
-                print("Warning: No directory nodes found in the collection.")
+                logger.warning("No directory nodes found in the collection.")
                 # Try alternative fields
                 alternative_fields = ['ast_type', 'node_type']
                 for field in alternative_fields:
@@ -227,114 +1148,74 @@ class EnhancedCodebaseQuery:
                     FOR v IN {self.node_collection}
                         FILTER v.{field} == 'directory' OR v.{field} == 'Directory'
                         LIMIT 1
-                        RETURN v
+                        RETURN v._key
                     """
-                    cursor = self.db.aql.execute(aql)
+                    cursor = self.db.aql.execute(aql, **SAFE_QUERY_OPTIONS)
                     alternative_dirs = [doc for doc in cursor]
                     if alternative_dirs:
-                        print(
-                            f"Found directory nodes using alternate field: {field}")
+                        logger.debug(
+                            "Found directory nodes using alternate field: %s", field)
                         break
             else:
-                print(f"Found directory nodes successfully")
-
-            # Also check for edges that connect directories
-            aql = f"""
-            FOR e IN {self.edge_collection}
-                FILTER e.edge_type == 'contains_directory'
-                LIMIT 1
-                RETURN e
-            """
-            cursor = self.db.aql.execute(aql)
-            dir_edges = [doc for doc in cursor]
+                logger.debug("Found directory nodes successfully")
 
             if not dir_edges:
-                print(
-                    "Warning: No 'contains_directory' edges found in the edge collection.")
+                logger.warning(
+                    "No 'contains_directory' edges found in the edge collection.")
                 # Try alternative edge types
                 alt_edge_types = ['contains', 'has_directory', 'parent']
+                aql = """
+                FOR e IN @@edge_collection
+                    FILTER e.edge_type == @edge_type OR e.relation == @edge_type OR e.relationship == @edge_type
+                    FOR v1 IN @@node_collection
+                        FILTER v1._id == e._from
+                        FOR v2 IN @@node_collection
+                            FILTER v2._id == e._to
+                            FILTER (v1.type == 'directory' OR v2.type == 'directory')
+                            LIMIT 1
+                            RETURN e._key
+                """
                 for edge_type in alt_edge_types:
-                    aql = f"""
-                    FOR e IN {self.edge_collection}
-                        FILTER e.edge_type == '{edge_type}' OR e.relation == '{edge_type}' OR e.relationship == '{edge_type}'
-                        FOR v1 IN {self.node_collection}
-                            FILTER v1._id == e._from
-                            FOR v2 IN {self.node_collection}
-                                FILTER v2._id == e._to
-                                FILTER (v1.type == 'directory' OR v2.type == 'directory')
-                                LIMIT 1
-                                RETURN e
-                    """
-                    cursor = self.db.aql.execute(aql)
+                    cursor = self.db.aql.execute(
+                        aql,
+                        bind_vars={
+                            '@edge_collection': self.edge_collection,
+                            '@node_collection': self.node_collection,
+                            'edge_type': edge_type
+                        },
+                        **PROBE_QUERY_OPTIONS)
                     alt_dir_edges = [doc for doc in cursor]
                     if alt_dir_edges:
-                        print(
-                            f"Found directory edges using alternate edge type: {edge_type}")
+                        logger.debug(
+                            "Found directory edges using alternate edge type: %s",
+                            edge_type)
                         break
             else:
-                print(f"Found directory edge relationships successfully")
+                logger.debug("Found directory edge relationships successfully")
 
         except Exception as e:
-            print(f"Error validating node types: {str(e)}")
+            logger.error("Error validating node types: %s", e)
             # Not raising the exception here to allow the process to continue
 
     def _db_schema(self) -> Dict:
         """Get detailed schema information with better type understanding"""
         try:
-            # Basic schema information
-            collections = self.db.collections()
-            collection_names = [c['name']
-                                for c in collections if not c['name'].startswith('_')]
+            with ThreadPoolExecutor(max_workers=self.DISCOVERY_WORKERS) as executor:
+                # Basic schema information, fetched while the graphs are described
+                collections_future = executor.submit(self.db.collections)
 
-            # Get graphs
-            graphs = self.db.graphs()
-            graph_names = [g['name'] for g in graphs]
-            graph_details = []
-
-            for graph_name in graph_names:
-                graph = self.db.graph(graph_name)
-                graph_info = graph.properties()
-
-                # Get edge definitions for better understanding of relationships
-                edge_definitions = graph_info.get('edgeDefinitions', [])
-                enhanced_edge_defs = []
-
-                for edge_def in edge_definitions:
-                    collection = edge_def.get('collection', '')
-                    from_collections = edge_def.get('from', [])
-                    to_collections = edge_def.get('to', [])
-
-                    # Sample some edges to understand relationship types
-                    edge_samples = []
-                    if collection:
-                        try:
-                            cursor = self.db.aql.execute(
-                                f"FOR e IN {collection} LIMIT 5 RETURN e"
-                            )
-                            edge_samples = [edge for edge in cursor]
-                        except Exception as e:
-                            print(
-                                f"Error sampling edges from {collection}: {str(e)}")
-
-                    # Extract edge types if they exist
-                    edge_types = set()
-                    for edge in edge_samples:
-                        if 'edge_type' in edge:
-                            edge_types.add(edge['edge_type'])
-
-                    enhanced_edge_defs.append({
-                        'collection': collection,
-                        'from_collections': from_collections,
-                        'to_collections': to_collections,
-                        'edge_types': list(edge_types),
-                        'sample_count': len(edge_samples),
-                    })
+                # Get graphs
+                graphs = self.db.graphs()
+                graph_names = [g['name'] for g in graphs]
 
-                graph_details.append({
-                    'name': graph_info.get('name'),
-                    'edge_definitions': enhanced_edge_defs,
-                    'orphan_collections': graph_info.get('orphanCollections', [])
-                })
+                # Describe each graph concurrently; results keep graph order
+                graph_details = list(executor.map(
+                    self._describe_graph, graph_names))
+
+                collections = collections_future.result()
+
+            collection_names = [c['name']
+                                for c in collections if not c['name'].startswith('_')]
 
             return {
                 "Graph Schema": graph_details,
@@ -343,17 +1224,72 @@ class EnhancedCodebaseQuery:
                 "Type Relationships": []  # Will be filled later
             }
         except Exception as e:
-            print(f"Error getting enhanced schema: {str(e)}")
-            traceback.print_exc()
+            logger.error(
+                "Error getting enhanced schema: %s",
+                e, exc_info=logger.isEnabledFor(logging.DEBUG))
             return {"error": str(e)}
 
+    def _describe_graph(self, graph_name: str) -> Dict:
+        """
+        Describe a single graph's edge definitions with sampled edge types
+
+        Args:
+            graph_name: Name of the graph to describe
+
+        Returns:
+            Dictionary with the graph name, edge definitions and orphan collections
+        """
+        graph = self.db.graph(graph_name)
+        graph_info = graph.properties()
+
+        # Get edge definitions for better understanding of relationships
+        edge_definitions = graph_info.get('edgeDefinitions', [])
+        enhanced_edge_defs = []
+
+        for edge_def in edge_definitions:
+            collection = edge_def.get('collection', '')
+            from_collections = edge_def.get('from', [])
+            to_collections = edge_def.get('to', [])
+
+            # Sample some edges to understand relationship types
+            edge_samples = []
+            if collection:
+                try:
+                    cursor = self.db.aql.execute(
+                        f"FOR e IN {collection} LIMIT 5 RETURN e",
+                        **SAFE_QUERY_OPTIONS
+                    )
+                    edge_samples = [edge for edge in cursor]
+                except Exception as e:
+                    logger.error("Error sampling edges from %s: %s", collection, e)
+
+            # Extract edge types if they exist
+            edge_types = set()
+            for edge in edge_samples:
+                if 'edge_type' in edge:
+                    edge_types.add(edge['edge_type'])
+
+            enhanced_edge_defs.append({
+                'collection': collection,
+                'from_collections': from_collections,
+                'to_collections': to_collections,
+                'edge_types': list(edge_types),
+                'sample_count': len(edge_samples),
+            })
+
+        return {
+            'name': graph_info.get('name'),
+            'edge_definitions': enhanced_edge_defs,
+            'orphan_collections': graph_info.get('orphanCollections', [])
+        }
+
     def _analyze_node_types(self):
         """Analyze and cache the node types in the database using the detected schema fields"""
         node_types = {}
         try:
             # Use the detected type field
             if not self.type_field:
-                print(
+                logger.debug(
                     "No type field detected, trying to infer node types from other properties")
                 # Fallback logic to infer types
                 return self._infer_node_types()
@@ -368,10 +1304,16 @@ class EnhancedCodebaseQuery:
                     "count": count
                 }}
             """
-            cursor = self.db.aql.execute(aql)
+            cursor = self.db.aql.execute(aql, **SAFE_QUERY_OPTIONS)
             type_counts = [doc for doc in cursor]
 
             # For each node type, get a sample and analyze structure
+            sample_aql = """
+            FOR v IN @@node_collection
+                FILTER v[@type_field] == @node_type
+                LIMIT 1
+                RETURN v
+            """
             for type_info in type_counts:
                 node_type = type_info.get('type')
                 count = type_info.get('count', 0)
@@ -380,13 +1322,14 @@ class EnhancedCodebaseQuery:
                     continue
 
                 # Get a sample for this node type
-                aql = f"""
-                FOR v IN {self.node_collection}
-                    FILTER v.{self.type_field} == '{node_type}'
-                    LIMIT 1
-                    RETURN v
-                """
-                cursor = self.db.aql.execute(aql)
+                cursor = self.db.aql.execute(
+                    sample_aql,
+                    bind_vars={
+                        '@node_collection': self.node_collection,
+                        'type_field': self.type_field,
+                        'node_type': node_type
+                    },
+                    **PROBE_QUERY_OPTIONS)
                 samples = [doc for doc in cursor]
 
                 if not samples:
@@ -405,7 +1348,7 @@ class EnhancedCodebaseQuery:
                     'sample': sample
                 }
 
-                print(f"Type: {node_type}, Count: {count}")
+                logger.debug("Type: %s, Count: %s", node_type, count)
 
             # Update the db_schema with node types
             self.db_schema["Node Types"] = node_types
@@ -417,8 +1360,9 @@ class EnhancedCodebaseQuery:
 
             return node_types
         except Exception as e:
-            print(f"Error analyzing node types: {str(e)}")
-            traceback.print_exc()
+            logger.error(
+                "Error analyzing node types: %s",
+                e, exc_info=logger.isEnabledFor(logging.DEBUG))
             return {}
 
     def _analyze_type_relationships(self, node_types):
@@ -428,24 +1372,32 @@ class EnhancedCodebaseQuery:
             node_type_keys = list(node_types.keys())
 
             # For each node type pair, check if there are edges between them
+            aql = """
+            FOR v1 IN @@node_collection
+                FILTER v1.type == @from_type
+                LIMIT 1
+                FOR v2 IN @@node_collection
+                    FILTER v2.type == @to_type
+                    LIMIT 1
+                    FOR e IN @@edge_collection
+                        FILTER e._from == v1._id AND e._to == v2._id
+                        RETURN DISTINCT {
+                            "from_type": @from_type,
+                            "to_type": @to_type,
+                            "edge_type": e.edge_type
+                        }
+            """
             for from_type in node_type_keys:
                 for to_type in node_type_keys:
-                    aql = f"""
-                    FOR v1 IN {self.node_collection}
-                        FILTER v1.type == '{from_type}'
-                        LIMIT 1
-                        FOR v2 IN {self.node_collection}
-                            FILTER v2.type == '{to_type}'
-                            LIMIT 1
-                            FOR e IN {self.edge_collection}
-                                FILTER e._from == v1._id AND e._to == v2._id
-                                RETURN DISTINCT {{
-                                    "from_type": '{from_type}',
-                                    "to_type": '{to_type}',
-                                    "edge_type": e.edge_type
-                                }}
-                    """
-                    cursor = self.db.aql.execute(aql)
+                    cursor = self.db.aql.execute(
+                        aql,
+                        bind_vars={
+                            '@node_collection': self.node_collection,
+                            '@edge_collection': self.edge_collection,
+                            'from_type': from_type,
+                            'to_type': to_type
+                        },
+                        **PROBE_QUERY_OPTIONS)
                     relationships = [doc for doc in cursor]
 
                     for rel in relationships:
@@ -454,13 +1406,25 @@ class EnhancedCodebaseQuery:
             # Update db_schema with type relationships
             self.db_schema["Type Relationships"] = type_relationships
 
+        except AQLQueryExecuteError as e:
+            # Query guards tripped on an unexpected schema; skip this phase
+            logger.warning("Skipping type relationship analysis: %s", e)
         except Exception as e:
-            print(f"Error analyzing type relationships: {str(e)}")
-            traceback.print_exc()
+            logger.error(
+                "Error analyzing type relationships: %s",
+                e, exc_info=logger.isEnabledFor(logging.DEBUG))
 
     def _detect_special_type(self, type_name, node_types):
         """Try to detect special types like directories and files if they weren't found by regular means"""
         try:
+            bind_vars = {}
+
+            # Extensions are read from the last path segment only, and only when
+            # it has a dot, so a directory named like an extension is no file
+            let_str = ""
+            if self.path_field:
+                let_str = f'LET base_name = LAST(SPLIT(v.{self.path_field}, "/"))'
+
             # Different detection strategies based on type
             if type_name == 'directory':
                 # Look for nodes with directory-like properties
@@ -471,14 +1435,14 @@ class EnhancedCodebaseQuery:
                     filter_conditions.append(f'HAS(v, "{indicator}")')
 
                 if self.path_field:
-                    # Add condition that path doesn't end with file extension
-                    filter_conditions.append(
-                        f'NOT REGEX_TEST(v.{self.path_field}, "\\.[a-zA-Z0-9]+$")')
+                    # Add condition that the path has no file extension
+                    filter_conditions.append('NOT CONTAINS(base_name, ".")')
 
                 filter_str = " OR ".join(filter_conditions)
 
                 aql = f"""
                 FOR v IN {self.node_collection}
+                    {let_str}
                     FILTER {filter_str}
                     LIMIT 100
                     RETURN v
@@ -493,25 +1457,30 @@ class EnhancedCodebaseQuery:
                     filter_conditions.append(f'HAS(v, "{indicator}")')
 
                 if self.path_field:
-                    # Add condition that path ends with file extension
+                    # Add condition that path ends with a source file extension
                     filter_conditions.append(
-                        f'REGEX_TEST(v.{self.path_field}, "\\.[a-zA-Z0-9]+$")')
+                        '(CONTAINS(base_name, ".") AND '
+                        'LOWER(LAST(SPLIT(base_name, "."))) IN @extensions)')
+                    bind_vars['extensions'] = SOURCE_EXTENSIONS
 
                 filter_str = " OR ".join(filter_conditions)
 
                 aql = f"""
                 FOR v IN {self.node_collection}
+                    {let_str}
                     FILTER {filter_str}
                     LIMIT 100
                     RETURN v
                 """
 
-            cursor = self.db.aql.execute(aql)
+            cursor = self.db.aql.execute(
+                aql, bind_vars=bind_vars, **SAFE_QUERY_OPTIONS,
+                optimizer_rules=['+all'])
             detected_nodes = [doc for doc in cursor]
 
             if detected_nodes:
-                print(
-                    f"Detected {len(detected_nodes)} potential {type_name} nodes")
+                logger.info(
+                    "Detected %s potential %s nodes", len(detected_nodes), type_name)
 
                 # Use the first node as a sample
                 sample = detected_nodes[0]
@@ -523,12 +1492,12 @@ class EnhancedCodebaseQuery:
                     'sample': sample
                 }
 
-                print(f"Added inferred {type_name} type to node types")
+                logger.info("Added inferred %s type to node types", type_name)
             else:
-                print(f"Could not detect any {type_name} nodes")
+                logger.debug("Could not detect any %s nodes", type_name)
 
         except Exception as e:
-            print(f"Error detecting {type_name} nodes: {str(e)}")
+            logger.error("Error detecting %s nodes: %s", type_name, e)
 
     def _build_directory_structure(self) -> Dict:
         """
@@ -555,15 +1524,14 @@ class EnhancedCodebaseQuery:
                     "name": v.name
                 }}
             """
-            cursor = self.db.aql.execute(aql)
+            cursor = self.db.aql.execute(aql, **SAFE_QUERY_OPTIONS)
             directories = [doc for doc in cursor]
 
             # If no explicit directory nodes found, try to extract directories from file paths
             if not directories:
                 # Extract directories from file paths
                 all_directories = set()
-                for file_info in self.files.values():
-                    file_path = file_info.get("file_path", "")
+                for file_path in self.files.column("file_path"):
                     if file_path:
                         # Extract all parent directories
                         parts = file_path.split('/')
@@ -652,49 +1620,152 @@ class EnhancedCodebaseQuery:
                     })
 
         except Exception as e:
-            print(f"Error building directory structure: {str(e)}")
-            traceback.print_exc()
+            logger.error(
+                "Error building directory structure: %s",
+                e, exc_info=logger.isEnabledFor(logging.DEBUG))
 
         return directory_tree
 
     def _initialize_cache(self):
         """Initialize cache of files, code snippets, and symbols using detected schema fields"""
+        # Only a discovery that ran to the end is worth persisting
+        self._cache_complete = False
+        adjacency_loaded = None
         try:
-            # Initialize file cache
+            cache_types = [t for t in ('file', 'snippet', 'symbol')
+                           if t in self.node_types]
+            if not cache_types:
+                return
+
+            # Resolve file fields from the sampled file document
+            file_path_field = None
+            file_name_field = None
             if 'file' in self.node_types:
-                # Determine best field for file info
-                field_info = self.node_types['file']
+                sample = self.node_types['file'].get('sample', {})
+                for field in sample:
+                    hints = _field_hints(field)
+                    if 'path' in hints and not file_path_field:
+                        file_path_field = field
+                    elif ('name' in hints or 'file' in hints) and 'path' not in hints and not file_name_field:
+                        file_name_field = field
+
+            # Use detected fields or defaults
+            file_path_field = file_path_field or self.path_field or 'path'
+            file_name_field = file_name_field or 'file_name'
+
+            # Resolve snippet fields from the sampled snippet document
+            content_field = None
+            snippet_name_field = None
+            if 'snippet' in self.node_types:
+                sample = self.node_types['snippet'].get('sample', {})
+                for field in sample:
+                    hints = _field_hints(field)
+                    if ('content' in hints or 'code' in hints) and not content_field:
+                        content_field = field
+                    elif ('name' in hints or 'title' in hints) and not snippet_name_field:
+                        snippet_name_field = field
+
+            # Use detected fields or defaults
+            content_field = content_field or 'content'
+            snippet_name_field = snippet_name_field or 'snippet_name'
+            snippet_fields = _resolve_fields(
+                self.node_types.get('snippet', {}).get('sample', {}),
+                snippet_name_field)
+
+            # Resolve symbol fields from the sampled symbol document
+            symbol_name_field = None
+            type_name_field = None
+            if 'symbol' in self.node_types:
+                sample = self.node_types['symbol'].get('sample', {})
+                for field in sample:
+                    hints = _field_hints(field)
+                    if 'name' in hints and not symbol_name_field:
+                        symbol_name_field = field
+                    elif ('type' in hints and 'name' in hints) and not type_name_field:
+                        type_name_field = field
+
+                # Add fallback detection for symbol name field
+                if not symbol_name_field and 'context' in sample:
+                    symbol_name_field = 'context'
+                    logger.debug(
+                        "Using 'context' as fallback for symbol name field")
+
+            # Use detected fields or defaults
+            symbol_name_field = symbol_name_field or 'symbol_name'
+            type_name_field = type_name_field or 'symbol_type'
+            self.symbol_lookup_fields = (symbol_name_field, type_name_field)
+            symbol_fields = _resolve_fields(
+                self.node_types.get('symbol', {}).get('sample', {}),
+                symbol_name_field)
+
+            # One scan over the node collection, dispatched on the type field.
+            # The type field comes from a fixed candidate list, so it is safe
+            # to embed; values and the collection are bound.
+            type_field = self.type_field or 'type'
+            logger.debug(
+                "Using type_field: %s, symbol name_field: %s",
+                type_field, symbol_name_field)
+
+            # The edge scan only fills the adjacency dicts, so run it on its own
+            # connection while the node scan below is consumed
+            edge_loader = ThreadPoolExecutor(max_workers=1)
+            adjacency_loaded = edge_loader.submit(self._load_adjacency)
+            edge_loader.shutdown(wait=False)
+
+            aql = f"""
+            FOR v IN @@node_collection
+                FILTER v.{type_field} IN @types
+                RETURN v
+            """
+            cursor = self.db.aql.execute(
+                aql,
+                bind_vars={
+                    '@node_collection': self.node_collection,
+                    'types': cache_types
+                },
+                stream=True,
+                batch_size=10000,
+                ttl=600,
+                **SCAN_QUERY_OPTIONS
+            )
 
-                path_field = None
-                name_field = None
+            # Peek at the first document for debugging without materializing the cursor
+            docs = _iter_with_prefetch(cursor)
+            first = next(docs, None)
+            if first is not None:
+                logger.debug("First cached document fields: %s", list(first.keys()))
 
-                # Try to find the best fields for path and name
-                sample = field_info.get('sample', {})
-                for field in sample:
-                    lower_field = field.lower()
-                    if 'path' in lower_field and not path_field:
-                        path_field = field
-                    elif ('name' in lower_field or 'file' in lower_field) and 'path' not in lower_field and not name_field:
-                        name_field = field
-
-                # Use detected fields or defaults
-                path_field = path_field or self.path_field or 'path'
-                name_field = name_field or 'file_name'
-                type_field = field_info.get(
-                    'field') or self.type_field or 'type'
+            # Snippets whose language has to come from their file, resolved
+            # after the scan since files may arrive after their snippets
+            snippets_without_language = []
 
-                aql = f"""
-                FOR v IN {self.node_collection}
-                    FILTER v.{type_field} == 'file'
-                    RETURN v
-                """
-                cursor = self.db.aql.execute(aql)
+            # Progress counter, reported only when debug logging is enabled
+            processed_count = 0
+            log_progress = logger.isEnabledFor(logging.DEBUG)
 
-                # Process each file
-                for doc in cursor:
-                    file_key = doc.get('_key')
-                    file_path = doc.get(path_field, "")
-                    file_name = doc.get(name_field, "")
+            # Names and keys repeat across documents and indexes; interning
+            # shares one string object per value and speeds up dict probes
+            intern = sys.intern
+
+            # Low-cardinality values such as languages and symbol types get one
+            # shared object per distinct value through a string table
+            string_table = {}
+            share = string_table.setdefault
+
+            # Pull the always-present attributes with one C-level call per
+            # document; documents missing any of them fall back to dict.get
+            snippet_getter = itemgetter(
+                '_key', intern(content_field), intern(snippet_name_field))
+            symbol_getter = itemgetter(
+                '_key', intern(symbol_name_field), intern(type_name_field))
+
+            for doc in chain([first] if first is not None else [], docs):
+                doc_type = doc.get(type_field)
+
+                if doc_type == 'file':
+                    file_key = intern(doc.get('_key'))
+                    file_path = doc.get(file_path_field, "")
+                    file_name = doc.get(file_name_field, "")
 
                     if not file_path and not file_name:
                         continue
@@ -702,7 +1773,8 @@ class EnhancedCodebaseQuery:
                     if not file_path and file_name:
                         # Try to construct a path
                         for key in doc:
-                            if 'dir' in key.lower() or 'folder' in key.lower():
+                            hints = _field_hints(key)
+                            if 'dir' in hints or 'folder' in hints:
                                 directory = doc.get(key, "")
                                 file_path = f"{directory}/{file_name}" if directory else file_name
                                 break
@@ -721,242 +1793,242 @@ class EnhancedCodebaseQuery:
                         elif ext in ['c', 'cpp', 'h', 'hpp']:
                             language = 'c/c++'
 
-                    self.files[file_key] = {
-                        "key": file_key,
-                        "file_name": file_name,
-                        "file_path": file_path,
-                        "language": language
-                    }
-
-                print(f"Cached {len(self.files)} files")
-
-            # Initialize snippet cache
-            if 'snippet' in self.node_types:
-                # Determine best fields for snippet info
-                field_info = self.node_types['snippet']
-
-                content_field = None
-                name_field = None
-
-                # Try to find the best fields for content and name
-                sample = field_info.get('sample', {})
-                for field in sample:
-                    lower_field = field.lower()
-                    if ('content' in lower_field or 'code' in lower_field) and not content_field:
-                        content_field = field
-                    elif ('name' in lower_field or 'title' in lower_field) and not name_field:
-                        name_field = field
-
-                # Use detected fields or defaults
-                content_field = content_field or 'content'
-                name_field = name_field or 'snippet_name'
-                type_field = field_info.get(
-                    'field') or self.type_field or 'type'
-
-                aql = f"""
-                FOR v IN {self.node_collection}
-                    FILTER v.{type_field} == 'snippet'
-                    RETURN v
-                """
-                cursor = self.db.aql.execute(aql)
+                    self.files.append(
+                        file_key,
+                        key=file_key,
+                        directory=doc.get('directory'),
+                        file_name=file_name,
+                        file_path=file_path,
+                        language=language
+                    )
+                    if doc.get('path'):
+                        self.file_results[file_key] = {
+                            "key": file_key,
+                            "directory": doc.get('directory'),
+                            "file_name": doc.get('file_name'),
+                            "file_path": doc['path'],
+                            "language": doc.get('language')
+                        }
 
-                # Process each snippet
-                for doc in cursor:
-                    snippet_key = doc.get('_key')
-                    content = doc.get(content_field, "")
-                    snippet_name = doc.get(name_field, "")
+                elif doc_type == 'snippet':
+                    try:
+                        snippet_key, content, snippet_name = snippet_getter(doc)
+                    except KeyError:
+                        snippet_key = doc.get('_key')
+                        content = doc.get(content_field, "")
+                        snippet_name = doc.get(snippet_name_field, "")
 
                     if not content:
                         continue
 
-                    # Try to determine file relationship
-                    file_key = None
-                    for key in doc:
-                        if 'file' in key.lower() and key != name_field:
-                            file_key = doc.get(key)
-                            break
-
-                    # Try to determine language
-                    language = ""
-                    for key in doc:
-                        if 'lang' in key.lower():
-                            language = doc.get(key, "")
-                            break
-
-                    if not language and file_key in self.files:
-                        language = self.files[file_key].get('language', "")
-
-                    self.snippets[snippet_key] = {
-                        "key": snippet_key,
-                        "snippet_name": snippet_name,
-                        "content": content,
-                        "file_key": file_key,
-                        "language": language
-                    }
-
-                print(f"Cached {len(self.snippets)} code snippets")
-
-                # Initialize symbol cache
-                if 'symbol' in self.node_types:  # This is checking for an exact match with 'symbol'
-                    # Determine best fields for symbol info
-                    field_info = self.node_types['symbol']
-
-                    name_field = None
-                    type_name_field = None
-
-                    # Try to find the best fields for symbol name and symbol type
-                    sample = field_info.get('sample', {})
-                    for field in sample:
-                        lower_field = field.lower()
-                        if 'name' in lower_field and not name_field:
-                            name_field = field
-                        elif ('type' in lower_field and 'name' in lower_field) and not type_name_field:
-                            type_name_field = field
-
-                    # Add fallback detection for symbol name field
-                    if not name_field and 'context' in sample:
-                        name_field = 'context'
-                        print(f"Using 'context' as fallback for symbol name field")
-
-                    # Use detected fields or defaults
-                    name_field = name_field or 'symbol_name'
-                    type_name_field = type_name_field or 'symbol_type'
-                    type_field = field_info.get(
-                        'field') or self.type_field or 'type'
-
-                    print(
-                        f"Using name_field: {name_field}, type_field: {type_field}")
+                    # File relationship and language from the resolved fields
+                    file_key = doc.get(snippet_fields['file'])
+                    language = doc.get(snippet_fields['lang'], "")
+                    if isinstance(snippet_key, str):
+                        snippet_key = intern(snippet_key)
+                    if isinstance(file_key, str):
+                        file_key = intern(file_key)
+                    if isinstance(language, str):
+                        language = share(language, language)
+
+                    if not language:
+                        snippets_without_language.append(snippet_key)
+
+                    self.snippets.append(
+                        snippet_key,
+                        key=snippet_key,
+                        snippet_name=snippet_name,
+                        content=content,
+                        file_key=file_key,
+                        language=language,
+                        start_line=doc.get('start_line')
+                    )
 
-                    aql = f"""
-                    FOR v IN {self.node_collection}
-                        FILTER v.{type_field} == 'symbol'
-                        RETURN v
-                    """
-                    print(f"Symbol query: {aql}")
-                    cursor = self.db.aql.execute(aql)
-                    sample_symbols = [doc for doc in cursor]
-                    print(f"Sample symbol count: {len(sample_symbols)}")
-
-                    if sample_symbols:
-                        print(
-                            f"Sample symbol fields: {list(sample_symbols[0].keys())}")
-                        print(
-                            f"Sample symbol name value: {sample_symbols[0].get(name_field, 'NOT FOUND')}")
-                        print(
-                            f"Sample symbol type value: {sample_symbols[0].get(type_name_field, 'NOT FOUND')}")
-
-                    # Re-execute the query
-                    cursor = self.db.aql.execute(aql)
-
-                    # Process counter
-                    processed_count = 0
-
-                    # Process each symbol
-                    for doc in cursor:
+                elif doc_type == 'symbol':
+                    try:
+                        symbol_key, symbol_name, symbol_type = symbol_getter(doc)
+                    except KeyError:
                         symbol_key = doc.get('_key')
-                        symbol_name = doc.get(name_field, "")
+                        symbol_name = doc.get(symbol_name_field, "")
                         symbol_type = doc.get(type_name_field, "")
+                    symbol_key = intern(symbol_key)
+                    if isinstance(symbol_type, str):
+                        symbol_type = share(symbol_type, symbol_type)
 
+                    if not symbol_name:
+                        # Try context as a fallback
+                        symbol_name = doc.get('context', "")
                         if not symbol_name:
-                            # Try context as a fallback
-                            symbol_name = doc.get('context', "")
-                            if not symbol_name:
-                                continue
-
-                        # Try to determine file relationship
-                        file_key = None
-                        for key in doc:
-                            if 'file' in key.lower() and key != name_field:
-                                file_key = doc.get(key)
-                                break
-
-                        # Try to determine snippet relationship
-                        snippet_key = None
-                        for key in doc:
-                            if 'snippet' in key.lower():
-                                snippet_key = doc.get(key)
-                                break
+                            continue
+                    if isinstance(symbol_name, str):
+                        symbol_name = intern(symbol_name)
+
+                    # File and snippet relationships from the resolved fields
+                    file_key = doc.get(symbol_fields['file'])
+                    snippet_key = doc.get(symbol_fields['snippet'])
+                    if isinstance(file_key, str):
+                        file_key = intern(file_key)
+                    if isinstance(snippet_key, str):
+                        snippet_key = intern(snippet_key)
+
+                    # Definition and documentation, trying the known docstring field first
+                    definition = doc.get(symbol_fields['definition'], "")
+                    documentation = doc.get('docstring', "") or doc.get(
+                        symbol_fields['doc'], "")
+
+                    self.symbols.append(
+                        symbol_key,
+                        key=symbol_key,
+                        symbol_name=symbol_name,
+                        symbol_type=symbol_type,
+                        file_key=file_key,
+                        snippet_key=snippet_key,
+                        definition=definition,
+                        documentation=documentation,
+                        line_number=doc.get('line_number'),
+                        context=doc.get('context')
+                    )
 
-                        # Try to get definition and documentation
-                        definition = ""
-                        # Try the known docstring field first
-                        documentation = doc.get('docstring', "")
+                    # Index by name for quick lookups
+                    if symbol_name:
+                        if symbol_name not in self.symbol_name_index:
+                            self.symbol_name_index[symbol_name] = []
+                        self.symbol_name_index[symbol_name].append(
+                            symbol_key)
+
+                    processed_count += 1
+                    if log_progress and processed_count % 5000 == 0:
+                        logger.debug("Processed %s symbols so far", processed_count)
+
+            # The name index is read-only from here on; tuples drop list over-allocation
+            self.symbol_name_index = {
+                name: tuple(keys) for name, keys in self.symbol_name_index.items()}
+
+            # Fill in snippet languages from their files
+            file_languages = self.files.column('language')
+            snippet_files = self.snippets.column('file_key')
+            snippet_languages = self.snippets.column('language')
+            for snippet_key in snippets_without_language:
+                snippet_row = self.snippets.key_to_row[snippet_key]
+                row = self.files.key_to_row.get(snippet_files[snippet_row])
+                if row is not None:
+                    snippet_languages[snippet_row] = file_languages[row]
+
+            logger.info("Cached %s files", len(self.files))
+            logger.info("Cached %s code snippets", len(self.snippets))
+            logger.info("Cached %s symbols", len(self.symbols))
+
+            # Wait for the edge scan started above
+            adjacency_loaded.result()
 
-                        for key in doc:
-                            lower_key = key.lower()
-                            if 'def' in lower_key or 'decl' in lower_key:
-                                definition = doc.get(key, "")
-                            elif ('doc' in lower_key or 'comment' in lower_key) and not documentation:
-                                documentation = doc.get(key, "")
-
-                        self.symbols[symbol_key] = {
-                            "key": symbol_key,
-                            "symbol_name": symbol_name,
-                            "symbol_type": symbol_type,
-                            "file_key": file_key,
-                            "snippet_key": snippet_key,
-                            "definition": definition,
-                            "documentation": documentation
-                        }
+            # Build relationship indexes for faster traversal
+            self._build_relationship_indexes()
 
-                        # Index by name for quick lookups
-                        if symbol_name:
-                            if symbol_name not in self.symbol_name_index:
-                                self.symbol_name_index[symbol_name] = []
-                            self.symbol_name_index[symbol_name].append(
-                                symbol_key)
+            self._cache_complete = True
 
-                        processed_count += 1
-                        if processed_count % 200 == 0:
-                            print(
-                                f"Processed {processed_count} symbols so far")
+        except Exception as e:
+            logger.error(
+                "Error initializing cache: %s",
+                e, exc_info=logger.isEnabledFor(logging.DEBUG))
+        finally:
+            # Never return while the edge scan still fills the adjacency dicts;
+            # exception() waits for it without raising its error again
+            if adjacency_loaded is not None:
+                adjacency_loaded.exception()
+
+    def _load_adjacency(self):
+        """Load all edges in a single streamed scan into outgoing and incoming adjacency dicts"""
+        try:
+            aql = """
+            FOR e IN @@edge_collection
+                RETURN [e._from, e._to, e[@edge_type_field]]
+            """
+            cursor = self.db.aql.execute(
+                aql,
+                bind_vars={
+                    '@edge_collection': self.edge_collection,
+                    'edge_type_field': self.edge_type_field or 'edge_type'
+                },
+                **SCAN_QUERY_OPTIONS,
+                stream=True,
+                batch_size=50000
+            )
 
-                    print(f"Cached {len(self.symbols)} symbols")
+            adj_out = self.adj_out
+            adj_in = self.adj_in
+            for from_id, to_id, edge_type in _iter_with_prefetch(cursor):
+                adj_out.setdefault(from_id, []).append((to_id, edge_type))
+                adj_in.setdefault(to_id, []).append((from_id, edge_type))
 
-            # Build relationship indexes for faster traversal
-            self._build_relationship_indexes()
+            logger.info("Loaded adjacency for %s source nodes", len(adj_out))
 
         except Exception as e:
-            print(f"Error initializing cache: {str(e)}")
-            traceback.print_exc()
+            # Re-raised so the cache is not taken as complete without its edges
+            logger.error("Error loading edge adjacency: %s", e)
+            raise
 
     def _build_relationship_indexes(self):
         """Build indexes for quick relationship lookup between files, snippets and symbols"""
         try:
+            file_to_snippets = defaultdict(list)
+            file_to_symbols = defaultdict(list)
+            snippet_to_symbols = defaultdict(list)
+
             # Build file -> snippets index
-            for snippet_key, snippet in self.snippets.items():
-                file_key = snippet.get('file_key')
+            for snippet_key, file_key in zip(self.snippets.column('key'),
+                                             self.snippets.column('file_key')):
                 if file_key:
-                    if file_key not in self.file_to_snippets:
-                        self.file_to_snippets[file_key] = []
-                    self.file_to_snippets[file_key].append(snippet_key)
+                    file_to_snippets[file_key].append(snippet_key)
 
-            # Build file -> symbols index
-            for symbol_key, symbol in self.symbols.items():
-                file_key = symbol.get('file_key')
+            # Build file -> symbols and snippet -> symbols indexes in one pass
+            for symbol_key, file_key, snippet_key in zip(self.symbols.column('key'),
+                                                         self.symbols.column('file_key'),
+                                                         self.symbols.column('snippet_key')):
                 if file_key:
-                    if file_key not in self.file_to_symbols:
-                        self.file_to_symbols[file_key] = []
-                    self.file_to_symbols[file_key].append(symbol_key)
-
-            # Build snippet -> symbols index
-            for symbol_key, symbol in self.symbols.items():
-                snippet_key = symbol.get('snippet_key')
+                    file_to_symbols[file_key].append(symbol_key)
                 if snippet_key:
-                    if snippet_key not in self.snippet_to_symbols:
-                        self.snippet_to_symbols[snippet_key] = []
-                    self.snippet_to_symbols[snippet_key].append(symbol_key)
+                    snippet_to_symbols[snippet_key].append(symbol_key)
+
+            # Per-file entries are ordered by line once here, so readers get
+            # them in source order without sorting per query
+            snippet_order = _line_order(self.snippets, 'start_line')
+            symbol_order = _line_order(self.symbols, 'line_number')
 
-            print("Built relationship indexes for files, snippets, and symbols")
+            # Freeze into plain dicts of tuples; the indexes are read-only from here on
+            self.file_to_snippets = {
+                k: tuple(sorted(v, key=snippet_order)) for k, v in file_to_snippets.items()}
+            self.file_to_symbols = {
+                k: tuple(sorted(v, key=symbol_order)) for k, v in file_to_symbols.items()}
+            self.snippet_to_symbols = {
+                k: tuple(v) for k, v in snippet_to_symbols.items()}
+
+            logger.info("Built relationship indexes for files, snippets, and symbols")
 
         except Exception as e:
-            print(f"Error building relationship indexes: {str(e)}")
-            traceback.print_exc()
+            # Re-raised so the cache is not taken as complete without its indexes
+            logger.error("Error building relationship indexes: %s", e)
+            raise
+
+    def _resolve_code_field(self) -> str:
+        """
+        Pick the snippet attribute that holds source code from the sampled snippet
+
+        Returns:
+            One of CODE_FIELD_CANDIDATES, so it is safe to embed in AQL
+        """
+        snippet_sample = self.node_types.get('snippet', {}).get('sample', {})
+        for field in CODE_FIELD_CANDIDATES:
+            if field in snippet_sample:
+                return field
+        return CODE_FIELD_CANDIDATES[0]
 
     def get_file_by_key(self, file_key: str) -> Dict:
         """
         Helper method to retrieve file node by key
 
+        Cache misses go through the file loader, so concurrent lookups are
+        coalesced into a single query.
+
         Args:
             file_key: The key of the file node
 
@@ -967,30 +2039,49 @@ class EnhancedCodebaseQuery:
             return self.files[file_key]
 
         try:
-            aql = f"""
-            FOR file IN {self.node_collection}
-                FILTER file._key == '{file_key}' AND file.type == 'file'
-                RETURN {{
-                    "key": file._key,
-                    "directory": file.directory,
-                    "file_name": file.file_name,
-                    "file_path": file.path || (file.directory + '/' + file.file_name),
-                    "language": file.language
-                }}
-            """
-            cursor = self.db.aql.execute(aql)
-            files = [doc for doc in cursor]
-
-            if files:
-                self.files[file_key] = files[0]
-                return files[0]
-
-            return {}
+            return self._file_loader.load(file_key).result()
         except Exception as e:
-            print(f"Error retrieving file by key: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Error retrieving file by key: %s", e)
             return {}
 
+    def _fetch_files(self, file_keys: List[str]) -> Dict[str, Dict]:
+        """
+        Fetch file nodes for a batch of keys and add them to the file cache
+
+        Args:
+            file_keys: Keys of the file nodes
+
+        Returns:
+            Dict mapping each found key to its file information
+        """
+        aql = """
+        FOR file IN @@node_collection
+            FILTER file._key IN @keys AND file.type == 'file'
+            RETURN {
+                "key": file._key,
+                "directory": file.directory,
+                "file_name": file.file_name,
+                "file_path": file.path || (file.directory + '/' + file.file_name),
+                "language": file.language
+            }
+        """
+        cursor = self.db.aql.execute(
+            aql,
+            bind_vars={
+                '@node_collection': self.node_collection,
+                'keys': file_keys
+            },
+            **LOOKUP_QUERY_OPTIONS
+        )
+        found = {}
+        for doc in cursor:
+            if doc['key'] not in self.files:
+                self._db_structure_dirty = True
+            self.files[doc['key']] = doc
+            self.file_results[doc['key']] = doc
+            found[doc['key']] = self.files[doc['key']]
+        return found
+
     def find_symbol_occurrences(self, symbol_name: str) -> List[Dict]:
         """
         Find all occurrences of a symbol using both the symbol nodes and code snippets
@@ -1002,27 +2093,36 @@ class EnhancedCodebaseQuery:
             List of dictionaries containing symbol occurrences
         """
         results = []
+        bind_vars = {
+            '@node_collection': self.node_collection,
+            '@edge_collection': self.edge_collection,
+            'name': symbol_name
+        }
 
         try:
-            # Look for symbol nodes
+            # Look for symbol nodes, answering from the caches when they can
+            symbol_results = None
             if 'symbol' in self.node_types:
-                aql = f"""
-                FOR symbol IN {self.node_collection}
-                    FILTER symbol.type == 'symbol' AND symbol.name == '{symbol_name}'
+                symbol_results = self._cached_symbol_matches(symbol_name)
+            if symbol_results is not None:
+                results.extend(symbol_results)
+            elif 'symbol' in self.node_types:
+                aql = """
+                FOR symbol IN @@node_collection
+                    FILTER symbol.type == 'symbol' AND symbol.name == @name
                     LET file = (
-                        FOR edge IN {self.edge_collection}
-                            FILTER edge._to == symbol._id
-                            FOR file IN {self.node_collection}
-                                FILTER file._id == edge._from AND file.type == 'file'
-                                RETURN {{
-                                    "key": file._key,
-                                    "directory": file.directory,
-                                    "file_name": file.file_name,
-                                    "file_path": file.path || (file.directory + '/' + file.file_name),
-                                    "language": file.language
-                                }}
+                        FOR file IN 1..1 INBOUND symbol._id @@edge_collection
+                            OPTIONS {bfs: true, uniqueVertices: 'global'}
+                            FILTER file.type == 'file'
+                            RETURN {
+                                "key": file._key,
+                                "directory": file.directory,
+                                "file_name": file.file_name,
+                                "file_path": file.path || (file.directory + '/' + file.file_name),
+                                "language": file.language
+                            }
                     )
-                    RETURN {{
+                    RETURN {
                         "type": "symbol",
                         "name": symbol.name,
                         "symbol_type": symbol.symbol_type,
@@ -1030,60 +2130,213 @@ class EnhancedCodebaseQuery:
                         "context": symbol.context,
                         "docstring": symbol.docstring,
                         "file": LENGTH(file) > 0 ? file[0] : null
-                    }}
+                    }
                 """
-                cursor = self.db.aql.execute(aql)
+                cursor = self.db.aql.execute(
+                    aql, bind_vars=bind_vars, **LOOKUP_QUERY_OPTIONS)
                 symbol_results = [doc for doc in cursor]
                 results.extend(symbol_results)
 
             # Look for symbol occurrences in code snippets
             if 'snippet' in self.node_types:
-                # Determine the best attribute for code based on the sample
-                code_field = 'code_snippet'
-                snippet_sample = self.node_types.get(
-                    'snippet', {}).get('sample', {})
-
-                if 'code_snippet' in snippet_sample:
-                    code_field = 'code_snippet'
-                elif 'code' in snippet_sample:
-                    code_field = 'code'
-                elif 'snippet' in snippet_sample:
-                    code_field = 'snippet'
-
                 aql = f"""
-                FOR snippet IN {self.node_collection}
-                    FILTER snippet.type == 'snippet' AND snippet.{code_field} LIKE '%{symbol_name}%'
+                FOR snippet IN @@node_collection
+                    FILTER snippet.type == 'snippet'
+                    FILTER snippet.{self.code_field} LIKE CONCAT('%', @name, '%')
                     LET file = (
-                        FOR edge IN {self.edge_collection}
-                            FILTER edge._to == snippet._id
-                            FOR file IN {self.node_collection}
-                                FILTER file._id == edge._from AND file.type == 'file'
-                                RETURN {{
-                                    "key": file._key,
-                                    "directory": file.directory,
-                                    "file_name": file.file_name,
-                                    "file_path": file.path || (file.directory + '/' + file.file_name),
-                                    "language": file.language
-                                }}
+                        FOR file IN 1..1 INBOUND snippet._id @@edge_collection
+                            OPTIONS {{bfs: true, uniqueVertices: 'global'}}
+                            FILTER file.type == 'file'
+                            RETURN {{
+                                "key": file._key,
+                                "directory": file.directory,
+                                "file_name": file.file_name,
+                                "file_path": file.path || (file.directory + '/' + file.file_name),
+                                "language": file.language
+                            }}
                     )
                     RETURN {{
                         "type": "snippet",
-                        "code": snippet.{code_field},
+                        "code": snippet.{self.code_field},
                         "start_line": snippet.start_line,
                         "end_line": snippet.end_line,
                         "file": LENGTH(file) > 0 ? file[0] : null
                     }}
                 """
-                cursor = self.db.aql.execute(aql)
+                cursor = self.db.aql.execute(
+                    aql, bind_vars=bind_vars, **LOOKUP_QUERY_OPTIONS)
                 snippet_results = [doc for doc in cursor]
                 results.extend(snippet_results)
 
         except Exception as e:
-            print(f"Error finding symbol occurrences: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Error finding symbol occurrences: %s", e)
 
         return results
 
+    def _cached_symbol_matches(self, name: str, symbol_type: Optional[str] = None,
+                               with_snippet: bool = False) -> Optional[List[Dict]]:
+        """
+        Build symbol lookup results from the in-memory caches without querying
+
+        Mirrors the symbol queries of find_symbol_occurrences and find_by_name.
+        Whenever the caches cannot reproduce the query result exactly (incomplete
+        caches, names not read from the 'name' attribute, unknown neighbours, files
+        without a known query shape, attached snippets whose full document is
+        needed), None is returned and the caller queries instead.
+
+        Args:
+            name: Symbol name to match
+            symbol_type: Optional symbol type to match
+            with_snippet: Include the "snippet" field of find_by_name results
+
+        Returns:
+            List of symbol results, or None if the database has to be queried
+        """
+        if not self._cache_complete or self.symbol_lookup_fields != ('name', 'symbol_type'):
+            return None
+        symbol_keys = self.symbol_name_index.get(name)
+        if not symbol_keys:
+            return None
+
+        prefix = f"{self.node_collection}/"
+        results = []
+        for symbol_key in symbol_keys:
+            symbol = self.symbols[symbol_key]
+            # The cache falls back to the context when a symbol has no name
+            if symbol['symbol_name'] == symbol['context']:
+                return None
+            if symbol_type and symbol['symbol_type'] != symbol_type:
+                continue
+
+            symbol_id = prefix + symbol_key
+            file_info = None
+            for from_id, _ in self.adj_in.get(symbol_id, ()):
+                if not from_id.startswith(prefix):
+                    continue
+                from_key = from_id[len(prefix):]
+                if from_key in self.files:
+                    file_info = self.file_results.get(from_key)
+                    if file_info is None:
+                        return None
+                    file_info = dict(file_info)
+                    break
+                if from_key not in self.snippets and from_key not in self.symbols:
+                    return None
+
+            result = {
+                "type": "symbol",
+                "name": symbol['symbol_name'],
+                "symbol_type": symbol['symbol_type'],
+                "line_number": symbol['line_number'],
+                "context": symbol['context'],
+                "docstring": symbol['documentation'],
+                "file": file_info
+            }
+            if with_snippet:
+                for to_id, _ in self.adj_out.get(symbol_id, ()):
+                    if not to_id.startswith(prefix):
+                        continue
+                    to_key = to_id[len(prefix):]
+                    if to_key in self.snippets or not (
+                            to_key in self.files or to_key in self.symbols):
+                        return None
+                result["snippet"] = None
+            results.append(result)
+
+        return results
+
+    def _build_find_by_name_queries(self) -> Dict[str, Any]:
+        """
+        Build the AQL texts used by find_by_name
+
+        Names and symbol types are bind parameters, so each text stays byte-identical
+        between calls and its plan can be reused.
+
+        Returns:
+            Dictionary with the symbol queries (untyped/typed) and the snippet
+            fallback queries keyed by symbol type (None, 'function', 'class')
+        """
+        symbol_aql = """
+        FOR symbol IN @@node_collection
+            FILTER symbol.type == 'symbol' AND symbol.name == @name{type_filter}
+            LET file = (
+                FOR file IN 1..1 INBOUND symbol._id @@edge_collection
+                    OPTIONS {{bfs: true, uniqueVertices: 'global'}}
+                    FILTER file.type == 'file'
+                    RETURN {{
+                        "key": file._key,
+                        "directory": file.directory,
+                        "file_name": file.file_name,
+                        "file_path": file.path || (file.directory + '/' + file.file_name),
+                        "language": file.language
+                    }}
+            )
+            LET snippet = (
+                FOR snippet IN 1..1 OUTBOUND symbol._id @@edge_collection
+                    OPTIONS {{bfs: true, uniqueVertices: 'global'}}
+                    FILTER snippet.type == 'snippet'
+                    LIMIT 1
+                    RETURN KEEP(snippet, @snippet_attributes)
+            )
+            RETURN {{
+                "type": "symbol",
+                "name": symbol.name,
+                "symbol_type": symbol.symbol_type,
+                "line_number": symbol.line_number,
+                "context": symbol.context,
+                "docstring": symbol.docstring,
+                "file": LENGTH(file) > 0 ? file[0] : null,
+                "snippet": LENGTH(snippet) > 0 ? snippet[0] : null
+            }}
+        """
+
+        snippet_queries = {}
+        for symbol_type, patterns in (
+                (None, FUNCTION_DEFINITION_PATTERNS + CLASS_DEFINITION_PATTERNS),
+                ('function', FUNCTION_DEFINITION_PATTERNS),
+                ('class', CLASS_DEFINITION_PATTERNS)):
+            # Create a LIKE condition around the bound name for each pattern
+            like_filter = " OR ".join(
+                f"snippet.{self.code_field} LIKE CONCAT('%{before}', @name, '{after}%')"
+                for before, after in patterns)
+            snippet_queries[symbol_type] = f"""
+            FOR snippet IN @@node_collection
+                FILTER snippet.type == 'snippet'
+                FILTER {like_filter}
+                LET file = (
+                    FOR file IN 1..1 INBOUND snippet._id @@edge_collection
+                        OPTIONS {{bfs: true, uniqueVertices: 'global'}}
+                        FILTER file.type == 'file'
+                        RETURN {{
+                            "key": file._key,
+                            "directory": file.directory,
+                            "file_name": file.file_name,
+                            "file_path": file.path || (file.directory + '/' + file.file_name),
+                            "language": file.language
+                        }}
+                )
+                RETURN {{
+                    "type": "snippet",
+                    "code": snippet.{self.code_field},
+                    "start_line": snippet.start_line,
+                    "end_line": snippet.end_line,
+                    "file": LENGTH(file) > 0 ? file[0] : null
+                }}
+            """
+
+        # All snippet queries share the same parameters besides the name
+        self._snippet_bind_vars = {
+            '@node_collection': self.node_collection,
+            '@edge_collection': self.edge_collection
+        }
+
+        return {
+            'symbol': symbol_aql.format(type_filter=""),
+            'symbol_typed': symbol_aql.format(
+                type_filter=" AND symbol.symbol_type == @symbol_type"),
+            'snippet': snippet_queries
+        }
+
     def find_by_name(self, name: str, symbol_type: Optional[str] = None) -> List[Dict]:
         """
         Find function/class snippets by name with improved matching across all files
@@ -1098,121 +2351,44 @@ class EnhancedCodebaseQuery:
         results = []
 
         try:
-            # Look for symbol nodes first
+            # Look for symbol nodes first, answering from the caches when they can
+            symbol_results = None
             if 'symbol' in self.node_types:
-                type_filter = f" AND symbol.symbol_type == '{symbol_type}'" if symbol_type else ""
+                symbol_results = self._cached_symbol_matches(
+                    name, symbol_type, with_snippet=True)
+            if symbol_results is not None:
+                results.extend(symbol_results)
+            elif 'symbol' in self.node_types:
+                bind_vars = {
+                    '@node_collection': self.node_collection,
+                    '@edge_collection': self.edge_collection,
+                    'name': name,
+                    'snippet_attributes': SNIPPET_RESULT_ATTRIBUTES
+                }
+                aql = self._find_by_name_queries['symbol']
+                if symbol_type:
+                    aql = self._find_by_name_queries['symbol_typed']
+                    bind_vars['symbol_type'] = symbol_type
 
-                aql = f"""
-                FOR symbol IN {self.node_collection}
-                    FILTER symbol.type == 'symbol' AND symbol.name == '{name}'{type_filter}
-                    LET file = (
-                        FOR edge IN {self.edge_collection}
-                            FILTER edge._to == symbol._id
-                            FOR file IN {self.node_collection}
-                                FILTER file._id == edge._from AND file.type == 'file'
-                                RETURN {{
-                                    "key": file._key,
-                                    "directory": file.directory,
-                                    "file_name": file.file_name,
-                                    "file_path": file.path || (file.directory + '/' + file.file_name),
-                                    "language": file.language
-                                }}
-                    )
-                    LET snippet = (
-                        FOR edge IN {self.edge_collection}
-                            FILTER edge._from == symbol._id
-                            FOR snippet IN {self.node_collection}
-                                FILTER snippet._id == edge._to AND snippet.type == 'snippet'
-                                RETURN snippet
-                    )
-                    RETURN {{
-                        "type": "symbol",
-                        "name": symbol.name,
-                        "symbol_type": symbol.symbol_type,
-                        "line_number": symbol.line_number,
-                        "context": symbol.context,
-                        "docstring": symbol.docstring,
-                        "file": LENGTH(file) > 0 ? file[0] : null,
-                        "snippet": LENGTH(snippet) > 0 ? snippet[0] : null
-                    }}
-                """
-                cursor = self.db.aql.execute(aql)
+                cursor = self.db.aql.execute(
+                    aql, bind_vars=bind_vars, **LOOKUP_QUERY_OPTIONS)
                 symbol_results = [doc for doc in cursor]
                 results.extend(symbol_results)
 
-            # If no symbols found or symbol cache is empty, try fuzzy matching in snippets
-            if not results and 'snippet' in self.node_types:
-                # Determine the best attribute for code based on the sample
-                code_field = 'code_snippet'
-                snippet_sample = self.node_types.get(
-                    'snippet', {}).get('sample', {})
-
-                if 'code_snippet' in snippet_sample:
-                    code_field = 'code_snippet'
-                elif 'code' in snippet_sample:
-                    code_field = 'code'
-                elif 'snippet' in snippet_sample:
-                    code_field = 'snippet'
-
-                # Common patterns for function/class definitions in different languages
-                patterns = []
-
-                if not symbol_type or symbol_type == 'function':
-                    patterns.extend([
-                        f"function {name}",  # JavaScript
-                        f"def {name}",       # Python
-                        f"{name} = function",  # JavaScript
-                        f"const {name} = ",  # JavaScript arrow function
-                        f"let {name} = ",   # JavaScript arrow function
-                        f"var {name} = ",   # JavaScript arrow function
-                        f"{name}\\(",       # C/C++/Java method
-                        f"func {name}",     # Go
-                    ])
-
-                if not symbol_type or symbol_type == 'class':
-                    patterns.extend([
-                        f"class {name}",     # Python/JavaScript/Java
-                        f"interface {name}",  # TypeScript/Java
-                        f"struct {name}",    # C/C++/Go
-                        f"type {name} struct",  # Go
-                    ])
-
-                # Create LIKE conditions for each pattern
-                like_conditions = [
-                    f"snippet.{code_field} LIKE '%{pattern}%'" for pattern in patterns]
-                like_filter = " OR ".join(like_conditions)
-
-                aql = f"""
-                FOR snippet IN {self.node_collection}
-                    FILTER snippet.type == 'snippet' AND ({like_filter})
-                    LET file = (
-                        FOR edge IN {self.edge_collection}
-                            FILTER edge._to == snippet._id
-                            FOR file IN {self.node_collection}
-                                FILTER file._id == edge._from AND file.type == 'file'
-                                RETURN {{
-                                    "key": file._key,
-                                    "directory": file.directory,
-                                    "file_name": file.file_name,
-                                    "file_path": file.path || (file.directory + '/' + file.file_name),
-                                    "language": file.language
-                                }}
-                    )
-                    RETURN {{
-                        "type": "snippet",
-                        "code": snippet.{code_field},
-                        "start_line": snippet.start_line,
-                        "end_line": snippet.end_line,
-                        "file": LENGTH(file) > 0 ? file[0] : null
-                    }}
-                """
-                cursor = self.db.aql.execute(aql)
+            # If no symbols found or symbol cache is empty, try fuzzy matching in snippets.
+            # Only functions and classes have definition patterns to look for.
+            snippet_aql = self._find_by_name_queries['snippet'].get(symbol_type)
+            if not results and snippet_aql and 'snippet' in self.node_types:
+                cursor = self.db.aql.execute(
+                    snippet_aql,
+                    bind_vars=dict(self._snippet_bind_vars, name=name),
+                    **LOOKUP_QUERY_OPTIONS
+                )
                 snippet_results = [doc for doc in cursor]
                 results.extend(snippet_results)
 
         except Exception as e:
-            print(f"Error finding by name: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Error finding by name: %s", e)
 
         return results
 
@@ -1306,52 +2482,157 @@ class EnhancedCodebaseQuery:
             # Join all code with separators
             code_text = "\n\n" + "-" * 40 + "\n\n".join(all_code)
 
+            # Identical inputs give identical analyses, so reuse earlier responses
+            kind = symbol_type or 'symbol'
+            cache_key = hashlib.blake2b(
+                "\0".join((self.model, kind, name, code_text)).encode(),
+                digest_size=16
+            ).hexdigest()
+            cached = self._llm_cache_get(cache_key)
+            if cached is not None:
+                return cached
+
             # Create a prompt for the LLM
-            prompt = f"""
-            Please analyze this {symbol_type or 'symbol'} named '{name}' from a codebase:
-            
-            {code_text}
-            
-            Provide a JSON response with the following fields:
-            1. purpose: A clear description of what this {symbol_type or 'symbol'} does
-            2. parameters: List of parameters with their types and purpose (if applicable)
-            3. return_value: What this {symbol_type or 'symbol'} returns (if applicable)
-            4. dependencies: Other functions/classes/modules it depends on
-            5. usage_pattern: How this {symbol_type or 'symbol'} is typically used
-            6. edge_cases: Potential edge cases or error handling
-            7. complexity: Analysis of time/space complexity (if applicable)
-            8. suggestions: Any improvements or best practices that could be applied
-            
-            Format your response as a valid JSON object without any extra text or markdown.
-            """
+            prompt = SYMBOL_ANALYSIS_PROMPT.substitute(
+                kind=kind, name=name, code_text=code_text)
 
             # Create message for the LLM
             messages = [
-                ChatMessage(role="user", content=prompt)
+                {"role": "user", "content": prompt}
             ]
 
-            # Get completion from Mistral
-            chat_response = self.mistral_client.chat(
-                model=self.model,
-                messages=messages
-            )
+            # Get completion from Mistral (answers to identical messages are reused)
+            content = self._chat(messages)
 
-            # Extract the content from the response
-            content = chat_response.choices[0].message.content
+            # Try to parse the response as JSON, keeping the raw text otherwise
+            analysis = _parse_llm_json(content)
+            if analysis is None:
+                analysis = {"raw_analysis": content}
 
-            # Try to parse the response as JSON
-            try:
-                analysis = json.loads(content)
-                return analysis
-            except json.JSONDecodeError:
-                # If JSON parsing fails, return the raw text
-                return {"raw_analysis": content}
+            self._llm_cache_put(cache_key, analysis)
+            return analysis
 
         except Exception as e:
-            print(f"Error analyzing with LLM: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Error analyzing with LLM: %s", e)
             return {"error": str(e)}
 
+    def _chat(self, messages: List[Dict[str, str]]) -> str:
+        """
+        Get a chat completion, reusing the answer to an identical earlier or
+        concurrent request
+
+        Args:
+            messages: Chat messages as {"role", "content"} dicts
+
+        Returns:
+            Content of the completion message
+        """
+        payload = [self.model] + [[m["role"], m["content"]] for m in messages]
+        cache_key = hashlib.sha256(orjson.dumps(payload)).hexdigest()
+        content = self._chat_cache.get(cache_key)
+        if content is not None:
+            return content
+
+        # Join an identical request in flight, or dispatch a new one to the pool
+        with _inflight_lock:
+            future = _inflight_chats.get(cache_key)
+            owner = future is None
+            if owner:
+                future = _llm_executor.submit(
+                    _mistral_breaker.call,
+                    self.mistral_client.chat,
+                    model=self.model,
+                    messages=messages
+                )
+                _inflight_chats[cache_key] = future
+
+        try:
+            chat_response = future.result()
+        finally:
+            if owner:
+                with _inflight_lock:
+                    _inflight_chats.pop(cache_key, None)
+
+        content = chat_response.choices[0].message.content
+        if owner:
+            self._chat_cache.put(cache_key, content)
+        return content
+
+    def _chat_stream(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """
+        Stream a chat completion as it is generated
+
+        A cached answer to the same messages is yielded in one piece; otherwise
+        the streamed answer is cached once it is complete.
+
+        Args:
+            messages: Chat messages as {"role", "content"} dicts
+
+        Yields:
+            Pieces of the completion text in order
+        """
+        payload = [self.model] + [[m["role"], m["content"]] for m in messages]
+        cache_key = hashlib.sha256(orjson.dumps(payload)).hexdigest()
+        content = self._chat_cache.get(cache_key)
+        if content is not None:
+            yield content
+            return
+
+        parts = []
+        _mistral_breaker.before_call()
+        try:
+            for chunk in self.mistral_client.chat_stream(model=self.model, messages=messages):
+                piece = chunk.choices[0].delta.content
+                if piece:
+                    parts.append(piece)
+                    yield piece
+        except Exception as e:
+            _mistral_breaker.record(e)
+            raise
+        _mistral_breaker.record()
+        self._chat_cache.put(cache_key, "".join(parts))
+
+    def _llm_cache_get(self, key: str) -> Optional[Dict]:
+        """
+        Look up a cached LLM response, in memory first and then on disk
+
+        Args:
+            key: Content hash of the model and prompt inputs
+
+        Returns:
+            The cached analysis, or None on a miss
+        """
+        analysis = self._llm_cache.get(key)
+        if analysis is not None:
+            return analysis
+
+        try:
+            with self._llm_cache_lock, shelve.open(self._llm_cache_path) as db:
+                analysis = db.get(key)
+        except Exception as e:
+            logger.warning("Could not read LLM cache: %s", e)
+            return None
+
+        if analysis is not None:
+            self._llm_cache.put(key, analysis)
+        return analysis
+
+    def _llm_cache_put(self, key: str, analysis: Dict):
+        """
+        Store an LLM response in memory and on disk
+
+        Args:
+            key: Content hash of the model and prompt inputs
+            analysis: Parsed LLM response
+        """
+        self._llm_cache.put(key, analysis)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with self._llm_cache_lock, shelve.open(self._llm_cache_path) as db:
+                db[key] = analysis
+        except Exception as e:
+            logger.warning("Could not write LLM cache: %s", e)
+
     def analyze_error(self, error_message: str) -> Dict:
         """
         Analyze a specific error message in the codebase and suggest solutions
@@ -1369,59 +2650,78 @@ class EnhancedCodebaseQuery:
             keywords = [kw for kw in keywords if len(
                 kw) > 3]  # Filter out short words
 
-            # Create LIKE conditions for each keyword
-            code_field = 'code_snippet'
-            snippet_sample = self.node_types.get(
-                'snippet', {}).get('sample', {})
-
-            if 'code_snippet' in snippet_sample:
-                code_field = 'code_snippet'
-            elif 'code' in snippet_sample:
-                code_field = 'code'
-            elif 'snippet' in snippet_sample:
-                code_field = 'snippet'
-
             # Find code snippets that might contain error handling for similar errors
             related_snippets = []
 
-            for keyword in keywords:
-                aql = f"""
-                FOR snippet IN {self.node_collection}
-                    FILTER snippet.type == 'snippet' 
-                    AND (
-                        snippet.{code_field} LIKE '%error%' 
-                        AND snippet.{code_field} LIKE '%{keyword}%'
-                    )
-                    LET file = (
-                        FOR edge IN {self.edge_collection}
-                            FILTER edge._to == snippet._id
-                            FOR file IN {self.node_collection}
-                                FILTER file._id == edge._from AND file.type == 'file'
-                                RETURN {{
-                                    "key": file._key,
-                                    "file_path": file.path || (file.directory + '/' + file.file_name)
-                                }}
-                    )
-                    RETURN {{
-                        "code": snippet.{code_field},
-                        "start_line": snippet.start_line,
-                        "end_line": snippet.end_line,
-                        "file": LENGTH(file) > 0 ? file[0] : null
-                    }}
-                """
-                cursor = self.db.aql.execute(aql)
-                for doc in cursor:
-                    if doc not in related_snippets:
-                        related_snippets.append(doc)
+            # One query matches snippets against all keywords at once
+            bind_vars = {
+                '@node_collection': self.node_collection,
+                '@edge_collection': self.edge_collection,
+                'keywords': keywords
+            }
+            aql = f"""
+            FOR snippet IN @@node_collection
+                FILTER snippet.type == 'snippet'
+                FILTER snippet.{self.code_field} LIKE '%error%'
+                FILTER LENGTH(
+                    FOR keyword IN @keywords
+                        FILTER snippet.{self.code_field} LIKE CONCAT('%', keyword, '%')
+                        LIMIT 1
+                        RETURN true
+                ) > 0
+                LET file = (
+                    FOR file IN 1..1 INBOUND snippet._id @@edge_collection
+                        OPTIONS {{bfs: true, uniqueVertices: 'global'}}
+                        FILTER file.type == 'file'
+                        RETURN {{
+                            "key": file._key,
+                            "file_path": file.path || (file.directory + '/' + file.file_name)
+                        }}
+                )
+                RETURN {{
+                    "key": snippet._key,
+                    "code": snippet.{self.code_field},
+                    "start_line": snippet.start_line,
+                    "end_line": snippet.end_line,
+                    "file": LENGTH(file) > 0 ? file[0] : null
+                }}
+            """
 
-            # Format snippets for LLM
-            snippets_text = ""
-            for i, snippet in enumerate(related_snippets):
-                file_info = snippet.get("file", {})
+            seen_keys = set()
+            if keywords:
+                cursor = self.db.aql.execute(
+                    aql,
+                    bind_vars=_bound_vars(aql, bind_vars),
+                    **LOOKUP_QUERY_OPTIONS
+                )
+                for doc in cursor:
+                    if doc["key"] in seen_keys:
+                        continue
+                    seen_keys.add(doc["key"])
+                    related_snippets.append(doc)
+
+            # Rank snippets by how many keywords they contain and keep the best
+            def relevance(snippet):
+                code = (snippet.get("code") or "").lower()
+                return sum(1 for keyword in keywords if keyword in code)
+
+            top_snippets = sorted(related_snippets, key=relevance,
+                                  reverse=True)[:self.ERROR_SNIPPET_LIMIT]
+
+            # Format snippets for LLM, trimmed to the lines around the first match
+            snippet_parts = []
+            context = self.ERROR_SNIPPET_CONTEXT
+            for i, snippet in enumerate(top_snippets):
+                file_info = snippet.get("file") or {}
                 file_path = file_info.get("file_path", "unknown")
-                code = snippet.get("code", "")
+                lines = (snippet.get("code") or "").split('\n')
+                first_match = next(
+                    (j for j, line in enumerate(lines)
+                     if any(keyword in line.lower() for keyword in keywords)), 0)
+                code = '\n'.join(lines[max(0, first_match - context):first_match + context])
 
-                snippets_text += f"\nSnippet {i+1} from {file_path}:\n{code}\n"
+                snippet_parts.append(f"\nSnippet {i+1} from {file_path}:\n{code}\n")
+            snippets_text = "".join(snippet_parts)
 
             # Create a prompt for the LLM
             prompt = f"""
@@ -1446,37 +2746,29 @@ class EnhancedCodebaseQuery:
 
             # Create message for the LLM
             messages = [
-                ChatMessage(role="user", content=prompt)
+                {"role": "user", "content": prompt}
             ]
 
-            # Get completion from Mistral
-            chat_response = self.mistral_client.chat(
-                model=self.model,
-                messages=messages
-            )
-
-            # Extract the content from the response
-            content = chat_response.choices[0].message.content
+            # Get completion from Mistral (answers to identical messages are reused)
+            content = self._chat(messages)
 
             # Try to parse the response as JSON
-            try:
-                analysis = json.loads(content)
-                return {
-                    "error_message": error_message,
-                    "related_snippets_count": len(related_snippets),
-                    "analysis": analysis
-                }
-            except json.JSONDecodeError:
+            analysis = _parse_llm_json(content)
+            if analysis is None:
                 # If JSON parsing fails, return the raw text
                 return {
                     "error_message": error_message,
                     "related_snippets_count": len(related_snippets),
                     "raw_analysis": content
                 }
+            return {
+                "error_message": error_message,
+                "related_snippets_count": len(related_snippets),
+                "analysis": analysis
+            }
 
         except Exception as e:
-            print(f"Error analyzing error: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Error analyzing error: %s", e)
             return {"error": str(e)}
 
     def get_database_structure(self) -> Dict:
@@ -1485,6 +2777,10 @@ class EnhancedCodebaseQuery:
         Returns:
             Dictionary containing information about the database structure
         """
+        # The structure only changes with the caches, so reuse the last answer
+        if self._db_structure_cache is not None and not self._db_structure_dirty:
+            return self._db_structure_cache
+
         try:
             # Most of this information was already gathered during initialization
             # Just format it in a more user-friendly way
@@ -1514,8 +2810,7 @@ class EnhancedCodebaseQuery:
 
             # Count files by language
             languages = {}
-            for file_info in self.files.values():
-                language = file_info.get("language", "unknown")
+            for language in self.files.column("language"):
                 if language not in languages:
                     languages[language] = 0
                 languages[language] += 1
@@ -1523,7 +2818,8 @@ class EnhancedCodebaseQuery:
             # Build directory structure map for improved path navigation
             directory_structure = self._build_directory_structure()
 
-            return {
+            self._db_structure_dirty = False
+            self._db_structure_cache = {
                 "graph_name": self.graph_name,
                 "node_collection": self.node_collection,
                 "edge_collection": self.edge_collection,
@@ -1535,11 +2831,50 @@ class EnhancedCodebaseQuery:
                 "languages": languages,
                 "directory_structure": directory_structure
             }
+            return self._db_structure_cache
         except Exception as e:
-            print(f"Error getting database structure: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Error getting database structure: %s", e)
             return {"error": str(e)}
 
+    def _llm_schema_summary(self, db_structure: Dict) -> str:
+        """
+        Describe the database compactly for LLM prompts
+
+        The model only needs the shape of the graph to pick a function, not the
+        property lists and the full directory tree of get_database_structure.
+
+        Args:
+            db_structure: Output of get_database_structure
+
+        Returns:
+            JSON text with node type counts, relationships, languages and the
+            largest top-level directories
+        """
+        cached = getattr(self, '_schema_summary', None)
+        if cached is not None and cached[0] is db_structure:
+            return cached[1]
+
+        top_dirs = defaultdict(int)
+        for file_path in self.files.column("file_path"):
+            if file_path and '/' in file_path:
+                top_dirs[file_path.split('/', 1)[0]] += 1
+
+        summary = _prompt_json({
+            "graph_name": db_structure.get("graph_name"),
+            "node_types": {node_type: info.get("count", 0)
+                           for node_type, info in db_structure.get("node_types", {}).items()},
+            "relationship_types": [
+                f"{rel.get('from_type')} -> {rel.get('to_type')}"
+                for rel in db_structure.get("relationship_types", [])],
+            "file_count": db_structure.get("file_count"),
+            "snippet_count": db_structure.get("snippet_count"),
+            "symbol_count": db_structure.get("symbol_count"),
+            "languages": db_structure.get("languages", {}),
+            "top_directories": sorted(top_dirs, key=top_dirs.get, reverse=True)[:10]
+        })
+        self._schema_summary = (db_structure, summary)
+        return summary
+
     def analyze_directory(self, path: str) -> Dict:
         """
         Analyze a specific directory in the codebase
@@ -1551,39 +2886,39 @@ class EnhancedCodebaseQuery:
             Dictionary with directory analysis results
         """
         try:
-            print(f"Analyzing code structure at path: {path}")
+            logger.debug("Analyzing directory at path: %s", path)
 
             # Normalize path for consistent matching
             normalized_path = path.rstrip('/')
 
             # First try direct path matching for directory nodes
-            print(f"Looking for files with path pattern: {normalized_path}")
-
-            # Query files with matching path prefix
-            matching_files = []
-            for file_key, file_info in self.files.items():
-                file_path = file_info.get("file_path", "")
-                if file_path and (file_path.startswith(f"{normalized_path}/") or file_path == normalized_path):
-                    matching_files.append(file_info)
-
-            # Sort files for consistent output
-            matching_files.sort(key=lambda x: x.get("file_path", ""))
-
-            # Print sample paths for debugging
-            print("Sample file paths in database:")
-            for i, file_info in enumerate(list(self.files.values())[:6]):
-                print(f"File {i+1}: {file_info.get('file_path', '')}")
+            logger.debug("Looking for files with path pattern: %s", normalized_path)
+
+            # Files at the path or below it, read as two ranges of the sorted path
+            # list; the index may still be under construction by the warm-up
+            self._warmed_up.result()
+            index = self._directory_index()
+            sorted_paths = index["sorted_paths"]
+            file_keys = index["sorted_keys"]
+            ranges = (
+                (bisect_left(sorted_paths, normalized_path),
+                 bisect_right(sorted_paths, normalized_path)),
+                (bisect_left(sorted_paths, f"{normalized_path}/"),
+                 bisect_left(sorted_paths, f"{normalized_path}0")),
+            )
+            matching_files = [self.files[file_keys[i]]
+                              for lo, hi in ranges for i in range(lo, hi)]
 
             # If no files found with direct path matching, try more flexible matching
             if not matching_files:
                 # Try to find files that might contain the path (handle relative paths)
+                path_parts = _split_path(normalized_path)[2]
                 for file_key, file_info in self.files.items():
                     file_path = file_info.get("file_path", "")
-                    path_parts = normalized_path.split('/')
 
                     # Check if all path parts appear in order in the file path
                     if file_path:
-                        file_parts = file_path.split('/')
+                        file_parts = _split_path(file_path)[2]
                         for i in range(len(file_parts) - len(path_parts) + 1):
                             if file_parts[i:i+len(path_parts)] == path_parts:
                                 matching_files.append(file_info)
@@ -1595,31 +2930,24 @@ class EnhancedCodebaseQuery:
             # Get directory structure
             directory_structure = self._get_directory_contents(normalized_path)
 
-            # Get snippets for matching files
+            # Count snippets and symbols of the matching files from the relationship indexes
             file_keys = [file_info.get("key") for file_info in matching_files]
-            matching_snippets = []
-            for snippet_key, snippet_info in self.snippets.items():
-                if snippet_info.get("file_key") in file_keys:
-                    matching_snippets.append(snippet_info)
-
-            # Get symbols for matching files
-            matching_symbols = []
-            for symbol_key, symbol_info in self.symbols.items():
-                if symbol_info.get("file_key") in file_keys:
-                    matching_symbols.append(symbol_info)
+            snippets_count = sum(len(self.file_to_snippets.get(key, ()))
+                                 for key in file_keys)
+            symbols_count = sum(len(self.file_to_symbols.get(key, ()))
+                                for key in file_keys)
 
             return {
                 "path": normalized_path,
                 "files": matching_files,
                 "file_count": len(matching_files),
                 "directory_structure": directory_structure,
-                "snippets_count": len(matching_snippets),
-                "symbols_count": len(matching_symbols)
+                "snippets_count": snippets_count,
+                "symbols_count": symbols_count
             }
 
         except Exception as e:
-            print(f"Error analyzing directory: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Error analyzing directory: %s", e)
             return {"error": str(e)}
 
     def _get_directory_contents(self, path: str) -> Dict:
@@ -1636,44 +2964,73 @@ class EnhancedCodebaseQuery:
 
         # Normalize path
         normalized_path = path.rstrip('/')
+        index = self._directory_index()
 
         # Get files directly in this directory
-        for file_key, file_info in self.files.items():
-            file_path = file_info.get("file_path", "")
-            if not file_path:
-                continue
+        for file_key in index["files_by_dir"].get(normalized_path, ()):
+            file_info = self.files[file_key]
+            contents["files"].append({
+                "key": file_key,
+                "name": file_info.get("file_name", ""),
+                "path": file_info.get("file_path", ""),
+                "language": file_info.get("language", "")
+            })
 
-            file_dir = '/'.join(file_path.split('/')[:-1])
+        # Get subdirectories
+        for subdir, subdir_path in index["child_dirs"].get(normalized_path, ()):
+            contents["subdirectories"].append({
+                "name": subdir,
+                "path": subdir_path
+            })
 
-            if file_dir == normalized_path:
-                contents["files"].append({
-                    "key": file_key,
-                    "name": file_info.get("file_name", ""),
-                    "path": file_path,
-                    "language": file_info.get("language", "")
-                })
+        return contents
 
-        # Get subdirectories
-        seen_subdirs = set()
-        for file_key, file_info in self.files.items():
-            file_path = file_info.get("file_path", "")
-            if not file_path or not file_path.startswith(f"{normalized_path}/"):
-                continue
+    def _directory_index(self) -> Dict[str, Any]:
+        """
+        Index cached file paths by directory
 
-            # Get next directory level
-            remaining_path = file_path[len(normalized_path)+1:]
-            if '/' in remaining_path:
-                subdir = remaining_path.split('/')[0]
-                subdir_path = f"{normalized_path}/{subdir}"
-
-                if subdir_path not in seen_subdirs:
-                    seen_subdirs.add(subdir_path)
-                    contents["subdirectories"].append({
-                        "name": subdir,
-                        "path": subdir_path
-                    })
+        The index is rebuilt whenever the file cache has grown since it was built.
 
-        return contents
+        Returns:
+            Dictionary with:
+            - files_by_dir: directory -> keys of the files directly in it
+            - child_dirs: directory -> (name, path) of its immediate subdirectories
+            - sorted_paths / sorted_keys: all file paths in sorted order and their keys
+        """
+        index = getattr(self, '_dir_index', None)
+        if index is not None and index["file_count"] == len(self.files):
+            return index
+
+        files_by_dir = defaultdict(list)
+        child_dirs = defaultdict(list)
+        seen_dirs = set()
+        paths = []
+        for row, (file_key, file_path) in enumerate(zip(self.files.key_to_row,
+                                                        self.files.column("file_path"))):
+            if not file_path:
+                continue
+            paths.append((file_path, row, file_key))
+
+            directory, _, parts = _split_path(file_path)
+            files_by_dir[directory].append(file_key)
+
+            # Register each directory under its parent, in first-seen order
+            for depth in range(2, len(parts)):
+                subdir_path = '/'.join(parts[:depth])
+                if subdir_path not in seen_dirs:
+                    seen_dirs.add(subdir_path)
+                    child_dirs['/'.join(parts[:depth - 1])].append(
+                        (parts[depth - 1], subdir_path))
+
+        paths.sort()
+        self._dir_index = index = {
+            "file_count": len(self.files),
+            "files_by_dir": dict(files_by_dir),
+            "child_dirs": dict(child_dirs),
+            "sorted_paths": [path for path, _, _ in paths],
+            "sorted_keys": [key for _, _, key in paths],
+        }
+        return index
 
     def search_code(self, term: str) -> List[Dict]:
         """
@@ -1683,56 +3040,64 @@ class EnhancedCodebaseQuery:
             term: The term to search for
 
         Returns:
-            List of dictionaries containing matching code snippets
+            List of dictionaries containing matching code snippets (at most
+            SEARCH_RESULT_LIMIT)
         """
-        results = []
-
         try:
-            # Determine the best attribute for code based on the sample
-            code_field = 'code_snippet'
-            snippet_sample = self.node_types.get(
-                'snippet', {}).get('sample', {})
-
-            if 'code_snippet' in snippet_sample:
-                code_field = 'code_snippet'
-            elif 'code' in snippet_sample:
-                code_field = 'code'
-            elif 'snippet' in snippet_sample:
-                code_field = 'snippet'
+            return list(islice(self.iter_search_code(term), self.SEARCH_RESULT_LIMIT))
+        except Exception as e:
+            logger.exception("Error searching code: %s", e)
+            return []
 
-            aql = f"""
-            FOR snippet IN {self.node_collection}
-                FILTER snippet.type == 'snippet' AND snippet.{code_field} LIKE '%{term}%'
-                LET file = (
-                    FOR edge IN {self.edge_collection}
-                        FILTER edge._to == snippet._id
-                        FOR file IN {self.node_collection}
-                            FILTER file._id == edge._from AND file.type == 'file'
-                            RETURN {{
-                                "key": file._key,
-                                "directory": file.directory,
-                                "file_name": file.file_name,
-                                "file_path": file.path || (file.directory + '/' + file.file_name),
-                                "language": file.language
-                            }}
-                )
-                RETURN {{
-                    "key": snippet._key,
-                    "code": snippet.{code_field},
-                    "start_line": snippet.start_line,
-                    "end_line": snippet.end_line,
-                    "file": LENGTH(file) > 0 ? file[0] : null
-                }}
-            """
-            cursor = self.db.aql.execute(aql)
-            for doc in cursor:
-                results.append(doc)
+    def iter_search_code(self, term: str) -> Iterator[Dict]:
+        """
+        Stream code snippets containing a specific term
 
-        except Exception as e:
-            print(f"Error searching code: {str(e)}")
-            traceback.print_exc()
+        Results are fetched from a streaming cursor batch by batch, and the
+        cursor is released as soon as the caller stops iterating.
 
-        return results
+        Args:
+            term: The term to search for
+
+        Yields:
+            Dictionaries describing matching code snippets
+        """
+        # The term is bound, so the query text and its plan are reused
+        bind_vars = {
+            '@node_collection': self.node_collection,
+            '@edge_collection': self.edge_collection,
+            'term': term
+        }
+        aql = f"""
+        FOR snippet IN @@node_collection
+            FILTER snippet.type == 'snippet'
+            FILTER snippet.{self.code_field} LIKE CONCAT('%', @term, '%')
+            LET file = (
+                FOR file IN 1..1 INBOUND snippet._id @@edge_collection
+                    OPTIONS {{bfs: true, uniqueVertices: 'global'}}
+                    FILTER file.type == 'file'
+                    RETURN {{
+                        "key": file._key,
+                        "directory": file.directory,
+                        "file_name": file.file_name,
+                        "file_path": file.path || (file.directory + '/' + file.file_name),
+                        "language": file.language
+                    }}
+            )
+            RETURN {{
+                "key": snippet._key,
+                "code": snippet.{self.code_field},
+                "start_line": snippet.start_line,
+                "end_line": snippet.end_line,
+                "file": LENGTH(file) > 0 ? file[0] : null
+            }}
+        """
+        cursor = self.db.aql.execute(
+            aql, bind_vars=_bound_vars(aql, bind_vars), **STREAM_QUERY_OPTIONS)
+        try:
+            yield from cursor
+        finally:
+            cursor.close(ignore_missing=True)
 
     def analyze_code_structure(self, path: Optional[str] = None) -> Dict:
         """
@@ -1744,81 +3109,90 @@ class EnhancedCodebaseQuery:
         Returns:
             Dictionary containing code structure analysis
         """
-
-        print(f"Analyzing code structure at path: {path}")
-        # Print the query you're using to find files
-        print(f"Looking for files with path pattern: {path}")
-        # Print a few sample files from your cache for comparison
-        print("Sample file paths in database:")
-        for i, (key, file_info) in enumerate(self.files.items()):
-            print(f"File {i+1}: {file_info.get('file_path', 'unknown')}")
-            if i >= 5:
-                break
-        # Rest of your function...
+        logger.debug("Analyzing code structure at path: %s", path)
         try:
-            # If path is provided, filter by that path
-            path_filter = ""
-            if path:
-                path_filter = f" AND (file.path LIKE '{path}/%' OR file.path == '{path}')"
+            # If path is provided, filter by that path; a null path matches every file.
+            # Paths below it are read as an index range on (type, path), bounded
+            # above by U+FFFF which sorts after any character; STARTS_WITH keeps
+            # the match exact whatever the collation does inside the range.
+            bind_vars = {
+                '@node_collection': self.node_collection,
+                'path': path or None,
+                'path_lo': f"{path}/" if path else None,
+                'path_hi': f"{path}/\uffff" if path else None
+            }
+            path_filter = ("(@path == null OR file.path == @path OR "
+                           "(file.path >= @path_lo AND file.path < @path_hi "
+                           "AND STARTS_WITH(file.path, @path_lo)))")
 
             # First, gather file structure
             aql = f"""
-            FOR file IN {self.node_collection}
-                FILTER file.type == 'file'{path_filter}
+            FOR file IN @@node_collection
+                FILTER file.type == 'file' AND {path_filter}
                 RETURN {{
                     "key": file._key,
                     "file_path": file.path || (file.directory + '/' + file.file_name),
                     "language": file.language
                 }}
             """
-            cursor = self.db.aql.execute(aql)
-            files = [doc for doc in cursor]
+            cursor = self.db.aql.execute(
+                aql, bind_vars=bind_vars, **STREAM_QUERY_OPTIONS)
+
+            # Group files by directory and count languages while streaming
+            directory_structure = defaultdict(list)
+            language_counts = {}
+            file_count = 0
+            for file in cursor:
+                file_count += 1
+                language = file.get("language", "unknown")
+                language_counts[language] = language_counts.get(language, 0) + 1
 
-            # Group files by directory
-            directory_structure = {}
-            for file in files:
                 file_path = file.get("file_path", "")
                 if not file_path:
                     continue
 
-                # Split path and use all but the last part as directory
-                path_parts = file_path.split('/')
-                if len(path_parts) > 1:
-                    directory = '/'.join(path_parts[:-1])
-                    filename = path_parts[-1]
-                else:
-                    directory = "."
-                    filename = file_path
-
-                if directory not in directory_structure:
-                    directory_structure[directory] = []
-
-                directory_structure[directory].append({
+                # Split off the file name and use the rest as directory
+                directory, filename, _ = _split_path(file_path)
+                directory_structure[directory or "."].append({
                     "file_name": filename,
                     "file_path": file_path,
                     "key": file.get("key"),
                     "language": file.get("language", "unknown")
                 })
 
-            # Count symbols by type and file
+            # Count symbols by type and file. Graphs built with per-file counters
+            # are read directly; older graphs aggregate over the symbol edges.
             symbol_counts = {}
-            if 'symbol' in self.node_types:
-                path_join = ""
-                if path:
-                    path_join = f" AND (file.path LIKE '{path}/%' OR file.path == '{path}')"
-
+            file_sample = self.node_types.get('file', {}).get('sample', {})
+            if 'symbol' in self.node_types and 'symbol_type_counts' in file_sample:
                 aql = f"""
-                FOR symbol IN {self.node_collection}
+                FOR file IN @@node_collection
+                    FILTER file.type == 'file' AND {path_filter}
+                    FILTER LENGTH(file.symbol_type_counts) > 0
+                    RETURN {{
+                        "file_path": file.path || (file.directory + '/' + file.file_name),
+                        "counts": file.symbol_type_counts
+                    }}
+                """
+                cursor = self.db.aql.execute(
+                    aql, bind_vars=bind_vars, **LOOKUP_QUERY_OPTIONS)
+                for doc in cursor:
+                    file_counts = symbol_counts.setdefault(doc.get("file_path", ""), {})
+                    for symbol_type, count in doc["counts"].items():
+                        file_counts[symbol_type] = file_counts.get(symbol_type, 0) + count
+            elif 'symbol' in self.node_types:
+                aql = f"""
+                FOR symbol IN @@node_collection
                     FILTER symbol.type == 'symbol'
                     LET file = (
-                        FOR edge IN {self.edge_collection}
-                            FILTER edge._to == symbol._id
-                            FOR file IN {self.node_collection}
-                                FILTER file._id == edge._from AND file.type == 'file'{path_join}
-                                RETURN file
+                        FOR file IN 1..1 INBOUND symbol._id @@edge_collection
+                            OPTIONS {{bfs: true, uniqueVertices: 'global'}}
+                            FILTER file.type == 'file' AND {path_filter}
+                            LIMIT 1
+                            RETURN file.path || (file.directory + '/' + file.file_name)
                     )
                     FILTER LENGTH(file) > 0
-                    COLLECT file_path = file[0].path || (file[0].directory + '/' + file[0].file_name),
+                    COLLECT file_path = file[0],
                             symbol_type = symbol.symbol_type WITH COUNT INTO count
                     RETURN {{
                         "file_path": file_path,
@@ -1826,7 +3200,11 @@ class EnhancedCodebaseQuery:
                         "count": count
                     }}
                 """
-                cursor = self.db.aql.execute(aql)
+                cursor = self.db.aql.execute(
+                    aql,
+                    bind_vars=dict(bind_vars, **{'@edge_collection': self.edge_collection}),
+                    **LOOKUP_QUERY_OPTIONS
+                )
                 for doc in cursor:
                     file_path = doc.get("file_path", "")
                     symbol_type = doc.get("symbol_type", "unknown")
@@ -1838,44 +3216,50 @@ class EnhancedCodebaseQuery:
                     symbol_counts[file_path][symbol_type] = count
 
             # Prepare analysis data for LLM
-            file_count = len(files)
             directory_count = len(directory_structure)
 
-            # Prepare information for visualization
-            directory_tree = []
-            for directory, file_list in directory_structure.items():
-                directory_tree.append({
+            # Prepare information for visualization, largest directories first
+            directory_tree = sorted(
+                ({
                     "directory": directory,
                     "files": file_list,
                     "file_count": len(file_list)
-                })
-
-            # Sort directories by file count (descending)
-            directory_tree.sort(key=lambda x: x["file_count"], reverse=True)
-
-            # Analyze distribution of languages
-            language_counts = {}
-            for file in files:
-                language = file.get("language", "unknown")
-                if language not in language_counts:
-                    language_counts[language] = 0
-                language_counts[language] += 1
+                } for directory, file_list in directory_structure.items()),
+                key=lambda x: x["file_count"],
+                reverse=True
+            )
 
             # Create an analysis with Mistral
-            if files:
+            if file_count:
+                # Only the files with the most symbols go into the prompt
+                top_symbol_files = sorted(
+                    symbol_counts.items(),
+                    key=lambda item: sum(item[1].values()),
+                    reverse=True
+                )[:self.PROMPT_SYMBOL_FILES]
                 structure_info = {
                     "file_count": file_count,
                     "directory_count": directory_count,
                     "top_directories": [d["directory"] for d in directory_tree[:5]],
                     "language_distribution": language_counts,
-                    "symbol_type_distribution": symbol_counts
+                    "symbol_type_distribution": dict(top_symbol_files)
                 }
 
+                # The summary only changes with the graph, so an overview of an
+                # identical summary is served from the persisted LLM cache
+                structure_json = _prompt_json(structure_info)
+                cache_key = hashlib.blake2b(
+                    "\0".join((self.model, "structure", structure_json)).encode(),
+                    digest_size=16
+                ).hexdigest()
+                analysis = self._llm_cache_get(cache_key)
+
+            if file_count and analysis is None:
                 # Create a prompt for the LLM to analyze the structure
                 prompt = f"""
                 Please analyze this codebase structure:
                 
-                {json.dumps(structure_info, indent=2)}
+                {structure_json}
                 
                 Provide a JSON response with the following fields:
                 1. overview: High-level description of the codebase structure
@@ -1889,25 +3273,19 @@ class EnhancedCodebaseQuery:
 
                 # Create message for the LLM
                 messages = [
-                    ChatMessage(role="user", content=prompt)
+                    {"role": "user", "content": prompt}
                 ]
 
-                # Get completion from Mistral
-                chat_response = self.mistral_client.chat(
-                    model=self.model,
-                    messages=messages
-                )
-
-                # Extract the content from the response
-                content = chat_response.choices[0].message.content
+                # Get completion from Mistral (answers to identical messages are reused)
+                content = self._chat(messages)
 
-                # Try to parse the response as JSON
-                try:
-                    analysis = json.loads(content)
-                except json.JSONDecodeError:
-                    # If JSON parsing fails, return the raw text
+                # Try to parse the response as JSON, keeping the raw text otherwise
+                analysis = _parse_llm_json(content)
+                if analysis is None:
                     analysis = {"raw_analysis": content}
-            else:
+                else:
+                    self._llm_cache_put(cache_key, analysis)
+            elif not file_count:
                 analysis = {
                     "message": "No files found matching the specified path"}
 
@@ -1922,69 +3300,96 @@ class EnhancedCodebaseQuery:
             }
 
         except Exception as e:
-            print(f"Error analyzing code structure: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Error analyzing code structure: %s", e)
             return {"error": str(e)}
 
         # Add this debugging code to your query function
     def debug_query_execution(self, path):
         """Debug what's happening when trying to find files at a path."""
-        print(f"Debugging query for path: {path}")
+        logger.debug("Debugging query for path: %s", path)
 
         # Check if the path exists in the database at all
-        aql = f"""
-        FOR v IN {self.node_collection}
-            FILTER CONTAINS(v.path, '{path}') OR CONTAINS(v.directory, '{path}')
-            RETURN {{path: v.path, directory: v.directory, type: v.type}}
+        aql = """
+        FOR v IN @@node_collection
+            FILTER CONTAINS(v.path, @path) OR CONTAINS(v.directory, @path)
+            RETURN {path: v.path, directory: v.directory, type: v.type}
         """
-        cursor = self.db.aql.execute(aql)
+        cursor = self.db.aql.execute(
+            aql,
+            bind_vars={'@node_collection': self.node_collection, 'path': path}
+        )
         results = [doc for doc in cursor]
-        print(f"Found {len(results)} items containing the path:")
-        for item in results[:10]:  # Print first 10 for debugging
-            print(f"  - {item}")
+        logger.debug("Found %d items containing the path:", len(results))
+        for item in results[:10]:  # Log first 10 for debugging
+            logger.debug("  - %s", item)
 
         # Check node types in the database
-        aql = f"""
-        FOR v IN {self.node_collection}
+        aql = """
+        FOR v IN @@node_collection
             COLLECT type = v.type WITH COUNT INTO count
-            RETURN {{type, count}}
+            RETURN {type, count}
         """
-        cursor = self.db.aql.execute(aql)
+        cursor = self.db.aql.execute(
+            aql, bind_vars={'@node_collection': self.node_collection})
         type_counts = [doc for doc in cursor]
-        print("Node types in database:")
+        logger.debug("Node types in database:")
         for type_info in type_counts:
-            print(f"  - {type_info['type']}: {type_info['count']}")
+            logger.debug("  - %s: %s", type_info['type'], type_info['count'])
 
-    def process_query(self, query: str) -> Dict:
+    def process_query(self, query: str, stream: bool = False) -> Dict:
         """
         Process natural language queries about the codebase
 
         Args:
             query: Natural language query about the codebase
+            stream: If True, "explanation" is an iterator yielding the text as the
+                model writes it; history and caches are updated once it is consumed
 
         Returns:
             Dictionary containing the response to the query
         """
         try:
+            # A repeated question in the same conversation state reuses the
+            # stored answer, skipping both LLM calls and the lookup itself
+            cache_key = self._query_cache_key(
+                "query", " ".join(query.lower().split()))
+            cached = self._cached_query_response(cache_key)
+            if cached is not None:
+                self._remember("user", query)
+                self._remember(
+                    "assistant", cached.get("explanation") or cached.get("response", ""))
+                return cached
+
+            # An answer to a rephrasing of this question is looked up now, and
+            # reused once the same function and parameters have been chosen
+            signature = _query_signature(query)
+            semantic_key = None
+            rephrased = None
+            if signature:
+                semantic_key = self._query_cache_key("query-signature", signature)
+                rephrased = self._cached_query_response(semantic_key)
+
             # Save the query to conversation history
-            self.conversation_history.append(
-                {"role": "user", "content": query})
+            self._remember("user", query)
 
-            # Get database structure for context
+            # Get database structure for context, compacted for the prompt
+            self._warmed_up.result()
             db_structure = self.get_database_structure()
+            schema_summary = self._llm_schema_summary(db_structure)
 
             # Create context for the LLM
             context = {
                 "db_structure": db_structure,
-                "conversation_history": self.conversation_history[-5:] if len(self.conversation_history) > 1 else []
+                "conversation_history": [
+                    dict(message, content=message["content"][:self.HISTORY_MESSAGE_CHARS])
+                    for message in self.conversation_history[-self.HISTORY_PROMPT_MESSAGES:]
+                ] if len(self.conversation_history) > 1 else []
             }
 
             # Create a prompt for the LLM to analyze the query and decide what action to take
             prompt = f"""
-            You are a codebase assistant that helps users find information in their codebase.
-            
             Database Structure:
-            {json.dumps(db_structure, indent=2)}
+            {schema_summary}
             
             Available functions:
             1. find_symbol_occurrences(symbol_name): Find all occurrences of a symbol
@@ -1996,7 +3401,7 @@ class EnhancedCodebaseQuery:
             7. analyze_directory(path): Analyze a specific directory in the codebase
             
             Conversation History:
-            {json.dumps(context["conversation_history"], indent=2)}
+            {_prompt_json(context["conversation_history"])}
             
             User Query: {query}
             
@@ -2012,76 +3417,47 @@ class EnhancedCodebaseQuery:
 
             # Create message for the LLM
             messages = [
-                ChatMessage(role="user", content=prompt)
+                {"role": "system", "content": ASSISTANT_PREAMBLE},
+                {"role": "user", "content": prompt}
             ]
 
-            # Get completion from Mistral
-            chat_response = self.mistral_client.chat(
-                model=self.model,
-                messages=messages
-            )
-
-            # Extract the content from the response
-            content = chat_response.choices[0].message.content
+            # Get completion from Mistral (answers to identical messages are reused)
+            content = self._chat(messages)
 
-            # Try to parse the response as JSON
-            try:
-                # Clean up the content to remove markdown code blocks if present
-                cleaned_content = content
-                if content.strip().startswith("```") and content.strip().endswith("```"):
-                    # Extract the content between the backticks
-                    cleaned_content = "\n".join(
-                        content.strip().split("\n")[1:-1])
-                query_analysis = json.loads(cleaned_content)
-            except json.JSONDecodeError:
+            # Parse the response as JSON, ignoring markdown code fences
+            query_analysis = _parse_llm_json(content)
+            if query_analysis is None:
                 return {"error": "Failed to parse LLM response as JSON", "raw_response": content}
 
             # Get the function to call and parameters
             function_name = query_analysis.get("function_to_call", "")
             parameters = query_analysis.get("parameters", {})
-            print(query_analysis, parameters)
+            logger.debug("Query analysis: %s", query_analysis)
+
+            if (rephrased is not None and "function_called" in rephrased
+                    and rephrased["function_called"] == function_name
+                    and rephrased.get("parameters") == parameters):
+                rephrased["cache"] = "semantic"
+                self._remember("assistant", rephrased.get("explanation", ""))
+                return rephrased
+
             # Call the appropriate function based on the analysis
             result = None
-            if function_name == "find_symbol_occurrences":
-                symbol_name = parameters.get("symbol_name", "")
-                if symbol_name:
-                    result = self.find_symbol_occurrences(symbol_name)
-            elif function_name == "find_by_name":
-                name = parameters.get("name", "")
-                symbol_type = parameters.get("symbol_type")
-                if name:
-                    result = self.find_by_name(name, symbol_type)
-            elif function_name == "analyze_symbol":
-                name = parameters.get("name", "")
-                symbol_type = parameters.get("symbol_type")
-                if name:
-                    result = self.analyze_symbol(name, symbol_type)
-            elif function_name == "analyze_error":
-                error_message = parameters.get("error_message", "")
-                if error_message:
-                    result = self.analyze_error(error_message)
-            elif function_name == "search_code":
-                term = parameters.get("term", "")
-                if term:
-                    result = self.search_code(term)
-            elif function_name == "analyze_code_structure":
-                path = parameters.get("path")
-                result = self.analyze_code_structure(path)
-            elif function_name == "analyze_directory":
-                path = parameters.get("path", "")
-                if path:
-                    result = self.analyze_directory(path)
-            else:
+            spec = self.QUERY_FUNCTIONS.get(function_name)
+            if spec is None:
                 result = {"error": f"Unknown function: {function_name}"}
+            else:
+                param_names, first_required = spec
+                args = [parameters.get(name) for name in param_names]
+                if args[0] or not first_required:
+                    result = getattr(self, function_name)(*args)
 
             # If result is None or empty, try to handle the query directly
             if result is None or (isinstance(result, list) and len(result) == 0):
                 # Create a fallback prompt for the LLM
                 fallback_prompt = f"""
-                You are a codebase assistant that helps users find information in their codebase.
-                
                 Database Structure:
-                {json.dumps(db_structure, indent=2)}
+                {schema_summary}
                 
                 Unfortunately, I couldn't find specific information to answer the user's query:
                 
@@ -2098,79 +3474,214 @@ class EnhancedCodebaseQuery:
 
                 # Create message for the LLM
                 fallback_messages = [
-                    ChatMessage(role="user", content=fallback_prompt)
+                    {"role": "system", "content": ASSISTANT_PREAMBLE},
+                    {"role": "user", "content": fallback_prompt}
                 ]
 
-                # Get completion from Mistral
-                fallback_response = self.mistral_client.chat(
-                    model=self.model,
-                    messages=fallback_messages
-                )
-
-                # Extract the content from the response
-                fallback_content = fallback_response.choices[0].message.content
+                # Get completion from Mistral (answers to identical messages are reused)
+                fallback_content = self._chat(fallback_messages)
 
                 # Add the fallback response to conversation history
-                self.conversation_history.append(
-                    {"role": "assistant", "content": fallback_content})
+                self._remember("assistant", fallback_content)
 
-                return {
+                response = {
                     "query": query,
                     "understanding": query_analysis.get("understanding", ""),
                     "response_type": "fallback",
                     "response": fallback_content
                 }
+                self._cache_query_response(response, cache_key, semantic_key)
+                return response
 
             # Generate a user-friendly explanation of the result
-            explanation_prompt = f"""
-            You are a codebase assistant that helps users find information in their codebase.
-            
-            User Query: {query}
-            
-            Understanding: {query_analysis.get("understanding", "")}
-            
-            Result: {json.dumps(result, indent=2)}
-            
-            Please explain these results to the user in a clear, conversational way.
-            If results include code snippets, explain what the code does.
-            If there are multiple results, summarize the key findings.
-            Include specific details from the results to make your explanation concrete.
-            
-            Format your response as a conversation, not as JSON.
-            """
+            explanation_prompt = EXPLANATION_PROMPT.substitute(
+                query=query,
+                understanding=query_analysis.get("understanding", ""),
+                result=_prompt_json(self._prompt_result(query, result)))
 
             # Create message for the LLM
             explanation_messages = [
-                ChatMessage(role="user", content=explanation_prompt)
+                {"role": "system", "content": ASSISTANT_PREAMBLE},
+                {"role": "user", "content": explanation_prompt}
             ]
 
-            # Get completion from Mistral
-            explanation_response = self.mistral_client.chat(
-                model=self.model,
-                messages=explanation_messages
-            )
-
-            # Extract the content from the response
-            explanation = explanation_response.choices[0].message.content
-
-            # Add the explanation to conversation history
-            self.conversation_history.append(
-                {"role": "assistant", "content": explanation})
-
-            return {
+            response = {
                 "query": query,
                 "understanding": query_analysis.get("understanding", ""),
                 "function_called": function_name,
                 "parameters": parameters,
-                "raw_result": result,
-                "explanation": explanation
+                "raw_result": result
             }
 
+            def finish(explanation):
+                # Add the explanation to conversation history
+                self._remember("assistant", explanation)
+
+                response["explanation"] = explanation
+                # Failed lookups are not cached so the next attempt retries them
+                if not (isinstance(result, dict) and "error" in result):
+                    self._cache_query_response(
+                        response, cache_key, semantic_key)
+
+            if stream:
+                def stream_explanation():
+                    parts = []
+                    for piece in self._chat_stream(explanation_messages):
+                        parts.append(piece)
+                        yield piece
+                    finish("".join(parts))
+
+                return dict(response, explanation=stream_explanation())
+
+            # Get completion from Mistral (answers to identical messages are reused)
+            finish(self._chat(explanation_messages))
+            return response
+
         except Exception as e:
-            print(f"Error processing query: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Error processing query: %s", e)
             return {"error": str(e)}
 
+    def _prompt_result(self, query: str, result: Any) -> Any:
+        """
+        Select and trim the part of a function result shown to the model
+
+        Lists are ranked by how many words of the query their entries contain,
+        so the most relevant PROMPT_RESULT_ITEMS entries are kept.
+
+        Args:
+            query: Natural language query the result answers
+            result: Value returned by the called function
+
+        Returns:
+            Trimmed copy of the result
+        """
+        words = set(_query_signature(query)) - QUERY_INTENT_WORDS
+        if isinstance(result, list) and len(result) > self.PROMPT_RESULT_ITEMS and words:
+            def relevance(entry):
+                text = _prompt_json(entry).lower()
+                return sum(1 for word in words if word in text)
+
+            result = sorted(result, key=relevance, reverse=True)
+        return _trim_for_prompt(result, self.PROMPT_RESULT_ITEMS, self.PROMPT_RESULT_CHARS)
+
+    def _query_cache_key(self, kind: str, question: Any) -> Optional[str]:
+        """
+        Build the key of a stored process_query answer
+
+        Answers depend on the model, the graph and its revision, and the recent
+        conversation, so all of them are part of the key.
+
+        Args:
+            kind: Kind of key, "query" or "query-signature"
+            question: Normalized question or its signature
+
+        Returns:
+            Content hash, or None if the graph revision is unknown
+        """
+        if self.graph_revision is None:
+            return None
+        return hashlib.blake2b(orjson.dumps([
+            kind, self.model, self.node_collection, self.graph_revision,
+            question, self.conversation_history[-4:]
+        ]), digest_size=16).hexdigest()
+
+    def _query_answer_expired(self, stored_at: float) -> bool:
+        """Whether a process_query answer stored at the given time is too old to reuse"""
+        return (self.QUERY_CACHE_TTL is not None
+                and time.time() - stored_at > self.QUERY_CACHE_TTL)
+
+    def _cached_query_response(self, key: Optional[str]) -> Optional[Dict]:
+        """
+        Look up a stored process_query answer that has not expired
+
+        Expired answers found on the way are deleted.
+
+        Args:
+            key: Key from _query_cache_key, or None
+
+        Returns:
+            The stored answer, or None on a miss
+        """
+        if key is None:
+            return None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with self._query_cache_lock, shelve.open(self._query_cache_path) as db:
+                entry = db.get(key)
+                if entry is not None and self._query_answer_expired(entry[0]):
+                    del db[key]
+                    entry = None
+        except Exception as e:
+            logger.warning("Could not read stored answers: %s", e)
+            return None
+        # Unpickled on every read, so callers never share the stored object
+        return entry[1] if entry is not None else None
+
+    def _cache_query_response(self, response: Dict, cache_key: Optional[str],
+                              semantic_key: Optional[str]):
+        """
+        Store a process_query answer under its exact and rephrasing keys
+
+        Args:
+            response: Dictionary returned by process_query
+            cache_key: Key of the normalized question, or None
+            semantic_key: Key of the question's signature, or None if it has none
+        """
+        keys = [key for key in (cache_key, semantic_key) if key is not None]
+        if not keys:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with self._query_cache_lock, shelve.open(self._query_cache_path) as db:
+                # Pickled on write, so later changes to the response do not leak in
+                entry = (time.time(), response)
+                for key in keys:
+                    db[key] = entry
+                if len(db) > self.QUERY_CACHE_MAX_ENTRIES:
+                    self._prune_query_answers(db)
+        except Exception as e:
+            logger.warning("Could not store answer: %s", e)
+            return
+        if semantic_key is not None:
+            self._session_query_keys.add(semantic_key)
+
+    def _prune_query_answers(self, db: shelve.Shelf):
+        """
+        Drop expired answers, and the oldest ones until a quarter of the room is free
+
+        Args:
+            db: Open shelve of stored answers, with its lock held
+        """
+        entries = sorted((db[key][0], key) for key in list(db.keys()))
+        excess = len(entries) - self.QUERY_CACHE_MAX_ENTRIES * 3 // 4
+        for i, (stored_at, key) in enumerate(entries):
+            if i < excess or self._query_answer_expired(stored_at):
+                del db[key]
+
+    def process_queries(self, queries: List[str], max_concurrency: int = 16) -> List[Dict]:
+        """
+        Process independent queries concurrently
+
+        Each query runs in a fresh conversation that shares this object's caches
+        and clients, so this object's conversation history is left untouched.
+
+        Args:
+            queries: Natural language queries about the codebase
+            max_concurrency: Maximum number of queries in flight at once
+
+        Returns:
+            process_query results, in the order of the queries
+        """
+        def run(query):
+            session = copy.copy(self)
+            session.conversation_history = []
+            return session.process_query(query)
+
+        if not queries:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(queries)))) as pool:
+            return list(pool.map(run, queries))
+
     def chat_with_codebase(self, query: str) -> str:
         """
         Main conversational function that processes user queries about the codebase
@@ -2183,38 +3694,94 @@ class EnhancedCodebaseQuery:
         """
         try:
             # Process the query
-            result = self.process_query(query)
+            return self._chat_reply(self.process_query(query))
 
-            # If an error occurred, return an error message
-            if "error" in result:
-                error_message = result.get(
-                    "error", "An unknown error occurred")
-                if "raw_response" in result:
-                    return f"I encountered an error: {error_message}\n\nRaw response from LLM: {result['raw_response']}"
-                return f"I encountered an error: {error_message}"
+        except Exception as e:
+            logger.exception("Error in chat_with_codebase: %s", e)
+            return f"I'm sorry, I encountered an error while processing your query: {str(e)}"
 
-            # If the result contains an explanation, return it
-            if "explanation" in result:
-                return result["explanation"]
+    def stream_chat_with_codebase(self, query: str) -> Iterator[str]:
+        """
+        Conversational entry point that yields the reply as it is generated
 
-            # If the result contains a response, return it
-            if "response" in result:
-                return result["response"]
+        Args:
+            query: User's natural language query
 
-            # This is a fallback if neither explanation nor response are available
-            return "I processed your query but couldn't generate a proper explanation. Please try rephrasing your question."
+        Yields:
+            Pieces of the response text; joined they equal chat_with_codebase's reply
+        """
+        try:
+            result = self.process_query(query, stream=True)
+            explanation = result.get("explanation")
+            if "error" not in result and explanation is not None \
+                    and not isinstance(explanation, str):
+                yield from explanation
+            else:
+                yield self._chat_reply(result)
 
         except Exception as e:
-            print(f"Error in chat_with_codebase: {str(e)}")
-            traceback.print_exc()
-            return f"I'm sorry, I encountered an error while processing your query: {str(e)}"
+            logger.exception("Error in stream_chat_with_codebase: %s", e)
+            yield f"I'm sorry, I encountered an error while processing your query: {str(e)}"
+
+    def _chat_reply(self, result: Dict) -> str:
+        """
+        Turn a process_query result into the text shown to the user
+
+        Args:
+            result: Dictionary returned by process_query
+
+        Returns:
+            String containing the response to the user
+        """
+        # If an error occurred, return an error message
+        if "error" in result:
+            error_message = result.get(
+                "error", "An unknown error occurred")
+            if "raw_response" in result:
+                return f"I encountered an error: {error_message}\n\nRaw response from LLM: {result['raw_response']}"
+            return f"I encountered an error: {error_message}"
+
+        # If the result contains an explanation, return it
+        if "explanation" in result:
+            return result["explanation"]
+
+        # If the result contains a response, return it
+        if "response" in result:
+            return result["response"]
+
+        # This is a fallback if neither explanation nor response are available
+        return "I processed your query but couldn't generate a proper explanation. Please try rephrasing your question."
+
+    def _remember(self, role: str, content: str):
+        """
+        Append a message to the conversation history, dropping the oldest
+        messages beyond HISTORY_MAX_MESSAGES
+
+        Args:
+            role: "user" or "assistant"
+            content: Message text
+        """
+        self.conversation_history.append({"role": role, "content": content})
+        del self.conversation_history[:-self.HISTORY_MAX_MESSAGES]
 
     def reset_conversation(self):
-        """Reset the conversation history"""
+        """Reset the conversation history and forget the answers rephrasings could reuse"""
         self.conversation_history = []
 
+        keys, self._session_query_keys = self._session_query_keys, set()
+        if not keys:
+            return
+        try:
+            with self._query_cache_lock, shelve.open(self._query_cache_path) as db:
+                for key in keys:
+                    db.pop(key, None)
+        except Exception as e:
+            logger.warning("Could not flush stored answers: %s", e)
+
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
     # Load environment variables
     load_dotenv()
 
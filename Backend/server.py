@@ -1,13 +1,22 @@
+import atexit
 import jwt
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import serialization
 import subprocess
 import sys
 from flask import Flask, request, jsonify
+from flask.json.provider import DefaultJSONProvider
+import orjson
 import time
 from jwt import *
 
+import threading
+
 import requests
+from requests.adapters import HTTPAdapter
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
@@ -16,8 +25,32 @@ import re
 from GraphBuilder import CodebaseVisualizer
 import nx_arangodb as nxadb
 from GraphQuery import EnhancedCodebaseQuery
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    # Request and response bodies go through orjson; types it cannot handle
+    # fall back to Flask's default conversions
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default,
+                            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
+
+# Log records are queued by request threads and written by a background listener,
+# so logging never blocks a request on stderr
+log_queue = queue.Queue(-1)
+log_listener = QueueListener(log_queue, logging.StreamHandler())
+logging.getLogger().addHandler(QueueHandler(log_queue))
+logging.getLogger().setLevel(logging.WARNING)
+log_listener.start()
+# Stopping the listener writes out the records still queued at exit
+atexit.register(log_listener.stop)
 # Load the .env file
 load_dotenv()
 
@@ -33,6 +66,36 @@ CLIENT_ID = 'Iv23liiin5e6YF9k8FGG'
 client = ArangoClient(hosts=HOSTS)
 db = client.db(username='root', password=PASSWORD, verify=True)
 
+# One pooled session keeps TLS connections to api.github.com alive across requests
+github_session = requests.Session()
+github_session.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=50))
+github_session.headers.update({'Accept': 'application/vnd.github+json'})
+
+# The app's signing key is loaded once and its JWT reused until shortly before it expires
+github_jwt_lock = threading.Lock()
+github_jwt_cache = {'key': None, 'token': None, 'exp': 0}
+
+
+def get_github_jwt():
+    with github_jwt_lock:
+        now = int(time.time())
+        if github_jwt_cache['token'] is None or now > github_jwt_cache['exp'] - 60:
+            if github_jwt_cache['key'] is None:
+                with open(PRIVATE_PEM_PATH, 'rb') as pem_file:
+                    pem_data = pem_file.read()
+                github_jwt_cache['key'] = serialization.load_pem_private_key(
+                    pem_data, password=None, backend=default_backend())
+            payload = {
+                'iat': now,
+                'exp': now + 600,
+                'iss': CLIENT_ID
+            }
+            jwt_instance = jwt.JWT()
+            github_jwt_cache['token'] = jwt_instance.encode(
+                payload, github_jwt_cache['key'], alg='RS256')
+            github_jwt_cache['exp'] = payload['exp']
+        return github_jwt_cache['token']
+
 
 @app.route('/api/github/repos', methods=['POST'])
 def github_repos():
@@ -48,26 +111,13 @@ def github_repos():
 
     # ...existing code...
     try:
-        with open(PRIVATE_PEM_PATH, 'rb') as pem_file:
-            pem_data = pem_file.read()
-        key = serialization.load_pem_private_key(
-            pem_data, password=None, backend=default_backend())
-        payload = {
-            'iat': int(time.time()),
-            'exp': int(time.time()) + 600,
-            'iss': CLIENT_ID
-        }
-        jwt_instance = jwt.JWT()
-        jwt_token = jwt_instance.encode(payload, key, alg='RS256')
+        jwt_token = get_github_jwt()
     except Exception as e:
         app.logger.error("JWT generation error: %s", e)
         return jsonify({'error': 'Failed to generate JWT', 'details': str(e)}), 500
 
-    headers = {
-        'Accept': 'application/vnd.github+json'
-    }
     api_url = f'https://api.github.com/users/{username}/repos'
-    response = requests.get(api_url, headers=headers)
+    response = github_session.get(api_url)
     if response.ok:
         repos = response.json()
         return jsonify({'repositories': repos}), 200
@@ -86,11 +136,8 @@ def github_search():
     if not query:
         return jsonify({'error': 'Search query not provided'}), 400
 
-    headers = {
-        'Accept': 'application/vnd.github+json'
-    }
     search_url = f'https://api.github.com/search/repositories?q={query}'
-    response = requests.get(search_url, headers=headers)
+    response = github_session.get(search_url)
     if response.ok:
         results = response.json().get('items', [])
         return jsonify({'repositories': results}), 200
@@ -113,7 +160,7 @@ def dummy_endpoint():
     repo_name = find_graph_name(repo_link)
     graph_name = '_'.join(repo_name.split('/'))
     graph_name = graph_name[:graph_name.find('.')]
-    print("GRAPH NAME::::", graph_name)
+    app.logger.debug("Graph name: %s", graph_name)
     if not check_graph(graph_name):
         make_graph(repo_link, repo_name, graph_name)
     # Initialize client
@@ -127,7 +174,7 @@ def dummy_endpoint():
         graph=graph_name
     )
     response = query_system.chat_with_codebase(query)
-    print(response)
+    app.logger.debug("Chat response: %s", response)
     return jsonify({"message": f"{response}"}), 200
 
 
@@ -194,7 +241,7 @@ def find_graph_name(repo_link):
 def check_graph(match):
     # Check if the graph is already there
     graph_names = [graph['name'] for graph in db.graphs()]
-    print(match)
+    app.logger.debug("Checking for graph %s", match)
     return match in graph_names
 
 
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+import uuid
+
+try:
+    from arango import ArangoClient
+    from GraphQuery import EnhancedCodebaseQuery
+except ImportError:
+    ArangoClient = None
+
+ARANGO_HOST = os.environ.get("ARANGO_HOST", "http://localhost:8529")
+ARANGO_PASSWORD = os.environ.get("ARANGO_PASSWORD")
+
+
+@unittest.skipIf(ArangoClient is None or not ARANGO_PASSWORD,
+                 "needs python-arango and a reachable ArangoDB (ARANGO_PASSWORD)")
+class CachedSymbolMatchesTest(unittest.TestCase):
+    """The cached symbol lookups must return what the AQL lookups return"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sys_db = ArangoClient(hosts=ARANGO_HOST).db(
+            "_system", username="root", password=ARANGO_PASSWORD)
+        cls.db_name = f"scopium_test_{uuid.uuid4().hex[:8]}"
+        cls.sys_db.create_database(cls.db_name)
+        db = ArangoClient(hosts=ARANGO_HOST).db(
+            cls.db_name, username="root", password=ARANGO_PASSWORD)
+
+        graph = db.create_graph("codebase")
+        graph.create_edge_definition(
+            edge_collection="codebase_edges",
+            from_vertex_collections=["codebase_nodes"],
+            to_vertex_collections=["codebase_nodes"])
+        nodes = db.collection("codebase_nodes")
+        edges = db.collection("codebase_edges")
+
+        # A file written by GraphBuilder, with its path, and one from an
+        # older export without it
+        nodes.insert_many([
+            {'_key': 'f1', 'type': 'file', 'path': 'pkg/mod.py',
+             'directory': 'pkg', 'language': 'python'},
+            {'_key': 'f2', 'type': 'file', 'file_name': 'old.ts',
+             'directory': 'web', 'language': 'typescript'},
+            {'_key': 's1', 'type': 'symbol', 'name': 'foo', 'symbol_type': 'function',
+             'line_number': 3, 'context': 'def foo():', 'docstring': 'Foo.'},
+            {'_key': 's2', 'type': 'symbol', 'name': 'bar', 'symbol_type': 'function',
+             'line_number': 1, 'context': 'function bar() {', 'docstring': ''},
+        ])
+        edges.insert_many([
+            {'_from': 'codebase_nodes/f1', '_to': 'codebase_nodes/s1',
+             'edge_type': 'contains_symbol'},
+            {'_from': 'codebase_nodes/f2', '_to': 'codebase_nodes/s2',
+             'edge_type': 'contains_symbol'},
+        ])
+
+        cls.cache_dir = tempfile.TemporaryDirectory()
+        cls.query = EnhancedCodebaseQuery(
+            db_name=cls.db_name, password=ARANGO_PASSWORD, host=ARANGO_HOST,
+            mistral_api_key="test", graph="codebase", cache_dir=cls.cache_dir.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.sys_db.delete_database(cls.db_name, ignore_missing=True)
+        cls.cache_dir.cleanup()
+
+    def _queried_symbols(self, name):
+        """Run the AQL symbol lookup by making the caches decline to answer"""
+        fields = self.query.symbol_lookup_fields
+        self.query.symbol_lookup_fields = (None, None)
+        try:
+            return [result for result in self.query.find_symbol_occurrences(name)
+                    if result['type'] == 'symbol']
+        finally:
+            self.query.symbol_lookup_fields = fields
+
+    def test_cached_matches_equal_queried_matches(self):
+        cached = self.query._cached_symbol_matches('foo')
+        self.assertIsNotNone(cached)
+        self.assertEqual(cached, self._queried_symbols('foo'))
+
+    def test_files_without_query_shape_are_queried(self):
+        self.assertIsNone(self.query._cached_symbol_matches('bar'))
+
+
+if __name__ == '__main__':
+    unittest.main()